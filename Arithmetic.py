@@ -1,10 +1,11 @@
 import numpy as np
 
 
-def multiply(m1, m2):
+def multiply(m1, m2, out=None):
     """Multiply two matricies, m1 . m2.
+    Works on stacks of matrices (N,4,4) as well, result is written into out if given.
     """
-    return np.dot(m1, m2)
+    return np.matmul(m1, m2, out=out)
 
     
 def create_identity(dtype=None):
@@ -72,3 +73,73 @@ def create_from_z_rotation(theta, dtype=None):
 
     return mat
 
+
+# Batched versions: N matrices of shape (N,4,4) built in one vectorized call.
+# They default to float32 (the GPU format) and write into out if given, so per-frame updates don't allocate.
+
+def _batch_out(n, dtype, out):
+    if out is None:
+        out = np.empty((n, 4, 4), dtype=dtype or np.float32)
+    return out
+
+
+def create_from_translations(vecs, dtype=None, out=None):
+    """Creates N matrices with the translations set.
+    :param numpy.array vecs: Translation vectors, shape (N,3).
+    :return: numpy.array ; Matrices with shape (N,4,4).
+    """
+    vecs = np.asarray(vecs)
+    out = _batch_out(len(vecs), dtype, out)
+    out[:] = np.identity(4)
+    out[:, 3, 0:3] = vecs[:, :3]
+    return out
+
+
+def create_from_scales(scales, dtype=None, out=None):
+    """Creates N scale matrices from scales of shape (N,3)."""
+    scales = np.asarray(scales)
+    out = _batch_out(len(scales), dtype, out)
+    out[:] = 0.0
+    out[:, 0, 0], out[:, 1, 1], out[:, 2, 2] = scales[:, 0], scales[:, 1], scales[:, 2]
+    out[:, 3, 3] = 1.0
+    return out
+
+
+def create_from_y_rotations(thetas, dtype=None, out=None):
+    """Creates N matrices with the specified rotations about the Y axis, thetas of shape (N,)."""
+    return compose(y_rotations=thetas, dtype=dtype, out=out)
+
+
+def create_from_z_rotations(thetas, dtype=None, out=None):
+    """Creates N matrices with the specified rotations about the Z axis, thetas of shape (N,)."""
+    return compose(z_rotations=thetas, dtype=dtype, out=out)
+
+
+def compose(translations=None, y_rotations=None, z_rotations=None, scales=None, dtype=None, out=None):
+    """Composes scale, rotation about Z, rotation about Y and translation of N objects:
+    S . Rz . Ry . T, the same as chaining multiply() over the single-matrix functions.
+    Any component may be omitted; scales may be given per axis (N,3) or uniform (N,).
+    :return: numpy.array ; Matrices with shape (N,4,4).
+    """
+    parts = [p for p in (translations, y_rotations, z_rotations, scales) if p is not None]
+    n = len(parts[0]) if parts else 1
+    out = _batch_out(n, dtype, out)
+
+    cy, sy = (np.cos(y_rotations), np.sin(y_rotations)) if y_rotations is not None else (1.0, 0.0)
+    cz, sz = (np.cos(z_rotations), np.sin(z_rotations)) if z_rotations is not None else (1.0, 0.0)
+
+    # Rz . Ry, written out
+    out[:, 0, 0], out[:, 0, 1], out[:, 0, 2] = cz * cy, -sz, cz * sy
+    out[:, 1, 0], out[:, 1, 1], out[:, 1, 2] = sz * cy, cz, sz * sy
+    out[:, 2, 0], out[:, 2, 1], out[:, 2, 2] = -sy, 0.0, cy
+    out[:, 0:3, 3] = 0.0
+    out[:, 3, 3] = 1.0
+
+    if scales is not None:
+        scales = np.asarray(scales)
+        out[:, 0:3, 0:3] *= scales[:, :, np.newaxis] if scales.ndim == 2 else scales[:, np.newaxis, np.newaxis]
+    if translations is not None:
+        out[:, 3, 0:3] = np.asarray(translations)[:, :3]
+    else:
+        out[:, 3, 0:3] = 0.0
+    return out
@@ -1,11 +1,12 @@
 import numpy as np
 
-def create_perspective_projection(fovy, aspect, near, far, dtype=None):
+def create_perspective_projection(fovy, aspect, near, far, dtype=None, out=None):
     """
     :param float fovy: field of view in y direction in degrees
     :param float aspect: aspect ratio of the view (width / height)
     :param float near: distance from the viewer to the near clipping plane (only positive)
     :param float far: distance from the viewer to the far clipping plane (only positive)
+    :param numpy.array out: optional preallocated (4,4) result
 
     :return: A projection matrix representing the specified perpective.
     
@@ -20,7 +21,7 @@ def create_perspective_projection(fovy, aspect, near, far, dtype=None):
     """
     ymax = near * np.tan(fovy * np.pi / 360.0)
     xmax = ymax * aspect
-    return create_perspective_projection_from_bounds(-xmax, xmax, -ymax, ymax, near, far, dtype=dtype)
+    return create_perspective_projection_from_bounds(-xmax, xmax, -ymax, ymax, near, far, dtype=dtype, out=out)
 
 def create_perspective_projection_from_bounds(
     left,
@@ -29,7 +30,8 @@ def create_perspective_projection_from_bounds(
     top,
     near,
     far,
-    dtype=None
+    dtype=None,
+    out=None
 ):
     """Creates a perspective projection matrix using the specified near plane dimensions.
 
@@ -50,6 +52,13 @@ def create_perspective_projection_from_bounds(
     E = 2. * near / (right - left)
     F = 2. * near / (top - bottom)
 
+    if out is not None:
+        out[:] = 0.
+        out[0, 0], out[1, 1] = E, F
+        out[2, 0], out[2, 1], out[2, 2], out[2, 3] = A, B, C, -1.
+        out[3, 2] = D
+        return out
+
     return np.array((
         (  E, 0., 0., 0.),
         ( 0.,  F, 0., 0.),
@@ -10,6 +10,6 @@ class Vector3(np.ndarray):
 
 def from_matrix44_translation(mat, dtype=None):
     """
-    Create a Vector3 from a Matrix44.
+    Create a Vector3 from a Matrix44 (or (N,3) vectors from a stack of N matrices).
     """
-    return np.array(mat[3, :3], dtype=dtype)
+    return np.array(mat[..., 3, :3], dtype=dtype)
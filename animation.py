@@ -0,0 +1,95 @@
+import math
+
+import numpy as np
+
+
+# Floats of a packed motion: two vec4 (see motion.glsl)
+MOTION_SIZE = 8
+
+
+class Motion:
+    def __init__(self, bob_amplitude: float = 0.0, bob_rate: float = 1.0, bob_phase: float = 0.0, yaw: float = 0.0,
+                 yaw_rate: float = 0.0, orbit_radius: float = 0.0, orbit_rate: float = 0.0, orbit_phase: float = 0.0):
+        """Parametric motion of an object, evaluated from the scene time by the vertex shader (ANIMATED).
+
+        The object turns about its own up axis (yaw), then moves up and down (bob) and along a horizontal
+        circle around its model position (orbit). Angles are in radians, rates in radians per second.
+
+        :param bob_amplitude: Height of the bob above (and depth below) the model position.
+        :param bob_rate: Angular frequency of the bob.
+        :param bob_phase: Phase of the bob at time 0.
+        :param yaw: Rotation about the up axis at time 0.
+        :param yaw_rate: Constant yaw rate.
+        :param orbit_radius: Radius of the orbit, 0 for none.
+        :param orbit_rate: Angular speed along the orbit.
+        :param orbit_phase: Angle on the orbit at time 0 (0 is +x, pi / 2 is +z).
+        """
+        self.bob_amplitude = bob_amplitude
+        self.bob_rate = bob_rate
+        self.bob_phase = bob_phase
+        self.yaw = yaw
+        self.yaw_rate = yaw_rate
+        self.orbit_radius = orbit_radius
+        self.orbit_rate = orbit_rate
+        self.orbit_phase = orbit_phase
+
+    @staticmethod
+    def orbit(radius: float, period: float, phase: float = 0.0, heading: float = -math.pi / 2) -> "Motion":
+        """
+        Circling around the model position, nose along the path.
+
+        :param period: Seconds per lap, negative to fly clockwise (seen from above).
+        :param heading: Yaw turning the nose of the model from -x (like the A380) to the direction of flight.
+        """
+        rate = 2 * math.pi / period
+        return Motion(yaw=phase + heading if rate > 0 else phase - heading, yaw_rate=rate, orbit_radius=radius,
+                      orbit_rate=rate, orbit_phase=phase)
+
+    @property
+    def margin(self) -> float:
+        """How far the motion moves the model origin from the model position."""
+        return abs(self.bob_amplitude) + abs(self.orbit_radius)
+
+    def pack(self) -> np.ndarray:
+        """Motion as two vec4 (see motion.glsl)."""
+        return np.array([[self.bob_amplitude, self.bob_rate, self.bob_phase, self.yaw],
+                         [self.yaw_rate, self.orbit_radius, self.orbit_rate, self.orbit_phase]], dtype=np.float32)
+
+
+def pack_motions(motions) -> np.ndarray:
+    """Packed motions of shape (N, 2, 4) from Motion objects (or already packed motions)."""
+    if isinstance(motions, np.ndarray):
+        return np.asarray(motions, dtype=np.float32).reshape(-1, 2, 4)
+    return np.array([motion.pack() for motion in motions], dtype=np.float32).reshape(-1, 2, 4)
+
+
+def margins(motions: np.ndarray) -> np.ndarray:
+    """Motion.margin of packed motions (N, 2, 4)."""
+    return np.abs(motions[:, 0, 0]) + np.abs(motions[:, 1, 1])
+
+
+def evaluate(motions: np.ndarray, models: np.ndarray, time: float, out: np.ndarray = None) -> np.ndarray:
+    """
+    Model matrices at given time, the same as AnimatedModel() in motion.glsl computes on the GPU:
+    yaw . model . translation (Arithmetic convention).
+
+    :param motions: Packed motions, shape (N, 2, 4).
+    :param models: Model matrices without motion, shape (N, 4, 4).
+    :return: Matrices with shape (N, 4, 4).
+    """
+    bob, yaw = motions[:, 0], motions[:, 1]
+    angle = bob[:, 3] + yaw[:, 0] * time
+    c, s = np.cos(angle), np.sin(angle)
+    # Rows of the yaw matrix times the models' upper rows; the translation row is not rotated
+    if out is None:
+        out = np.empty(models.shape, dtype=np.float32)
+    rows = models[:, 0:3, :]
+    out[:, 0] = c[:, np.newaxis] * rows[:, 0] + s[:, np.newaxis] * rows[:, 2]
+    out[:, 1] = rows[:, 1]
+    out[:, 2] = -s[:, np.newaxis] * rows[:, 0] + c[:, np.newaxis] * rows[:, 2]
+    out[:, 3] = models[:, 3]
+    orbit = yaw[:, 3] + yaw[:, 2] * time
+    out[:, 3, 0] += yaw[:, 1] * np.cos(orbit)
+    out[:, 3, 1] += bob[:, 0] * np.sin(bob[:, 2] + bob[:, 1] * time)
+    out[:, 3, 2] += yaw[:, 1] * np.sin(orbit)
+    return out
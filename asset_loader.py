@@ -0,0 +1,162 @@
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from time import perf_counter
+
+import numpy as np
+import mesh_cache
+import vertex_format
+import asset_registry
+from asset_registry import AssetRegistry
+
+
+log = logging.getLogger(__name__)
+
+
+class AssetLoader:
+    def __init__(self, registry: AssetRegistry = None, workers: int = None, placeholder: str = None,
+                 upload_budget: float = 0.004):
+        """Loads meshes and textures in the background, uploading them to GL a few per frame.
+
+        Worker threads read mesh caches (paging the mapped data in) and decode images. Objects whose cache has
+        to be (re)built are parsed in worker processes, since parsing and simplification hold the GIL.
+        Only update(), called on the thread owning the GL context, touches GL.
+
+        :param registry: Asset registry receiving the uploads, default one if None.
+        :param workers: Number of worker threads and processes, CPU count if None.
+        :param placeholder: Small .obj file loaded right away and drawn in place of objects still loading.
+        :param upload_budget: Seconds per update() spent uploading (at least one asset is uploaded).
+        """
+        self.registry = registry or asset_registry.registry
+        self._workers = workers or os.cpu_count() or 1
+        self._threads = ThreadPoolExecutor(self._workers, thread_name_prefix="asset_loader")
+        self._processes = None  # Started when the first .obj file has to be parsed
+        self._lock = threading.Lock()
+        self._texture_locks = {}  # Texture path -> lock held while it is decoded
+        self._queued_textures = set()
+        self._waiting = {}  # Mesh path -> callbacks run once it is uploaded
+        self._ready = queue.Queue()  # (kind, path, data) prepared by workers, in completion order
+        self.errors = []  # (path, exception) of meshes that failed to load, their objects keep the placeholder
+        self.upload_budget = upload_budget
+        self.placeholder = None
+        if placeholder is not None:
+            self.placeholder = self.registry.acquire_mesh(placeholder)
+
+    @property
+    def loading(self) -> bool:
+        """True while requested meshes are not uploaded yet."""
+        return bool(self._waiting)
+
+    def request_mesh(self, path: str, on_ready) -> None:
+        """
+        Loads given .obj file in the background.
+
+        :param path: Path to .obj file.
+        :param on_ready: Called without arguments (from update()) once the mesh is in the registry,
+                         right away if it is already there.
+        """
+        if self.registry.has_mesh(path):
+            on_ready()
+        elif path in self._waiting:
+            self._waiting[path].append(on_ready)
+        else:
+            self._waiting[path] = [on_ready]
+            self._threads.submit(self._prepare_mesh, path)
+
+    def _prepare_mesh(self, path: str) -> None:
+        try:
+            chunks = mesh_cache.read_cache(path)
+            if chunks is None:
+                self._process_pool().submit(mesh_cache.build_cache, path).result()
+                chunks = mesh_cache.read_cache(path)
+            for chunk in chunks:
+                # Page mapped data in (and quantize it) here instead of during the upload
+                chunk.vertices, chunk.indices = np.array(chunk.vertices), np.array(chunk.indices)
+                vertex_format.encode(chunk, self.registry.vertex_layout)
+            textures = list(dict.fromkeys(chunk.texture for chunk in chunks if chunk.texture is not None))
+            if self.registry.packs(textures):
+                # Texture array is uploaded with the mesh, build its resized caches here
+                AssetRegistry.texture_array_levels(textures)
+            else:
+                for texture in textures:
+                    self._prepare_texture(texture)  # Queued before the mesh needing it
+            self._ready.put(("mesh", path, chunks))
+        except Exception as e:
+            self._ready.put(("error", path, e))
+
+    def _prepare_texture(self, path: str) -> None:
+        key = os.path.abspath(path)
+        with self._lock:
+            lock = self._texture_locks.setdefault(key, threading.Lock())
+        with lock:
+            # Meshes sharing a texture wait for the first one decoding it, so the image is always queued first
+            if key in self._queued_textures or self.registry.has_texture(path):
+                return
+            self._ready.put(("texture", path, AssetRegistry.decode_texture(path)))
+            self._queued_textures.add(key)
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._processes is None:
+                # Spawned, forking would copy the GL context and the worker threads' state
+                self._processes = ProcessPoolExecutor(self._workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._processes
+
+    def update(self, budget: float = None, block: bool = False) -> int:
+        """
+        Uploads prepared assets until the time budget is used up and notifies objects waiting for them.
+        Must be called on the thread owning the GL context, e.g. once per frame. Meshes that fail to load are
+        logged and added to errors.
+
+        :param budget: Seconds to spend, upload_budget if None.
+        :param block: Wait for the first asset if none is prepared yet.
+        :return: Number of uploaded assets.
+        """
+        budget = self.upload_budget if budget is None else budget
+        start = perf_counter()
+        uploaded = 0
+        while self._waiting:
+            try:
+                kind, path, data = self._ready.get(block=block and uploaded == 0)
+            except queue.Empty:
+                break
+            if kind == "error":
+                # One broken file must not stop the frame loop
+                log.error("Can't load %s: %s", path, data)
+                self.errors.append((path, data))
+                self._waiting.pop(path)
+                continue
+            if kind == "texture":
+                self.registry.preload_texture(path, data)
+            else:
+                self.registry.preload_mesh(path, data)
+                # Held while notifying: freed again if every object waiting for it was released meanwhile
+                self.registry.acquire_mesh(path)
+                for on_ready in self._waiting.pop(path):
+                    on_ready()
+                self.registry.release_mesh(path)
+            uploaded += 1
+            if perf_counter() - start >= budget:
+                break
+        return uploaded
+
+    def finish(self) -> None:
+        """Blocks until every requested mesh is uploaded. Raises if one of them failed to load meanwhile."""
+        failed = len(self.errors)
+        while self._waiting:
+            self.update(budget=float("inf"), block=True)
+        if len(self.errors) > failed:
+            path, error = self.errors[failed]
+            raise RuntimeError(f"Can't load {path}") from error
+
+    def shutdown(self) -> None:
+        """Stops the workers (pending requests are abandoned) and releases the placeholder."""
+        self._threads.shutdown(wait=True, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=True, cancel_futures=True)
+        if self.placeholder is not None:
+            self.registry.release_mesh(self.placeholder.path)
+            self.placeholder = None
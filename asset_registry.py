@@ -0,0 +1,196 @@
+import os
+
+import numpy as np
+from OpenGL.GL import *
+import texture_cache
+from mesh import Mesh
+from gl_state import state
+
+
+# Texture unit of texture arrays; 2D textures use unit 0
+TEXTURE_ARRAY_UNIT = 1
+
+
+class AssetRegistry:
+    def __init__(self, texture_arrays: bool = False, vertex_layout: str = "float"):
+        """Reference-counted store of GPU meshes and textures, keyed by file path.
+
+        Every scene object loaded from the same file shares one Mesh, every material using the same image
+        shares one texture. Resources are freed when the last user releases them.
+        Textures are mipmapped and sampled trilinearly, their mip chains come from the texture cache.
+
+        :param texture_arrays: Pack the textures of a mesh with several textured materials into one
+                               GL_TEXTURE_2D_ARRAY (resized to a common size), so its materials are drawn
+                               without rebinding textures.
+        :param vertex_layout: Layout of mesh vertices in vertex buffers, "float" or "compact" (quantized, half
+                              the size; see vertex_format.py).
+        """
+        self.texture_arrays = texture_arrays
+        self.vertex_layout = vertex_layout
+        self._meshes = {}  # key -> [Mesh, refcount]
+        self._textures = {}  # key -> [texture ID, refcount]
+        self._arrays = {}  # tuple of keys -> [texture ID, refcount]
+        # Entries may also be uploaded ahead of their first user (see AssetLoader), with refcount 0
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.normcase(os.path.abspath(path))
+
+    def acquire_mesh(self, path: str) -> Mesh:
+        """Returns shared mesh of given .obj file, loading it on first use."""
+        key = self._key(path)
+        if key not in self._meshes:
+            self._meshes[key] = [Mesh(path, self), 0]
+        entry = self._meshes[key]
+        entry[1] += 1
+        return entry[0]
+
+    def preload_mesh(self, path: str, chunks: list) -> None:
+        """Uploads already loaded material chunks of given .obj file, unless the mesh is present."""
+        key = self._key(path)
+        if key not in self._meshes:
+            self._meshes[key] = [Mesh(path, self, chunks), 0]
+
+    def has_mesh(self, path: str) -> bool:
+        return self._key(path) in self._meshes
+
+    def release_mesh(self, path: str) -> None:
+        key = self._key(path)
+        entry = self._meshes[key]
+        entry[1] -= 1
+        if entry[1] == 0:
+            entry[0].delete()
+            del self._meshes[key]
+
+    def acquire_texture(self, path: str) -> int:
+        """Returns shared texture ID of given image, loading it on first use."""
+        key = self._key(path)
+        if key not in self._textures:
+            texture = glGenTextures(1)
+            self._load_texture(path, texture)
+            self._textures[key] = [texture, 0]
+        entry = self._textures[key]
+        entry[1] += 1
+        return entry[0]
+
+    def preload_texture(self, path: str, image: list) -> None:
+        """Uploads an image decoded by decode_texture(), unless the texture is present."""
+        key = self._key(path)
+        if key not in self._textures:
+            texture = glGenTextures(1)
+            self._load_texture(path, texture, image)
+            self._textures[key] = [texture, 0]
+
+    def has_texture(self, path: str) -> bool:
+        return self._key(path) in self._textures
+
+    def release_texture(self, path: str) -> None:
+        key = self._key(path)
+        entry = self._textures[key]
+        entry[1] -= 1
+        if entry[1] == 0:
+            glDeleteTextures(1, [entry[0]])
+            state.invalidate()  # Deleted names may be reused
+            del self._textures[key]
+
+    def packs(self, paths: list) -> bool:
+        """True if a mesh with textures of given paths gets them as one texture array."""
+        return self.texture_arrays and len(set(self._key(path) for path in paths)) > 1
+
+    def acquire_texture_array(self, paths: list) -> int:
+        """Returns shared texture array with one layer per path (in given order), loading it on first use."""
+        key = tuple(self._key(path) for path in paths)
+        if key not in self._arrays:
+            texture = glGenTextures(1)
+            self._load_texture_array(paths, texture)
+            self._arrays[key] = [texture, 0]
+        entry = self._arrays[key]
+        entry[1] += 1
+        return entry[0]
+
+    def release_texture_array(self, paths: list) -> None:
+        key = tuple(self._key(path) for path in paths)
+        entry = self._arrays[key]
+        entry[1] -= 1
+        if entry[1] == 0:
+            glDeleteTextures(1, [entry[0]])
+            state.invalidate()
+            del self._arrays[key]
+
+    def ref_count(self, path: str) -> int:
+        """Number of current users of a mesh or texture."""
+        key = self._key(path)
+        entry = self._meshes.get(key) or self._textures.get(key)
+        return entry[1] if entry else 0
+
+    @staticmethod
+    def decode_texture(path: str) -> list:
+        """Loads the mip chain of an image into memory. Doesn't touch GL, safe to call from any thread.
+
+        :return: List of (width, height, pixels) per mip level (see texture_cache.load).
+        """
+        return [(width, height, np.array(pixels)) for width, height, pixels in texture_cache.load(path)]
+
+    @staticmethod
+    def texture_array_levels(paths: list) -> list:
+        """
+        Mip chains of the layers of a texture array: images are resized to the largest width and height
+        among them. Doesn't touch GL, safe to call from any thread.
+
+        :return: Per layer, a list of (width, height, pixels) per mip level.
+        """
+        sizes = [texture_cache.image_size(path) for path in paths]
+        size = max(width for width, _ in sizes), max(height for _, height in sizes)
+        return [texture_cache.load(path, None if own == size else size) for path, own in zip(paths, sizes)]
+
+    @staticmethod
+    def _set_sampling(target) -> None:
+        # Set the texture wrapping parameters
+        glTexParameteri(target, GL_TEXTURE_WRAP_S, GL_REPEAT)
+        glTexParameteri(target, GL_TEXTURE_WRAP_T, GL_REPEAT)
+        # Trilinear filtering: blend the two nearest mip levels, so distant surfaces don't alias
+        glTexParameteri(target, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+        glTexParameteri(target, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+
+    @staticmethod
+    def _load_texture(path: str, texture: int, image: list = None) -> None:
+        """
+        Loads texture into buffer by given path and tex buffer ID.
+
+        :param path: Texture path.
+        :param texture: Texture buffer ID.
+        :param image: Already loaded mip chain (see decode_texture), memory-mapped from the cache if None.
+        """
+        # For use with GLFW
+        state.bind_texture(texture)
+        AssetRegistry._set_sampling(GL_TEXTURE_2D)
+        # Upload every mip level straight from the (mapped) cache
+        levels = image or texture_cache.load(path)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, len(levels) - 1)
+        for level, (width, height, pixels) in enumerate(levels):
+            glTexImage2D(GL_TEXTURE_2D, level, GL_RGBA8, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, pixels)
+
+    @staticmethod
+    def _load_texture_array(paths: list, texture: int) -> None:
+        layers = AssetRegistry.texture_array_levels(paths)
+        state.bind_texture(texture, GL_TEXTURE_2D_ARRAY, TEXTURE_ARRAY_UNIT)
+        AssetRegistry._set_sampling(GL_TEXTURE_2D_ARRAY)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MAX_LEVEL, len(layers[0]) - 1)
+        for level, (width, height, _) in enumerate(layers[0]):
+            glTexImage3D(GL_TEXTURE_2D_ARRAY, level, GL_RGBA8, width, height, len(layers), 0, GL_RGBA,
+                         GL_UNSIGNED_BYTE, None)
+            for layer, levels in enumerate(layers):
+                glTexSubImage3D(GL_TEXTURE_2D_ARRAY, level, 0, 0, layer, width, height, 1, GL_RGBA,
+                                GL_UNSIGNED_BYTE, levels[level][2])
+
+
+def bind_material_texture(texture: int, material) -> None:
+    """Binds the texture of a material: its mesh's texture array if it has a layer in one, else a 2D texture."""
+    if material is not None and material.layer >= 0:
+        state.bind_texture(texture, GL_TEXTURE_2D_ARRAY, TEXTURE_ARRAY_UNIT)
+    else:
+        state.bind_texture(texture)
+
+
+# Default registry used by LoadedObject
+registry = AssetRegistry(texture_arrays=True)
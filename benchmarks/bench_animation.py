@@ -0,0 +1,135 @@
+"""GPU vs. CPU procedural animation benchmark: frame and per-frame update times as ambient aircraft are added.
+
+A fleet of instanced A380s circles the airfield at different radii, altitudes and speeds, bobbing up and
+down. With CPU animation every model matrix is rebuilt from the time (animation.evaluate) and the instance
+buffer uploaded each frame, as Window._move_objects did for the centre plane; with GPU animation the
+motions are uploaded once and the vertex shader evaluates them from the time in the Camera block, so a frame
+only writes one float. Both images of the last frame are compared to check the shader moves the planes
+like the CPU does.
+
+Run from the repository root: python benchmarks/bench_animation.py [--planes 10 100 1000]
+"""
+import argparse
+import json
+import math
+import os
+import sys
+from time import perf_counter
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+
+def traffic(count: int, seed: int = 0) -> (np.ndarray, np.ndarray):
+    """Model matrices (at the circles' centres) and packed motions of count aircraft circling the airfield."""
+    from animation import Motion, pack_motions
+
+    rng = np.random.default_rng(seed)
+    models = np.tile(np.eye(4, dtype=np.float32), (count, 1, 1))
+    models[:, 3, 0:3] = np.column_stack((rng.uniform(-4, 4, count), rng.uniform(3, 9, count),
+                                         rng.uniform(-12, -4, count)))
+    periods = rng.choice([-1, 1], count) * rng.uniform(8, 30, count)  # Both directions
+    motions = []
+    for radius, period, phase in zip(rng.uniform(2, 10, count), periods, rng.uniform(0, 2 * math.pi, count)):
+        motion = Motion.orbit(radius, period, phase)
+        motion.bob_amplitude, motion.bob_rate, motion.bob_phase = 0.3, 2 * math.pi / 5, phase
+        motions.append(motion)
+    return models, pack_motions(motions)
+
+
+def measure(window, frames: int, update=None) -> dict:
+    from OpenGL.GL import glFinish, glReadPixels, GL_RGBA, GL_UNSIGNED_BYTE
+
+    frame_times, update_times = [], []
+    for index in range(frames):
+        time = 10.0 + index / 60.0
+        start = perf_counter()
+        if update is not None:
+            update(time)
+        updated = perf_counter()
+        window.render_frame(time)
+        glFinish()
+        frame_times.append(perf_counter() - start)
+        update_times.append(updated - start)
+
+    pixels = glReadPixels(0, 0, window._width, window._height, GL_RGBA, GL_UNSIGNED_BYTE)
+    return {
+        "frame_ms": float(np.median(frame_times[1:]) * 1e3),
+        "update_ms": float(np.median(update_times[1:]) * 1e3),
+        "image": np.frombuffer(pixels, dtype=np.uint8).reshape(window._height, window._width, 4),
+    }
+
+
+def compare(window, fleet, models: np.ndarray, motions: np.ndarray, frames: int) -> dict:
+    """Animates the fleet on the CPU, then on the GPU; returns both measurements and the image difference."""
+    import animation
+
+    matrices = np.empty_like(models)
+    fleet.set_transforms(models)
+
+    def cpu_update(time: float) -> None:
+        fleet.set_transforms(animation.evaluate(motions, models, time, out=matrices))
+
+    row = {"cpu": measure(window, frames, cpu_update)}
+    fleet.set_transforms(models)
+    fleet.set_motions(motions)
+    row["gpu"] = measure(window, frames)
+    difference = np.abs(row["cpu"].pop("image").astype(np.int16) - row["gpu"].pop("image"))
+    row["image_difference"] = {"max": int(difference.max()), "pixels_over_2": float((difference > 2).mean())}
+    return row
+
+
+def run(args) -> list:
+    os.environ["PYOPENGL_PLATFORM"] = "egl"  # Before the first OpenGL import
+    from gl_context import EglContext
+    from offscreen import OffscreenTarget
+    from instanced_object import InstancedObject
+    from main import Window
+
+    context = EglContext(args.width, args.height)
+    target = OffscreenTarget(args.width, args.height)
+    target.bind()
+    window = Window(args.width, args.height, "AirBUS A380 Modeling", context=context)
+    window.loader.finish()
+
+    results = []
+    for planes in args.planes:
+        fleet = window.fleets["traffic"] = InstancedObject("data/A380.obj", scale=0.5)
+        models, motions = traffic(planes)
+        row = {"planes": planes}
+        row.update(compare(window, fleet, models, motions, args.frames))
+        results.append(row)
+        fleet.release()
+        del window.fleets["traffic"]
+
+    target.delete()
+    window.loader.shutdown()
+    context.terminate()
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Frame and update times, CPU vs. GPU procedural animation.")
+    parser.add_argument("--planes", type=int, nargs="+", default=[10, 100, 1000], help="circling aircraft")
+    parser.add_argument("--frames", type=int, default=20, help="frames rendered per configuration")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    os.chdir(ROOT)  # Scene paths are relative to the repository root
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'planes':>6} {'cpu frame':>10} {'gpu frame':>10} {'cpu update':>11} {'gpu update':>11} {'max diff':>8}")
+    for r in results:
+        c, g = r["cpu"], r["gpu"]
+        print(f"{r['planes']:>6} {c['frame_ms']:>8.1f}ms {g['frame_ms']:>8.1f}ms {c['update_ms']:>9.2f}ms "
+              f"{g['update_ms']:>9.2f}ms {r['image_difference']['max']:>8d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Clustered lighting benchmark: point lights evaluated per fragment, clustered vs. brute force.
+
+The scene gets runway edge lights along both sides of the runway plus apron floodlights. For each light count
+frames are rendered offscreen from the static camera; the depth buffer is read back to find every
+fragment's cluster, so the lights the shader evaluated per fragment are known exactly. The brute-force loop
+evaluates every light for every fragment. Frame times (CPU and GPU, glFinish) are compared against a single
+cluster, which makes the shader loop over all lights like the brute-force loop. Binning time is measured
+separately, since the clusters are only rebuilt when the camera or lights change.
+
+Run from the repository root: python benchmarks/bench_clustered_lights.py [--edge-lights 0 50 200 500]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from time import perf_counter
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+# Attenuation of edge lights (short range) and floodlights (long range)
+EDGE_LIGHT_K = (1.0, 2.0, 20.0)
+FLOODLIGHT_K = (1.0, 0.14, 0.07)
+
+
+def runway_lights(per_side: int) -> list:
+    """Edge lights in two rows along the runway, dim white and amber alternating."""
+    lights = []
+    for x in np.linspace(-9.5, 9.5, per_side):
+        for z in (-4.0, 4.0):
+            color = (0.6, 0.6, 0.6) if len(lights) % 4 < 2 else (0.6, 0.4, 0.1)
+            lights.append(((x, 0.1, z), color))
+    return lights
+
+
+def floodlights() -> list:
+    """Apron floodlights on masts around the runway."""
+    return [((x, 6.0, z), (0.5, 0.5, 0.45)) for x in (-9.0, 0.0, 9.0) for z in (-9.0, 9.0)]
+
+
+def view_depth(depth_buffer: np.ndarray, projection: np.ndarray) -> np.ndarray:
+    """Linear view space depth from window depth values (inf where nothing was drawn)."""
+    ndc = depth_buffer.astype(np.float64) * 2.0 - 1.0
+    with np.errstate(divide="ignore"):
+        return np.where(depth_buffer < 1.0, projection[3][2] / (ndc + projection[2][2]), np.inf)
+
+
+def measure(window, frames: int) -> dict:
+    from OpenGL.GL import glFinish, glReadPixels, GL_DEPTH_COMPONENT, GL_FLOAT
+
+    frame_times = []
+    for index in range(frames):
+        start = perf_counter()
+        window.render_frame(index / 60.0)
+        glFinish()
+        frame_times.append(perf_counter() - start)
+    camera, clusters = window.camera, window.light_clusters
+    assign = min(timeit.repeat(lambda: clusters.assign(camera.view_matrix, camera.projection_matrix, camera.near,
+                                                       camera.far), number=1, repeat=5))
+
+    width, height = window._width, window._height
+    depth = glReadPixels(0, 0, width, height, GL_DEPTH_COMPONENT, GL_FLOAT)
+    depth = view_depth(np.frombuffer(depth, dtype=np.float32).reshape(height, width),
+                       window.camera.projection_matrix)
+    y, x = np.nonzero(np.isfinite(depth))
+    evaluated = clusters.counts[clusters.cluster_index(x + 0.5, y + 0.5, depth[y, x], width, height)]
+    return {
+        "lights_per_fragment": {"mean": float(evaluated.mean()), "p95": float(np.percentile(evaluated, 95)),
+                                "max": int(evaluated.max())},
+        "assign_ms": assign * 1e3,
+        "frame_ms": float(np.median(frame_times[1:]) * 1e3),
+    }
+
+
+def run(args) -> list:
+    os.environ["PYOPENGL_PLATFORM"] = "egl"  # Before the first OpenGL import
+    from gl_context import EglContext
+    from offscreen import OffscreenTarget
+    from light_clusters import LightClusters
+    from Vector3 import Vector3 as v3
+    from main import Window
+
+    context = EglContext(args.width, args.height)
+    target = OffscreenTarget(args.width, args.height)
+    target.bind()
+    window = Window(args.width, args.height, "AirBUS A380 Modeling", context=context)
+    window.loader.finish()
+    window.add_point_lights([(v3(p), v3(c)) for p, c in floodlights()], k=v3(FLOODLIGHT_K), markers=False)
+
+    results = []
+    added = 0
+    clustered = window.light_clusters
+    single = LightClusters(tiles=(1, 1), slices=1)
+    for per_side in args.edge_lights:
+        lights = runway_lights(per_side)
+        window.add_point_lights([(v3(p), v3(c)) for p, c in lights[added:]], k=v3(EDGE_LIGHT_K), markers=False)
+        added = max(added, len(lights))
+        row = {"point_lights": len(window.point_lights)}
+        window.light_clusters = single
+        row["single_cluster"] = measure(window, args.frames)
+        window.light_clusters = clustered
+        row["clustered"] = measure(window, args.frames)
+        results.append(row)
+
+    target.delete()
+    window.loader.shutdown()
+    context.terminate()
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Lights per fragment and GPU time, clustered vs. brute force.")
+    parser.add_argument("--edge-lights", type=int, nargs="+", default=[0, 50, 200, 500],
+                        help="runway edge lights per side, increasing")
+    parser.add_argument("--frames", type=int, default=20, help="frames rendered per configuration")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    os.chdir(ROOT)  # Scene paths are relative to the repository root
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'lights':>6} {'brute force':>11} {'clustered mean':>14} {'p95':>5} {'max':>5} "
+          f"{'binning':>9} {'frame single':>12} {'frame clustered':>15}")
+    for r in results:
+        c, s = r["clustered"], r["single_cluster"]
+        print(f"{r['point_lights']:>6} {s['lights_per_fragment']['mean']:>11.1f} "
+              f"{c['lights_per_fragment']['mean']:>14.1f} {c['lights_per_fragment']['p95']:>5.0f} "
+              f"{c['lights_per_fragment']['max']:>5d} {c['assign_ms']:>7.2f}ms {s['frame_ms']:>10.1f}ms "
+              f"{c['frame_ms']:>13.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Deferred vs. forward shading benchmark: frame and GPU pass times as point lights and aircraft are added.
+
+First runway edge lights are added (like bench_clustered_lights.py), then a fleet of instanced A380s parked
+in overlapping rows in front of the static camera, so more and more fragments are shaded and then hidden
+by nearer ones. Every configuration is rendered offscreen with forward shading (clustered point lights
+evaluated per fragment) and with deferred shading (geometry pass into the G-buffer, then lighting per
+visible pixel); both images are compared to check the deferred path shades like the forward one.
+GPU time per pass (timer queries) is in the JSON output; software rasterizers only draw when the
+commands are flushed, so there only the frame times are meaningful.
+
+Run from the repository root: python benchmarks/bench_deferred.py [--edge-lights 0 100 400] [--planes 0 50 200]
+"""
+import argparse
+import json
+import os
+import sys
+from time import perf_counter
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_clustered_lights import runway_lights, floodlights, EDGE_LIGHT_K, FLOODLIGHT_K
+
+
+def fleet_matrices(count: int) -> np.ndarray:
+    """Model matrices of count aircraft in rows across the runway, each row behind and above the last."""
+    matrices = np.tile(np.eye(4, dtype=np.float32), (count, 1, 1))
+    index = np.arange(count)
+    per_row = 10
+    matrices[:, 3, 0] = (index % per_row - (per_row - 1) / 2) * 2.0
+    matrices[:, 3, 1] = 0.5 + index // per_row * 0.4
+    matrices[:, 3, 2] = 6.0 - index // per_row * 1.5
+    return matrices
+
+
+def measure(window, frames: int) -> dict:
+    from OpenGL.GL import glFinish, glReadPixels, GL_RGBA, GL_UNSIGNED_BYTE
+    from profiler import profiler
+
+    frame_times, passes = [], {}
+    profiler.enabled = True
+    for index in range(frames):
+        start = perf_counter()
+        window.render_frame(index / 60.0)
+        glFinish()
+        frame_times.append(perf_counter() - start)
+        for name, seconds in profiler.last_gpu.items():
+            passes.setdefault(name, []).append(seconds)
+    profiler.enabled = False
+
+    pixels = glReadPixels(0, 0, window._width, window._height, GL_RGBA, GL_UNSIGNED_BYTE)
+    return {
+        "frame_ms": float(np.median(frame_times[1:]) * 1e3),
+        "gpu_passes_ms": {name: float(np.median(times) * 1e3) for name, times in passes.items()},
+        "image": np.frombuffer(pixels, dtype=np.uint8).reshape(window._height, window._width, 4),
+    }
+
+
+def compare(window, frames: int) -> dict:
+    """Renders with both paths, returns their measurements and how much the images differ."""
+    row = {}
+    for mode in ("forward", "deferred"):
+        window.use_deferred = mode == "deferred"
+        row[mode] = measure(window, frames)
+    difference = np.abs(row["forward"].pop("image").astype(np.int16) - row["deferred"].pop("image"))
+    row["image_difference"] = {"max": int(difference.max()), "pixels_over_2": float((difference > 2).mean())}
+    return row
+
+
+def run(args) -> list:
+    os.environ["PYOPENGL_PLATFORM"] = "egl"  # Before the first OpenGL import
+    from gl_context import EglContext
+    from offscreen import OffscreenTarget
+    from instanced_object import InstancedObject
+    from Vector3 import Vector3 as v3
+    from main import Window
+
+    context = EglContext(args.width, args.height)
+    target = OffscreenTarget(args.width, args.height)
+    target.bind()
+    window = Window(args.width, args.height, "AirBUS A380 Modeling", context=context)
+    window.loader.finish()
+    window.add_point_lights([(v3(p), v3(c)) for p, c in floodlights()], k=v3(FLOODLIGHT_K), markers=False)
+    fleet = window.fleets["fleet"] = InstancedObject("data/A380.obj", scale=1.0)
+
+    results = []
+    added = 0
+    for per_side in args.edge_lights:
+        lights = runway_lights(per_side)
+        window.add_point_lights([(v3(p), v3(c)) for p, c in lights[added:]], k=v3(EDGE_LIGHT_K), markers=False)
+        added = max(added, len(lights))
+        for planes in (args.planes if per_side == args.edge_lights[-1] else args.planes[:1]):
+            fleet.set_transforms(fleet_matrices(planes))
+            row = {"point_lights": len(window.point_lights), "planes": planes + 2}
+            row.update(compare(window, args.frames))
+            results.append(row)
+
+    target.delete()
+    window.loader.shutdown()
+    context.terminate()
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Frame and GPU pass times, forward vs. deferred shading.")
+    parser.add_argument("--edge-lights", type=int, nargs="+", default=[0, 100, 400],
+                        help="runway edge lights per side, increasing")
+    parser.add_argument("--planes", type=int, nargs="+", default=[0, 50, 200],
+                        help="instanced aircraft, rendered with the most edge lights")
+    parser.add_argument("--frames", type=int, default=20, help="frames rendered per configuration")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    os.chdir(ROOT)  # Scene paths are relative to the repository root
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'lights':>6} {'planes':>6} {'forward':>9} {'deferred':>9} {'speedup':>8} {'max diff':>8}")
+    for r in results:
+        f, d = r["forward"]["frame_ms"], r["deferred"]["frame_ms"]
+        print(f"{r['point_lights']:>6} {r['planes']:>6} {f:>7.1f}ms {d:>7.1f}ms {f / d:>7.2f}x "
+              f"{r['image_difference']['max']:>8d}")
+
+
+if __name__ == '__main__':
+    main()
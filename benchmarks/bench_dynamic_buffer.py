@@ -0,0 +1,176 @@
+"""Per-draw data benchmark: CPU time to hand model matrices, motions and colors of N draws to the GPU.
+
+Every frame draws N small triangles, each with its own per-draw data (mat4 model, vec4 motion[2], vec4 color),
+three ways:
+
+- uniforms: glUniformMatrix4fv and glUniform4fv calls per draw, as the render queue did;
+- buffer updates: one glBufferSubData into a single uniform buffer per draw, which makes the driver wait
+  for (or copy around) the previous draw still reading it;
+- dynamic buffer: all blocks of the frame written into the persistently mapped ring at once (one NumPy
+  assignment), one glBindBufferRange per draw (dynamic_buffer.py, as the render queue does now).
+
+Reports the median CPU time per frame (until all draws are issued, then glFinish outside the measurement)
+and checks that the three produce the same image.
+
+Run from the repository root: python benchmarks/bench_dynamic_buffer.py [--draws 100 1000 5000]
+"""
+import argparse
+import json
+import os
+import sys
+from time import perf_counter
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+_VERTEX = """#version 330 core
+layout(location = 0) in vec3 a_pos;
+#ifdef BLOCK
+layout(std140) uniform Object { mat4 model; vec4 motion[2]; vec4 color; };
+#else
+uniform mat4 model;
+uniform vec4 motion[2];
+uniform vec4 color;
+#endif
+out vec4 v_color;
+void main()
+{
+    v_color = color + motion[0] * 0.0 + motion[1] * 0.0;
+    gl_Position = model * vec4(a_pos, 1.0);
+}
+"""
+_FRAGMENT = """#version 330 core
+in vec4 v_color;
+out vec4 FragColor;
+void main() { FragColor = v_color; }
+"""
+
+
+def scene(draws: int, seed: int = 0) -> np.ndarray:
+    """Object blocks (draws, 28 floats) of small triangles spread over the viewport."""
+    rng = np.random.default_rng(seed)
+    blocks = np.zeros((draws, 28), dtype=np.float32)
+    models = np.tile(np.eye(4, dtype=np.float32) * 0.05, (draws, 1, 1))
+    models[:, 3, 3] = 1.0
+    models[:, 3, 0:2] = rng.uniform(-0.95, 0.95, (draws, 2))
+    blocks[:, :16] = models.reshape(draws, 16)
+    blocks[:, 16:24] = rng.uniform(0, 1, (draws, 8))
+    blocks[:, 24:27] = rng.uniform(0.2, 1, (draws, 3))
+    return blocks
+
+
+def program(defines: str) -> int:
+    from OpenGL.GL import GL_VERTEX_SHADER, GL_FRAGMENT_SHADER
+    from OpenGL.GL.shaders import compileShader, compileProgram
+
+    vertex = _VERTEX.replace("\n", "\n" + defines, 1)
+    return compileProgram(compileShader(vertex, GL_VERTEX_SHADER), compileShader(_FRAGMENT, GL_FRAGMENT_SHADER))
+
+
+def measure(mode: str, blocks: np.ndarray, frames: int, size: int) -> dict:
+    from OpenGL.GL import (glUseProgram, glGetUniformLocation, glUniformMatrix4fv, glUniform4fv, glDrawArrays,
+                           glGetUniformBlockIndex, glUniformBlockBinding, glGenBuffers, glBindBuffer, glBufferData,
+                           glBufferSubData, glBindBufferBase, glBindBufferRange, glClear, glFinish, glReadPixels,
+                           GL_UNIFORM_BUFFER, GL_DYNAMIC_DRAW, GL_TRIANGLES, GL_COLOR_BUFFER_BIT, GL_RGBA,
+                           GL_UNSIGNED_BYTE, GL_FALSE)
+    from dynamic_buffer import DynamicBuffer
+
+    prog = program("" if mode == "uniforms" else "#define BLOCK 1\n")
+    glUseProgram(prog)
+    if mode != "uniforms":
+        glUniformBlockBinding(prog, glGetUniformBlockIndex(prog, "Object"), 0)
+    model, motion, color = (glGetUniformLocation(prog, name) for name in ("model", "motion", "color"))
+    buffer = glGenBuffers(1)
+    glBindBuffer(GL_UNIFORM_BUFFER, buffer)
+    glBufferData(GL_UNIFORM_BUFFER, blocks.shape[1] * 4, None, GL_DYNAMIC_DRAW)
+    glBindBufferBase(GL_UNIFORM_BUFFER, 0, buffer)
+    ring = DynamicBuffer(len(blocks) * 256)
+    draws = len(blocks)
+
+    times = []
+    for _ in range(frames):
+        glClear(GL_COLOR_BUFFER_BIT)
+        start = perf_counter()
+        if mode == "uniforms":
+            for block in blocks:
+                glUniformMatrix4fv(model, 1, GL_FALSE, block[:16])
+                glUniform4fv(motion, 2, block[16:24])
+                glUniform4fv(color, 1, block[24:28])
+                glDrawArrays(GL_TRIANGLES, 0, 3)
+        elif mode == "buffer updates":
+            for block in blocks:
+                glBufferSubData(GL_UNIFORM_BUFFER, 0, block.nbytes, block)
+                glDrawArrays(GL_TRIANGLES, 0, 3)
+        else:
+            stride = ring.aligned(blocks.shape[1] * 4)
+            offset, view = ring.allocate(draws * stride)
+            view.reshape(draws, stride // 4)[:, :blocks.shape[1]] = blocks
+            ring.commit()
+            for i in range(draws):
+                glBindBufferRange(GL_UNIFORM_BUFFER, 0, ring.buffer, offset + i * stride, blocks.shape[1] * 4)
+                glDrawArrays(GL_TRIANGLES, 0, 3)
+            ring.end_frame()
+        times.append(perf_counter() - start)
+        glFinish()
+
+    pixels = glReadPixels(0, 0, size, size, GL_RGBA, GL_UNSIGNED_BYTE)
+    ring.release()
+    return {"frame_ms": float(np.median(times[1:]) * 1e3), "image": np.frombuffer(pixels, dtype=np.uint8)}
+
+
+def run(args) -> list:
+    os.environ["PYOPENGL_PLATFORM"] = "egl"  # Before the first OpenGL import
+    from gl_context import EglContext
+    from offscreen import OffscreenTarget
+    from OpenGL.GL import glGenVertexArrays, glBindVertexArray, glGenBuffers, glBindBuffer, glBufferData, \
+        glEnableVertexAttribArray, glVertexAttribPointer, GL_ARRAY_BUFFER, GL_STATIC_DRAW, GL_FLOAT, GL_FALSE
+
+    context = EglContext(args.size, args.size)
+    target = OffscreenTarget(args.size, args.size)
+    target.bind()
+    glBindVertexArray(glGenVertexArrays(1))
+    glBindBuffer(GL_ARRAY_BUFFER, glGenBuffers(1))
+    glBufferData(GL_ARRAY_BUFFER, 36, np.array([-1, -1, 0, 1, -1, 0, 0, 1, 0], dtype=np.float32), GL_STATIC_DRAW)
+    glEnableVertexAttribArray(0)
+    glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 0, None)
+
+    results = []
+    for draws in args.draws:
+        blocks = scene(draws)
+        row = {"draws": draws}
+        for mode in ("uniforms", "buffer updates", "dynamic buffer"):
+            row[mode] = measure(mode, blocks, args.frames, args.size)
+        reference = row["uniforms"]["image"]
+        for mode in ("uniforms", "buffer updates", "dynamic buffer"):
+            row[mode]["same_image"] = bool(np.array_equal(row[mode].pop("image"), reference))
+        results.append(row)
+
+    target.delete()
+    context.terminate()
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="CPU time per frame of per-draw data: uniforms, buffer updates, "
+                                                 "dynamic buffer.")
+    parser.add_argument("--draws", type=int, nargs="+", default=[100, 1000, 5000], help="draws per frame")
+    parser.add_argument("--frames", type=int, default=20, help="frames measured per configuration")
+    parser.add_argument("--size", type=int, default=256, help="viewport width and height")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'draws':>6} {'uniforms':>10} {'buffer updates':>15} {'dynamic buffer':>15} {'same image':>10}")
+    for r in results:
+        same = all(r[mode]["same_image"] for mode in ("buffer updates", "dynamic buffer"))
+        print(f"{r['draws']:>6} {r['uniforms']['frame_ms']:>8.2f}ms {r['buffer updates']['frame_ms']:>13.2f}ms "
+              f"{r['dynamic buffer']['frame_ms']:>13.2f}ms {str(same):>10}")
+
+
+if __name__ == '__main__':
+    main()
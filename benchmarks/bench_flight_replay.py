@@ -0,0 +1,114 @@
+"""Flight recording benchmark: recording speed, file size and replay cost of long multi-track recordings.
+
+Records hours of synthetic flight (aircraft circling at 60 frames per second) with FlightRecorder, then
+opens the file with FlightReplay and measures:
+
+- opening time and resident memory growth: the file is memory-mapped, nothing is loaded up front;
+- sequential sampling, as a replay at real time or as fast as possible does every frame;
+- random seeks, as scrubbing does, and the resident memory after the first 100 of them. A seek reads
+  about 20 records (binary search), but the kernel maps the cached file pages around each one as well
+  (fault-around), so RSS grows by more than the pages read; they are clean file pages it can drop again.
+
+Run from the repository root: python benchmarks/bench_flight_replay.py [--hours 3] [--tracks 4]
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+
+def resident_bytes() -> int:
+    """Resident set size of this process."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def record(path: str, frames: int, tracks: int, fps: float) -> float:
+    """Records frames of tracks circling at different radii; returns seconds taken."""
+    from flight_recorder import FlightRecorder
+
+    radii = np.linspace(2, 10, tracks, dtype=np.float32)
+    positions = np.zeros((tracks, 3), dtype=np.float32)
+    recorder = FlightRecorder(path, tracks=[f"track_{i}" for i in range(tracks)])
+    start = perf_counter()
+    for frame in range(frames):
+        time = frame / fps
+        angle = time * 0.2
+        positions[:, 0], positions[:, 1], positions[:, 2] = radii * math.cos(angle), 3.0, radii * math.sin(angle)
+        recorder.record(time, positions, angle, 0.0, "moving")
+    recorder.close()
+    return perf_counter() - start
+
+
+def replay(path: str, samples: int, seed: int = 0) -> dict:
+    from flight_recorder import FlightReplay
+
+    before = resident_bytes()
+    start = perf_counter()
+    flight = FlightReplay(path)
+    opened = perf_counter()
+    open_rss = resident_bytes()
+
+    time, step = flight.start, 1 / 60
+    start_sequential = perf_counter()
+    for _ in range(samples):
+        flight.sample(time, len(flight.tracks) - 1)
+        time += step
+    sequential = perf_counter() - start_sequential
+
+    times = np.random.default_rng(seed).uniform(flight.start, flight.end, samples)
+    for time in times[:100]:
+        flight.sample(time, 0)
+    seek_rss = resident_bytes()
+    start_random = perf_counter()
+    for time in times:
+        flight.sample(time, 0)
+    random = perf_counter() - start_random
+
+    return {
+        "frames": len(flight),
+        "open_ms": (opened - start) * 1e3,
+        "open_rss_growth": open_rss - before,
+        "sequential_us": sequential / samples * 1e6,
+        "random_seek_us": random / samples * 1e6,
+        "rss_growth_after_100_seeks": seek_rss - before,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Flight recording speed, file size and replay cost.")
+    parser.add_argument("--hours", type=float, default=3.0, help="length of the recording")
+    parser.add_argument("--tracks", type=int, default=4, help="aircraft recorded")
+    parser.add_argument("--samples", type=int, default=10000, help="sequential samples and random seeks timed")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    fps = 60.0
+    frames = int(args.hours * 3600 * fps)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "flight.rec")
+        seconds = record(path, frames, args.tracks, fps)
+        result = {"hours": args.hours, "tracks": args.tracks, "file_bytes": os.path.getsize(path),
+                  "record_frames_per_s": frames / seconds}
+        result.update(replay(path, args.samples))
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    mib = 1 / (1 << 20)
+    print(f"{args.hours:g} h, {args.tracks} tracks, {result['frames']} frames: {result['file_bytes'] * mib:.1f} MiB, "
+          f"recorded at {result['record_frames_per_s']:.0f} frames/s")
+    print(f"open {result['open_ms']:.2f} ms (+{result['open_rss_growth'] * mib:.2f} MiB RSS), "
+          f"sequential sample {result['sequential_us']:.1f} us, random seek {result['random_seek_us']:.1f} us "
+          f"(+{result['rss_growth_after_100_seeks'] * mib:.2f} MiB RSS after 100 seeks)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Parity check and speed comparison: built-in NumPy OBJ parser vs. pywavefront.
+
+Every .obj file under data/ (or the given files) is parsed by both. Material names, order, vertex formats,
+material parameters and interleaved vertex data must match exactly; also when the NumPy parser reads the
+file in small blocks, which moves block boundaries across statements. Exits with status 1 on a mismatch.
+
+Run from the repository root: python benchmarks/bench_obj_parser.py [file.obj ...]
+"""
+import glob
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import mesh_cache
+import obj_parser
+
+BLOCK_SIZES = (64, 4096, obj_parser.BLOCK_SIZE)
+
+
+def compare(path: str) -> list:
+    """Differences between both parsers' chunks of given file, empty if there are none."""
+    reference, reference_dependencies = mesh_cache._parse_obj_pywavefront(path)
+    problems = []
+    for block_size in BLOCK_SIZES:
+        materials, vertices, mtllibs = obj_parser.parse_obj(path, block_size=block_size)
+        if [m.name for m in materials] != [c.name for c in reference]:
+            problems.append(f"block size {block_size}: materials {[m.name for m in materials]}, "
+                            f"pywavefront {[c.name for c in reference]}")
+            continue
+        for m, chunk in zip(materials, reference):
+            texture = os.path.relpath(m.texture, os.path.dirname(path) or ".") if m.texture is not None else None
+            expected = (chunk.vertex_format, chunk.vertex_size, list(chunk.ambient), list(chunk.diffuse),
+                        list(chunk.specular), chunk.shininess, chunk.dissolve, chunk.texture)
+            actual = (m.vertex_format, m.vertex_size, list(np.float32(m.ambient)), list(np.float32(m.diffuse)),
+                      list(np.float32(m.specular)), m.shininess, m.dissolve, texture)
+            if actual != expected:
+                problems.append(f"block size {block_size}, {m.name}: {actual}, pywavefront {expected}")
+            if not np.array_equal(vertices[m.name], chunk.vertices):
+                problems.append(f"block size {block_size}, {m.name}: vertex data differs")
+        if [path] + mtllibs != reference_dependencies:
+            problems.append(f"block size {block_size}: dependencies {[path] + mtllibs}, "
+                            f"pywavefront {reference_dependencies}")
+    return problems
+
+
+def run(paths: list, repeat: int = 3) -> list:
+    results = []
+    for path in paths:
+        row = {"file": os.path.basename(path), "size_mb": os.path.getsize(path) / 1e6}
+        row["numpy"] = min(timeit.repeat(lambda: obj_parser.parse_obj(path), number=1, repeat=repeat))
+        row["pywavefront"] = min(timeit.repeat(lambda: mesh_cache._parse_obj_pywavefront(path), number=1,
+                                               repeat=repeat))
+        row["problems"] = compare(path)
+        results.append(row)
+    return results
+
+
+def main() -> None:
+    import logging
+    logging.getLogger("pywavefront").setLevel(logging.ERROR)  # Unsupported statement warnings
+
+    paths = sys.argv[1:] or sorted(glob.glob("data/*.obj"))
+    print(f"{'file':<16} {'MB':>6} {'numpy':>10} {'pywavefront':>12} {'speedup':>8}  parity")
+    failed = False
+    for r in run(paths):
+        print(f"{r['file']:<16} {r['size_mb']:>6.2f} {r['numpy'] * 1e3:>8.1f}ms {r['pywavefront'] * 1e3:>10.1f}ms "
+              f"{r['pywavefront'] / r['numpy']:>7.1f}x  {'ok' if not r['problems'] else 'FAILED'}")
+        for problem in r["problems"]:
+            print("    " + problem)
+        failed = failed or bool(r["problems"])
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Offline rendering benchmark: throughput of headless.py as worker processes are added.
+
+Every configuration renders the same clip (moving camera, raw frames to a pipe that discards them) with
+1, 2, 4, ... workers and reports wall time, frames per second and the speedup over one worker. Workers set
+up their own GL context and scene, so the setup time (paid once per worker, in parallel) is included, as it
+is for a real render. The first configuration's frames are checksummed against every other's to check that
+splitting the clip into blocks doesn't change the images.
+
+Software rasterizers share the machine's cores between the workers (see headless._init_worker), so the
+speedup is bounded by the cores, and by the GPU with hardware drivers.
+
+Run from the repository root: python benchmarks/bench_offline_render.py [--workers 1 2 4] [--end 4]
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from time import perf_counter
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def measure(args, workers: int) -> dict:
+    """Renders the clip with given workers into a pipe, returns wall time and a checksum of the frames."""
+    command = [sys.executable, "headless.py", "--time", str(args.time), "--end", str(args.end), "--fps",
+               str(args.fps), "--width", str(args.width), "--height", str(args.height), "--camera", "moving",
+               "-j", str(workers), "--block", str(args.block), "-o", "-"]
+    checksum = hashlib.sha1()
+    start = perf_counter()
+    with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as process:
+        for data in iter(lambda: process.stdout.read(1 << 20), b""):
+            checksum.update(data)
+    seconds = perf_counter() - start
+    if process.returncode:
+        raise RuntimeError(f"{' '.join(command)} failed with exit code {process.returncode}")
+    frames = round((args.end - args.time) * args.fps)
+    return {"workers": workers, "seconds": seconds, "fps": frames / seconds, "checksum": checksum.hexdigest()}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Offline rendering throughput per number of worker processes.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="worker processes to compare")
+    parser.add_argument("--time", type=float, default=10.0, help="start of the clip in seconds")
+    parser.add_argument("--end", type=float, default=14.0, help="end of the clip in seconds")
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--block", type=int, default=15, help="frames per block handed to a worker")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    os.chdir(ROOT)  # Scene paths are relative to the repository root
+    print(f"{os.cpu_count()} CPU(s)", file=sys.stderr)
+    results = [measure(args, workers) for workers in args.workers]
+    for r in results:
+        r["speedup"] = results[0]["seconds"] / r["seconds"]
+        r["same_frames"] = r["checksum"] == results[0]["checksum"]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'workers':>7} {'wall':>8} {'fps':>7} {'speedup':>7} {'same frames':>11}")
+    for r in results:
+        print(f"{r['workers']:>7} {r['seconds']:>7.1f}s {r['fps']:>7.1f} {r['speedup']:>6.2f}x "
+              f"{str(r['same_frames']):>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Microbenchmark: per-object transform functions vs. the batched Arithmetic API.
+
+Run from the repository root: python benchmarks/bench_transforms.py
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import Arithmetic
+import lookAt
+
+
+def per_object(translations, y_rotations, z_rotations, scales):
+    """Current per-object path: one fresh 4x4 float64 array per call."""
+    models = []
+    for t, y, z, s in zip(translations, y_rotations, z_rotations, scales):
+        m = Arithmetic.create_from_translation(t)
+        m = Arithmetic.multiply(Arithmetic.create_from_y_rotation(y), m)
+        m = Arithmetic.multiply(Arithmetic.create_from_z_rotation(z), m)
+        models.append(Arithmetic.multiply(Arithmetic.create_from_scale([s] * 3), m))
+    return models
+
+
+def run(counts=(1, 10, 100, 1000, 10000), repeat: int = 5) -> list:
+    rng = np.random.default_rng(0)
+    results = []
+    for n in counts:
+        translations = rng.normal(size=(n, 3))
+        y_rotations, z_rotations = rng.normal(size=n), rng.normal(size=n)
+        scales = rng.uniform(0.5, 2.0, size=n)
+        out = np.empty((n, 4, 4), dtype=np.float32)
+        eyes = rng.normal(size=(n, 3))
+
+        number = max(1, 2000 // n)
+        timings = {
+            "per_object": lambda: per_object(translations, y_rotations, z_rotations, scales),
+            "batched": lambda: Arithmetic.compose(translations, y_rotations, z_rotations, scales, out=out),
+            "look_at_per_object": lambda: [lookAt.create_look_at(e, (0, 0, 0), (0, 1, 0)) for e in eyes],
+            "look_at_batched": lambda: lookAt.create_look_at(eyes, (0, 0, 0), (0, 1, 0), out=out),
+        }
+        row = {"n": n}
+        for name, fn in timings.items():
+            row[name] = min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+        results.append(row)
+    return results
+
+
+def main() -> None:
+    print(f"{'N':>6} {'per object':>12} {'batched':>12} {'speedup':>8} {'lookAt per obj':>15} {'lookAt batched':>15}")
+    for r in run():
+        print(f"{r['n']:>6} {r['per_object'] * 1e3:>10.3f}ms {r['batched'] * 1e3:>10.3f}ms "
+              f"{r['per_object'] / r['batched']:>7.1f}x {r['look_at_per_object'] * 1e3:>13.3f}ms "
+              f"{r['look_at_batched'] * 1e3:>13.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Vertex memory benchmark: resident memory and vertex buffer sizes of the bundled models per vertex layout.
+
+Every configuration loads all .obj files under data/ in a fresh process (offscreen EGL context) and reports
+the process' resident set size before and after, and the bytes of its vertex and index buffers:
+
+- float, CPU copies kept: float vertices, with every material chunk's vertices and indices kept alive
+  after the upload, as meshes did before they released them;
+- float: float vertices (T2F_N3F_V3F: 32 bytes), CPU geometry dropped after the upload;
+- compact: quantized vertices (16 bytes, see vertex_format.py), CPU geometry dropped after the upload.
+
+Software rasterizers keep buffer storage in process memory, so there the buffers count towards RSS too.
+
+Run from the repository root: python benchmarks/bench_vertex_memory.py [--json]
+"""
+import argparse
+import gc
+import glob
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+CONFIGS = {
+    "float, CPU copies kept": ("float", True),
+    "float": ("float", False),
+    "compact": ("compact", False),
+}
+
+
+def resident_bytes() -> int:
+    """Resident set size of this process."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def measure(layout: str, keep: bool) -> dict:
+    """Loads the bundled models with given vertex layout (in this process), returns memory and buffer sizes."""
+    os.environ["PYOPENGL_PLATFORM"] = "egl"  # Before the first OpenGL import
+    from gl_context import EglContext
+    import numpy as np
+    import mesh_cache
+    from asset_registry import AssetRegistry
+
+    context = EglContext(64, 64)
+    registry = AssetRegistry(texture_arrays=True, vertex_layout=layout)
+    paths = sorted(glob.glob(os.path.join("data", "*.obj")))
+    for path in paths:
+        mesh_cache.load(path)  # Builds missing caches before measuring
+    gc.collect()
+    before = resident_bytes()
+
+    kept = []
+    meshes = []
+    for path in paths:
+        chunks = mesh_cache.load(path)
+        for chunk in chunks:  # Paged in like AssetLoader does
+            chunk.vertices, chunk.indices = np.array(chunk.vertices), np.array(chunk.indices)
+        if keep:
+            kept += [(chunk.vertices, chunk.indices) for chunk in chunks]
+        registry.preload_mesh(path, chunks)
+        meshes.append(registry.acquire_mesh(path))
+    gc.collect()
+    after = resident_bytes()
+
+    result = {
+        "models": len(paths),
+        "rss_before": before,
+        "rss_after": after,
+        "vertex_buffer_bytes": sum(mesh.vertex_bytes for mesh in meshes),
+        "index_buffer_bytes": sum(mesh.index_bytes for mesh in meshes),
+        "cpu_geometry_bytes": sum(vertices.nbytes + indices.nbytes for vertices, indices in kept),
+    }
+    for path in paths:
+        registry.release_mesh(path)
+    context.terminate()
+    return result
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Resident memory and vertex buffer sizes per vertex layout.")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    parser.add_argument("--measure", choices=CONFIGS, help=argparse.SUPPRESS)  # Child process of one config
+    args = parser.parse_args(argv)
+
+    os.chdir(ROOT)  # Scene paths are relative to the repository root
+    if args.measure:
+        print(json.dumps(measure(*CONFIGS[args.measure])))
+        return
+
+    results = {}
+    for name in CONFIGS:  # Fresh process each, so memory freed by earlier runs doesn't hide growth
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--measure", name],
+                                check=True, capture_output=True, text=True).stdout
+        results[name] = json.loads(output.splitlines()[-1])
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    mib = 1 / (1 << 20)
+    print(f"{'layout':<24} {'RSS growth':>11} {'vertex VBO':>11} {'index EBO':>10} {'CPU copies':>11}")
+    for name, r in results.items():
+        print(f"{name:<24} {(r['rss_after'] - r['rss_before']) * mib:>8.2f}MiB "
+              f"{r['vertex_buffer_bytes'] * mib:>8.2f}MiB {r['index_buffer_bytes'] * mib:>7.2f}MiB "
+              f"{r['cpu_geometry_bytes'] * mib:>8.2f}MiB")
+
+
+if __name__ == '__main__':
+    main()
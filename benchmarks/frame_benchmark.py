@@ -0,0 +1,221 @@
+"""Benchmark suite: deterministic frame timeline plus microbenchmarks, reported as JSON.
+
+The scene is rendered offscreen on a fixed-step clock while a scripted input timeline (camera modes,
+movement, cockpit rotation) is replayed, so two runs render exactly the same frames. Reported are
+frame time percentiles, CPU time per profiler scope, GPU time per pass and GL calls per frame,
+followed by microbenchmarks of OBJ and texture loading (source vs. cache) and the transform math.
+
+Run from the repository root: python benchmarks/frame_benchmark.py [--frames 600] [-o results.json]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import timeit
+from time import perf_counter
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Default input timeline (10 s): every camera mode, WASD/QE movement and cockpit rotation
+TIMELINE = [
+    {"t": 0.0, "key": "1"},
+    {"t": 1.5, "key": "2"},
+    {"t": 2.0, "key": "W", "until": 3.0},
+    {"t": 3.0, "key": "3"},
+    {"t": 3.2, "key": "A", "until": 3.8},
+    {"t": 3.8, "key": "LEFT", "until": 4.4},
+    {"t": 4.4, "key": "E", "until": 4.8},
+    {"t": 4.8, "key": "UP", "until": 5.0},
+    {"t": 5.0, "key": "S", "until": 6.5},
+    {"t": 6.0, "key": "RIGHT", "until": 7.0},
+    {"t": 7.0, "key": "2"},
+    {"t": 7.5, "key": "D", "until": 8.5},
+    {"t": 8.5, "key": "Q", "until": 8.9},
+    {"t": 9.0, "key": "1"},
+]
+
+
+def summarize(values, scale: float = 1.0) -> dict:
+    """Mean, percentiles and maximum of values, multiplied by scale."""
+    values = np.asarray(values, dtype=np.float64) * scale
+    if len(values) == 0:
+        return {}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"mean": float(values.mean()), "p50": float(p50), "p95": float(p95), "p99": float(p99),
+            "max": float(values.max())}
+
+
+def run_frames(args) -> dict:
+    """Renders the timeline offscreen, returns frame statistics."""
+    if args.backend == "egl":
+        os.environ["PYOPENGL_PLATFORM"] = "egl"  # Before the first OpenGL import
+    from OpenGL.GL import glFinish, glGetString, GL_RENDERER
+    from gl_context import EglContext, GlfwContext
+    from offscreen import OffscreenTarget
+    from gl_state import state
+    from profiler import profiler
+    from clock import FixedStepClock
+    from input_script import InputScript
+    from main import Window
+    import asset_registry
+
+    asset_registry.registry.vertex_layout = args.vertex_layout  # Before the first mesh is loaded
+
+    if args.backend == "egl":
+        context = EglContext(args.width, args.height)
+    else:
+        context = GlfwContext(args.width, args.height, "AirBUS A380 Modeling", visible=False)
+    target = OffscreenTarget(args.width, args.height)
+    target.bind()
+    window = Window(args.width, args.height, "AirBUS A380 Modeling", context=context)
+    window.loader.finish()  # Complete scene from the first frame on
+    window.use_deferred = args.deferred
+
+    # Warm up (shader compilation, driver caches) before the timeline starts
+    for index in range(args.warmup):
+        window.render_frame(index / args.fps)
+    glFinish()
+    state.reset_counters()
+    profiler.enabled = True
+    profiler.tracing = args.trace is not None
+
+    clock = FixedStepClock(0.0, 1 / args.fps)
+    window.input_script = InputScript.load(args.script) if args.script else InputScript(TIMELINE)
+    frame_times, gl_calls, skipped, draw_calls = [], [], [], []
+    stage_times, gpu_times = {}, {}
+    for _ in range(args.frames):
+        t = clock.tick()
+        start = perf_counter()
+        window.render_frame(t)
+        glFinish()  # Include GPU work in the frame time
+        frame_times.append(perf_counter() - start)
+
+        issued, avoided = state.reset_counters()
+        gl_calls.append(issued + window.render_queue.draw_calls)
+        skipped.append(avoided)
+        draw_calls.append(window.render_queue.draw_calls)
+        for name, seconds in profiler.last_frame.items():
+            stage_times.setdefault(name, []).append(seconds)
+        for name, seconds in profiler.last_gpu.items():
+            gpu_times.setdefault(name, []).append(seconds)
+    profiler.enabled = False
+    if args.trace:
+        profiler.export_chrome_trace(args.trace)
+
+    result = {
+        "renderer": glGetString(GL_RENDERER).decode(),
+        "shader_programs_ms": shader_programs(window),
+        "frame_ms": summarize(frame_times, 1e3),
+        "stages_ms": {name: summarize(times, 1e3) for name, times in stage_times.items()},
+        "gpu_passes_ms": {name: summarize(times, 1e3) for name, times in gpu_times.items()},
+        "gl_calls_per_frame": summarize(gl_calls),
+        "gl_calls_skipped_per_frame": summarize(skipped),
+        "draw_calls_per_frame": summarize(draw_calls),
+    }
+    target.delete()
+    window.loader.shutdown()
+    context.terminate()
+    return result
+
+
+def shader_programs(window, repeat: int = 3) -> dict:
+    """
+    Time to create the programs the timeline used, compiled from source and loaded from the binary cache.
+    Drivers with their own shader cache (e.g. Mesa unless MESA_SHADER_CACHE_DISABLE=true) compile faster.
+    """
+    from OpenGL.GL import glDeleteProgram
+    import program_cache
+    from shader import Shader
+
+    shaders = []
+    for shader in window.shaders.values():
+        shaders += getattr(shader, "variants", [shader])
+    programs = [(shader._vs_path, shader._fs_path, shader.defines) for shader in shaders]
+
+    def create() -> None:
+        for vs, fs, defines in programs:
+            glDeleteProgram(Shader(vs, fs, defines).program)
+
+    result = {"programs": len(programs)}
+    for name, cache in (("source", False), ("binary_cache", True)):
+        program_cache.enabled = cache
+        result[name] = min(timeit.repeat(create, number=1, repeat=repeat)) * 1e3
+    return result
+
+
+def run_micro(repeat: int = 3) -> dict:
+    """Microbenchmarks of OBJ and texture loading (from source and cached), and transform math, in ms."""
+    import mesh_cache
+    import texture_cache
+    from PIL import Image
+    import bench_transforms
+
+    data = os.path.join(ROOT, "data")
+    obj_loading = {}
+    for path in sorted(glob.glob(os.path.join(data, "*.obj"))):
+        if mesh_cache.read_cache(path) is None:
+            mesh_cache.build_cache(path)
+        parse = min(timeit.repeat(lambda: mesh_cache._parse_obj(path), number=1, repeat=repeat))
+        cached = min(timeit.repeat(lambda: [np.asarray(chunk.vertices).sum() for chunk in mesh_cache.load(path)],
+                                   number=1, repeat=repeat))
+        obj_loading[os.path.basename(path)] = {"parse": parse * 1e3, "cached": cached * 1e3}
+
+    def decode(path: str) -> list:
+        # Same steps as texture_cache.build_cache, without writing the file
+        image = Image.open(path).convert("RGBA").transpose(Image.FLIP_TOP_BOTTOM)
+        return texture_cache.mip_chain(np.asarray(image))
+
+    texture_loading = {}
+    for path in sorted(glob.glob(os.path.join(data, "*.jpg")) + glob.glob(os.path.join(data, "*.png"))):
+        if texture_cache.read_cache(path) is None:
+            texture_cache.build_cache(path)
+        decoded = min(timeit.repeat(lambda: decode(path), number=1, repeat=repeat))
+        cached = min(timeit.repeat(lambda: [pixels.sum() for _, _, pixels in texture_cache.load(path)],
+                                   number=1, repeat=repeat))
+        texture_loading[os.path.basename(path)] = {"decode": decoded * 1e3, "cached": cached * 1e3}
+
+    transforms = [{name: value * 1e3 if name != "n" else value for name, value in row.items()}
+                  for row in bench_transforms.run(counts=(1, 100, 10000), repeat=repeat)]
+    return {"obj_loading_ms": obj_loading, "texture_loading_ms": texture_loading, "transforms_ms": transforms}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Frame timeline benchmark and microbenchmarks, as JSON.")
+    parser.add_argument("-n", "--frames", type=int, default=600, help="frames of the timeline to render")
+    parser.add_argument("--warmup", type=int, default=30, help="frames rendered before measuring")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=float, default=60.0, help="simulated frames per second")
+    parser.add_argument("--script", help="JSON input script instead of the built-in timeline")
+    parser.add_argument("--backend", choices=("egl", "glfw"), default="egl")
+    parser.add_argument("--deferred", action="store_true", help="deferred shading instead of forward shading")
+    parser.add_argument("--vertex-layout", choices=("float", "compact"), default="float",
+                        help="vertex buffer layout of meshes (compact: quantized, half the size)")
+    parser.add_argument("--no-micro", action="store_true", help="skip microbenchmarks")
+    parser.add_argument("--trace", help="Chrome trace event JSON file to write for the timeline")
+    parser.add_argument("-o", "--output", help="JSON file to write (default: stdout)")
+    args = parser.parse_args(argv)
+
+    os.chdir(ROOT)  # Scene paths are relative to the repository root
+    result = {"config": {"frames": args.frames, "warmup": args.warmup, "width": args.width, "height": args.height,
+                         "fps": args.fps, "script": args.script, "backend": args.backend,
+                         "deferred": args.deferred, "vertex_layout": args.vertex_layout}}
+    result.update(run_frames(args))
+    if not args.no_micro:
+        result["micro"] = run_micro()
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+import numpy as np
+import lookAt
+import Perspective_projection
+from Vector3 import Vector3 as v3
+import Vector3
+from uniform_buffer import UniformBuffer, CAMERA_VIEW_OFFSET, CAMERA_PROJECTION_OFFSET, CAMERA_VIEW_POS_OFFSET
+from scene_graph import SceneNode
+
+
+class Camera:
+    def __init__(self, eye: v3, target: v3, up: v3, fov: float, aspect: float, near: float, far: float):
+        """Perspective camera whose matrices are rebuilt only after one of their inputs changed.
+
+        :param eye: Camera position.
+        :param target: Looked at point.
+        :param up: Up vector.
+        :param fov: Vertical field of view in degrees.
+        :param aspect: Width / height.
+        :param near: Near clipping plane distance.
+        :param far: Far clipping plane distance.
+        """
+        self._eye, self._target, self._up = v3(eye), v3(target), v3(up)
+        self._fov, self._aspect, self._near, self._far = fov, aspect, near, far
+        self._view_matrix, self._projection_matrix = None, None
+        # Dirty flags: matrix needs rebuild / block needs write
+        self._view_dirty, self._projection_dirty = True, True
+        self._view_written, self._projection_written = False, False
+        # Scene graph node the eye follows
+        self._node: SceneNode = None
+        self._node_version: int = -1
+
+    def attach(self, node: SceneNode) -> None:
+        """Makes the eye follow the position of a scene graph node (None to detach)."""
+        self._node, self._node_version = node, -1
+
+    def _sync_node(self) -> None:
+        if self._node is not None and self._node.version != self._node_version:
+            self._node_version = self._node.version
+            self._set_view_input("_eye", Vector3.from_matrix44_translation(self._node.world))
+
+    def _set_view_input(self, name: str, value) -> None:
+        value = v3(value)
+        if not np.array_equal(getattr(self, name), value):
+            setattr(self, name, value)
+            self._view_dirty, self._view_written = True, False
+
+    def _set_projection_input(self, name: str, value: float) -> None:
+        if getattr(self, name) != value:
+            setattr(self, name, value)
+            self._projection_dirty, self._projection_written = True, False
+
+    @property
+    def eye(self):
+        self._sync_node()
+        return self._eye
+
+    @eye.setter
+    def eye(self, value) -> None:
+        self._set_view_input("_eye", value)
+
+    @property
+    def target(self):
+        return self._target
+
+    @target.setter
+    def target(self, value) -> None:
+        self._set_view_input("_target", value)
+
+    @property
+    def up(self):
+        return self._up
+
+    @up.setter
+    def up(self, value) -> None:
+        self._set_view_input("_up", value)
+
+    @property
+    def fov(self):
+        return self._fov
+
+    @fov.setter
+    def fov(self, value) -> None:
+        self._set_projection_input("_fov", value)
+
+    @property
+    def aspect(self):
+        return self._aspect
+
+    @aspect.setter
+    def aspect(self, value) -> None:
+        self._set_projection_input("_aspect", value)
+
+    @property
+    def near(self):
+        return self._near
+
+    @near.setter
+    def near(self, value) -> None:
+        self._set_projection_input("_near", value)
+
+    @property
+    def far(self):
+        return self._far
+
+    @far.setter
+    def far(self, value) -> None:
+        self._set_projection_input("_far", value)
+
+    @property
+    def view_matrix(self) -> np.ndarray:
+        self._sync_node()
+        if self._view_dirty:
+            self._view_matrix = lookAt.create_look_at(self._eye, self._target, self._up)
+            self._view_dirty = False
+        return self._view_matrix
+
+    @property
+    def projection_matrix(self) -> np.ndarray:
+        if self._projection_dirty:
+            self._projection_matrix = Perspective_projection.create_perspective_projection(
+                self._fov, self._aspect, self._near, self._far)
+            self._projection_dirty = False
+        return self._projection_matrix
+
+    def update_block(self, block: UniformBuffer) -> None:
+        """Writes matrices that changed since the last call into the camera uniform block."""
+        self._sync_node()
+        if not self._view_written:
+            block.write(CAMERA_VIEW_OFFSET, self.view_matrix)
+            block.write(CAMERA_VIEW_POS_OFFSET, self._eye)
+            self._view_written = True
+        if not self._projection_written:
+            block.write(CAMERA_PROJECTION_OFFSET, self.projection_matrix)
+            self._projection_written = True
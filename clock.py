@@ -0,0 +1,33 @@
+import time
+
+
+class WallClock:
+    def __init__(self):
+        """Real time since creation, for interactive use."""
+        self._start = time.perf_counter()
+
+    def tick(self) -> float:
+        """Time of the next frame in seconds."""
+        return time.perf_counter() - self._start
+
+
+class FixedStepClock:
+    def __init__(self, start: float = 0.0, step: float = 1 / 60):
+        """Simulated time advancing by a fixed step every frame, so runs are reproducible.
+
+        :param start: Time of the first frame in seconds.
+        :param step: Frame duration in seconds.
+        """
+        self.start = start
+        self.step = step
+        self.frame = 0
+
+    def time(self, frame: int) -> float:
+        """Time of given frame (0 is the first) in seconds."""
+        return self.start + frame * self.step
+
+    def tick(self) -> float:
+        """Time of the next frame in seconds."""
+        t = self.time(self.frame)
+        self.frame += 1
+        return t
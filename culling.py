@@ -0,0 +1,264 @@
+import numpy as np
+
+
+# Projected bounding sphere radius (fraction of half the viewport height) below which the next coarser
+# level of detail is used
+LOD_SCREEN_SIZES = np.array([0.25, 0.1, 0.04])
+# Relative band around the thresholds in which the current level is kept, against popping
+LOD_HYSTERESIS = 0.15
+
+
+class Bounds:
+    def __init__(self, aabb_min, aabb_max, center, radius: float):
+        """Axis aligned box and bounding sphere of a set of points, in their local space.
+
+        :param aabb_min: Minimum corner (3 floats).
+        :param aabb_max: Maximum corner (3 floats).
+        :param center: Sphere center (3 floats).
+        :param radius: Sphere radius.
+        """
+        self.aabb_min = np.array(aabb_min, dtype=np.float32)
+        self.aabb_max = np.array(aabb_max, dtype=np.float32)
+        self.center = np.array(center, dtype=np.float32)
+        self.radius = float(radius)
+
+    @staticmethod
+    def from_points(points: np.ndarray):
+        """Bounds of points of shape (N,3). The sphere is centered on the box, its radius is the farthest point."""
+        if len(points) == 0:
+            return Bounds(np.zeros(3), np.zeros(3), np.zeros(3), 0.0)
+        aabb_min, aabb_max = points.min(axis=0), points.max(axis=0)
+        center = (aabb_min + aabb_max) / 2
+        radius = np.sqrt(np.max(np.sum((points - center) ** 2, axis=1)))
+        return Bounds(aabb_min, aabb_max, center, radius)
+
+    @staticmethod
+    def union(bounds: list):
+        """Bounds enclosing all given bounds."""
+        aabb_min = np.min([b.aabb_min for b in bounds], axis=0)
+        aabb_max = np.max([b.aabb_max for b in bounds], axis=0)
+        center = (aabb_min + aabb_max) / 2
+        radius = max(np.linalg.norm(b.center - center) + b.radius for b in bounds)
+        return Bounds(aabb_min, aabb_max, center, radius)
+
+    def to_dict(self) -> dict:
+        return {"min": self.aabb_min.tolist(), "max": self.aabb_max.tolist(), "center": self.center.tolist(),
+                "radius": self.radius}
+
+    @staticmethod
+    def from_dict(d: dict):
+        return Bounds(d["min"], d["max"], d["center"], d["radius"])
+
+
+def transform_spheres(centers: np.ndarray, radii: np.ndarray, models: np.ndarray) -> (np.ndarray, np.ndarray):
+    """
+    Moves bounding spheres into world space.
+
+    :param centers: Local sphere centers, shape (N,3).
+    :param radii: Local radii, shape (N,).
+    :param models: Model matrix of each sphere, shape (N,4,4) (Arithmetic convention: translation in row 3).
+    :return: World centers (N,3) and radii (N,), scaled by the largest axis scale.
+    """
+    world = np.einsum("ni,nij->nj", centers, models[:, :3, :3]) + models[:, 3, :3]
+    scale = np.sqrt(np.max(np.sum(models[:, :3, :3] ** 2, axis=2), axis=1))
+    return world, radii * scale
+
+
+def motion_spheres(centers: np.ndarray, radii: np.ndarray, models: np.ndarray, margins: np.ndarray) \
+        -> (np.ndarray, np.ndarray):
+    """
+    World spheres containing local spheres wherever a parametric motion (see animation.Motion) takes them:
+    centered on the model origin, as they turn about it, grown by how far the motion moves the origin.
+
+    :param margins: Motion.margin of each sphere, shape (N,).
+    :return: World centers (N,3) and radii (N,).
+    """
+    world, radii = transform_spheres(centers, radii, models)
+    origins = models[:, 3, :3]
+    return origins, radii + np.sqrt(np.sum((world - origins) ** 2, axis=1)) + margins
+
+
+class Frustum:
+    def __init__(self):
+        """View frustum as six normalized planes (a, b, c, d), inside where a*x + b*y + c*z + d >= 0.
+
+        Also counts objects and triangles it culled since the last update().
+        """
+        self.planes = np.zeros((6, 4))
+        self._depth_axis = np.array([0.0, 0.0, -1.0, 0.0])  # View space depth of a world point (x, y, z, 1)
+        self._projection_scale = 1.0  # Cotangent of half the vertical field of view
+        self.objects_tested = 0
+        self.objects_culled = 0
+        self.triangles_culled = 0
+
+    def update(self, view: np.ndarray, projection: np.ndarray) -> None:
+        """
+        Extracts planes from camera matrices and resets the counters.
+
+        With row vectors clip = p . view . projection, so view @ projection plays the role of
+        projection * view in the column-vector formulation; planes are sums of its columns.
+        """
+        m = np.asarray(view, dtype=np.float64) @ np.asarray(projection, dtype=np.float64)
+        x, y, z, w = m[:, 0], m[:, 1], m[:, 2], m[:, 3]
+        planes = np.array([w + x, w - x, w + y, w - y, w + z, w - z])
+        self.planes = planes / np.linalg.norm(planes[:, :3], axis=1)[:, np.newaxis]
+        self._depth_axis = -np.asarray(view, dtype=np.float64)[:, 2]
+        self._projection_scale = float(projection[1][1])
+        self.objects_tested = self.objects_culled = self.triangles_culled = 0
+
+    def distances(self, centers: np.ndarray) -> np.ndarray:
+        """Signed distances of points (N,3) to all planes, shape (N,6)."""
+        return centers @ self.planes[:, :3].T + self.planes[:, 3]
+
+    def test_spheres(self, centers: np.ndarray, radii: np.ndarray) -> np.ndarray:
+        """Boolean mask of spheres intersecting the frustum."""
+        return np.all(self.distances(centers) >= -radii[:, np.newaxis], axis=1)
+
+    def screen_sizes(self, centers: np.ndarray, radii: np.ndarray) -> np.ndarray:
+        """Projected radii of spheres as a fraction of half the viewport height (inf if the camera is inside)."""
+        depth = centers @ self._depth_axis[:3] + self._depth_axis[3]
+        with np.errstate(divide="ignore"):
+            return np.where(depth > radii, radii * self._projection_scale / depth, np.inf)
+
+    def cull(self, meshes: list, models: list, levels: list = None, margins: list = None) -> list:
+        """
+        Tests material chunks of many meshes in one vectorized pass.
+
+        :param meshes: Meshes with per-chunk centers, radii, triangles and lods.
+        :param models: World matrix of each mesh.
+        :param levels: Current level of detail of each chunk, one int array per mesh, updated in place.
+                       None to skip LOD selection.
+        :param margins: Motion.margin of each mesh animated by the vertex shader, None for static meshes
+                        (see motion_spheres). None if all are static.
+        :return: Boolean mask of visible chunks for each mesh.
+        """
+        if not meshes:
+            return []
+        counts = [len(mesh.radii) for mesh in meshes]
+        owner = np.repeat(np.arange(len(meshes)), counts)
+        models = np.asarray(models, dtype=np.float64)[owner]
+        local_centers = np.concatenate([mesh.centers for mesh in meshes])
+        local_radii = np.concatenate([mesh.radii for mesh in meshes])
+        centers, radii = transform_spheres(local_centers, local_radii, models)
+        if margins is not None:
+            margin = np.array([np.nan if m is None else m for m in margins])[owner]
+            animated = ~np.isnan(margin)
+            if animated.any():
+                centers[animated], radii[animated] = motion_spheres(local_centers[animated], local_radii[animated],
+                                                                    models[animated], margin[animated])
+        visible = self.test_spheres(centers, radii)
+
+        triangles = np.concatenate([mesh.triangles for mesh in meshes])
+        self.objects_tested += len(visible)
+        self.objects_culled += int(np.count_nonzero(~visible))
+        self.triangles_culled += int(triangles[~visible].sum())
+
+        splits = np.cumsum(counts)[:-1]
+        if levels is not None:
+            current = np.concatenate(levels)
+            available = np.array([len(lods) - 1 for mesh in meshes for lods in mesh.lods])
+            selected = select_lods(current, self.screen_sizes(centers, radii), available)
+            for level, new in zip(levels, np.split(selected, splits)):
+                level[:] = new
+        return np.split(visible, splits)
+
+
+def select_lods(current: np.ndarray, sizes: np.ndarray, available: np.ndarray) -> np.ndarray:
+    """
+    Chooses levels of detail from projected sizes, with hysteresis.
+
+    A level switch happens only once the size is LOD_HYSTERESIS beyond a threshold, otherwise the
+    current level is kept.
+
+    :param current: Current levels.
+    :param sizes: Projected sizes (see Frustum.screen_sizes).
+    :param available: Coarsest level of each item.
+    :return: New levels.
+    """
+    sizes = sizes[:, np.newaxis]
+    min_level = np.sum(sizes < LOD_SCREEN_SIZES * (1 - LOD_HYSTERESIS), axis=1)
+    max_level = np.sum(sizes < LOD_SCREEN_SIZES * (1 + LOD_HYSTERESIS), axis=1)
+    return np.minimum(np.clip(current, min_level, max_level), available)
+
+
+class BVH:
+    def __init__(self, centers: np.ndarray, radii: np.ndarray, leaf_size: int = 8):
+        """Bounding volume hierarchy of spheres, built top-down by median split along the widest axis.
+
+        Nodes are stored in flat arrays; every node covers a contiguous range of self.order.
+
+        :param centers: Sphere centers, shape (N,3).
+        :param radii: Sphere radii, shape (N,).
+        :param leaf_size: Maximum number of spheres in a leaf.
+        """
+        self.centers = np.asarray(centers, dtype=np.float64)
+        self.radii = np.asarray(radii, dtype=np.float64)
+        self.order = np.arange(len(self.radii))
+        node_centers, node_radii, starts, ends, children = [], [], [], [], []
+
+        stack = [(0, len(self.radii), -1, 0)]  # start, end, parent node, child slot
+        while stack:
+            start, end, parent, slot = stack.pop()
+            items = self.order[start:end]
+            c, r = self.centers[items], self.radii[items]
+            lo, hi = (c - r[:, np.newaxis]).min(axis=0), (c + r[:, np.newaxis]).max(axis=0)
+            center = (lo + hi) / 2
+            node = len(starts)
+            node_centers.append(center)
+            node_radii.append(np.max(np.linalg.norm(c - center, axis=1) + r))
+            starts.append(start)
+            ends.append(end)
+            children.append([-1, -1])
+            if parent >= 0:
+                children[parent][slot] = node
+
+            if end - start > leaf_size:
+                axis = np.argmax(c.max(axis=0) - c.min(axis=0))
+                mid = (end - start) // 2
+                split = np.argpartition(c[:, axis], mid)
+                self.order[start:end] = items[split]
+                stack.append((start + mid, end, node, 1))
+                stack.append((start, start + mid, node, 0))
+
+        self.node_centers = np.array(node_centers).reshape(-1, 3)
+        self.node_radii = np.array(node_radii)
+        self.starts, self.ends = np.array(starts), np.array(ends)
+        self.children = np.array(children).reshape(-1, 2)
+
+    def query(self, frustum: Frustum) -> np.ndarray:
+        """
+        Sorted indices of spheres intersecting the frustum.
+
+        Traverses breadth first, one vectorized test per tree level. Subtrees fully inside are accepted
+        without descending, only spheres of partially visible leaves are tested one by one.
+        """
+        if len(self.radii) == 0:
+            return np.zeros(0, dtype=np.int64)
+        accepted, tested = [], []
+        frontier = np.zeros(1, dtype=np.int64)
+        while len(frontier):
+            dist = frustum.distances(self.node_centers[frontier])
+            r = self.node_radii[frontier][:, np.newaxis]
+            outside = np.any(dist < -r, axis=1)
+            inside = np.all(dist >= r, axis=1)
+            accepted.append(frontier[inside])
+            partial = frontier[~(inside | outside)]
+            leaf = self.children[partial, 0] < 0
+            tested.append(partial[leaf])
+            frontier = self.children[partial[~leaf]].ravel()
+
+        accepted, tested = np.concatenate(accepted), np.concatenate(tested)
+        visible = self.order[_expand_ranges(self.starts[accepted], self.ends[accepted])]
+        items = self.order[_expand_ranges(self.starts[tested], self.ends[tested])]
+        items = items[frustum.test_spheres(self.centers[items], self.radii[items])]
+        return np.sort(np.concatenate((visible, items)))
+
+
+def _expand_ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Concatenation of arange(start, end) for all ranges, without a Python loop."""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(total)
@@ -0,0 +1,223 @@
+import numpy as np
+from OpenGL.GL import *
+from gl_state import state
+from shader import Shader
+
+
+# Texture units of the G-buffer and the light volume sum (0-4 hold material textures and light buffers)
+GBUFFER_UNIT = 5
+LIGHT_SUM_UNIT = 11
+# G-buffer attachments: sampler name and internal format. Position needs full precision, normals half;
+# texels are 8-bit and material colors lie in [0, 1].
+GBUFFER_LAYOUT = (
+    ("g_position", GL_RGBA32F),  # World position, shininess (-1 where no geometry was drawn)
+    ("g_normal", GL_RGBA16F),
+    ("g_albedo", GL_RGBA8),  # Texel times tint
+    ("g_ambient", GL_RGBA8),  # Material colors
+    ("g_diffuse", GL_RGBA8),
+    ("g_specular", GL_RGBA8),
+)
+
+
+def bounding_sphere(subdivisions: int = 1) -> (np.ndarray, np.ndarray):
+    """
+    Subdivided icosahedron whose faces lie outside the unit sphere, so it covers everything within radius 1.
+
+    :param subdivisions: Number of times each triangle is split into four.
+    :return: Vertices, shape (N,3) float32, and triangle indices, shape (M,3) uint16.
+    """
+    t = (1.0 + 5.0 ** 0.5) / 2.0
+    vertices = [(-1, t, 0), (1, t, 0), (-1, -t, 0), (1, -t, 0), (0, -1, t), (0, 1, t), (0, -1, -t), (0, 1, -t),
+                (t, 0, -1), (t, 0, 1), (-t, 0, -1), (-t, 0, 1)]
+    faces = [(0, 11, 5), (0, 5, 1), (0, 1, 7), (0, 7, 10), (0, 10, 11), (1, 5, 9), (5, 11, 4), (11, 10, 2),
+             (10, 7, 6), (7, 1, 8), (3, 9, 4), (3, 4, 2), (3, 2, 6), (3, 6, 8), (3, 8, 9), (4, 9, 5), (2, 4, 11),
+             (6, 2, 10), (8, 6, 7), (9, 8, 1)]
+    vertices = [np.array(v, dtype=np.float64) / np.linalg.norm(v) for v in vertices]
+    for _ in range(subdivisions):
+        midpoints = {}
+
+        def midpoint(a: int, b: int) -> int:
+            key = min(a, b), max(a, b)
+            if key not in midpoints:
+                m = vertices[a] + vertices[b]
+                vertices.append(m / np.linalg.norm(m))
+                midpoints[key] = len(vertices) - 1
+            return midpoints[key]
+
+        split = []
+        for a, b, c in faces:
+            ab, bc, ca = midpoint(a, b), midpoint(b, c), midpoint(c, a)
+            split += [(a, ab, ca), (b, bc, ab), (c, ca, bc), (ab, bc, ca)]
+        faces = split
+
+    vertices, faces = np.array(vertices), np.array(faces)
+    # Scale up until the face closest to the center touches the unit sphere
+    a, b, c = vertices[faces[:, 0]], vertices[faces[:, 1]], vertices[faces[:, 2]]
+    normals = np.cross(b - a, c - a)
+    distance = np.abs(np.sum(normals * a, axis=1)) / np.linalg.norm(normals, axis=1)
+    return (vertices / distance.min()).astype(np.float32), faces.astype(np.uint16)
+
+
+class DeferredRenderer:
+    def __init__(self, width: int, height: int, geometry_shaders: dict):
+        """Deferred shading: opaque geometry writes position, normal, albedo and material colors into a
+        G-buffer (multiple render targets) instead of shading, so hidden fragments cost no lighting.
+        Point lights and the spot light are then drawn as spheres bounding their influence, each shading
+        only the pixels it reaches; their sum is kept in a half float buffer, so many small contributions
+        don't lose precision. A final fullscreen pass adds the directional light and writes the result.
+
+        The depth buffer is copied into the target framebuffer as well, so forward passes (light markers,
+        blended items) are depth tested against the deferred geometry. Target and G-buffer both have a
+        24-bit depth, 8-bit stencil buffer, which the copy requires.
+
+        :param width: Width in pixels.
+        :param height: Height in pixels.
+        :param geometry_shaders: Forward ShaderPermutations -> ShaderPermutations writing the G-buffer instead,
+                                 with the same vertex shader and defines.
+        """
+        self.geometry_shaders = geometry_shaders
+        self._volume_shader = Shader("shaders/light_volume_vs.glsl", "shaders/light_volume_fs.glsl")
+        self._composite_shader = Shader("shaders/fullscreen_vs.glsl", "shaders/deferred_composite_fs.glsl")
+        for shader in (self._volume_shader, self._composite_shader):
+            for unit, (sampler_name, _) in enumerate(GBUFFER_LAYOUT, GBUFFER_UNIT):
+                shader.bind_sampler(sampler_name, unit)
+        self._composite_shader.bind_sampler("s_light", LIGHT_SUM_UNIT)
+
+        self.point_lights = 0  # Point light volumes drawn by light()
+        self.spot_radius = 0.0  # Radius of the spot light's volume, 0 for none
+
+        # Fullscreen triangle, generated from gl_VertexID
+        self._empty_vao = glGenVertexArrays(1)
+        # Light volume, instanced for point lights
+        vertices, indices = bounding_sphere()
+        self._sphere_count = indices.size
+        self._sphere_vao = glGenVertexArrays(1)
+        self._sphere_buffers = glGenBuffers(2)
+        state.bind_vertex_array(self._sphere_vao)
+        glBindBuffer(GL_ARRAY_BUFFER, self._sphere_buffers[0])
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+        glEnableVertexAttribArray(0)
+        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 12, ctypes.c_void_p(0))
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self._sphere_buffers[1])
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+        state.bind_vertex_array(0)
+
+        self._fbos = None  # G-buffer, light volume sum
+        self._target = 0  # Framebuffer the lighting is written into
+        self.resize(width, height)
+
+    def resize(self, width: int, height: int) -> None:
+        """(Re)creates the G-buffer for given viewport size."""
+        self._delete_buffers()
+        self.width, self.height = max(width, 1), max(height, 1)
+
+        bound = glGetIntegerv(GL_FRAMEBUFFER_BINDING)
+        self._fbos = glGenFramebuffers(2)
+        self._textures = glGenTextures(len(GBUFFER_LAYOUT) + 1)
+        self._depth = glGenRenderbuffers(1)
+        glBindRenderbuffer(GL_RENDERBUFFER, self._depth)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH24_STENCIL8, self.width, self.height)
+        # Both framebuffers share the depth buffer: light volumes are depth tested against the geometry
+        layouts = (GBUFFER_LAYOUT, (("s_light", GL_RGBA16F),))
+        textures = (self._textures[:-1], self._textures[-1:])
+        units = (GBUFFER_UNIT, LIGHT_SUM_UNIT)
+        for fbo, layout, fbo_textures, first_unit in zip(self._fbos, layouts, textures, units):
+            glBindFramebuffer(GL_FRAMEBUFFER, fbo)
+            for attachment, (texture, (_, internal_format)) in enumerate(zip(fbo_textures, layout)):
+                state.bind_texture(texture, GL_TEXTURE_2D, first_unit + attachment)
+                glTexImage2D(GL_TEXTURE_2D, 0, internal_format, self.width, self.height, 0, GL_RGBA, GL_FLOAT, None)
+                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+                glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0 + attachment, GL_TEXTURE_2D, texture, 0)
+            glDrawBuffers(len(layout), [GL_COLOR_ATTACHMENT0 + i for i in range(len(layout))])
+            glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_STENCIL_ATTACHMENT, GL_RENDERBUFFER, self._depth)
+            if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+                raise Exception("G-buffer framebuffer is incomplete!")
+        glBindFramebuffer(GL_FRAMEBUFFER, bound)
+
+    @property
+    def shaders(self) -> list:
+        """Geometry and lighting shaders (and permutations)."""
+        return list(self.geometry_shaders.values()) + [self._volume_shader, self._composite_shader]
+
+    def geometry_shader(self, shader):
+        """Variant writing the G-buffer of a forward shader variant, None if that is drawn forward."""
+        permutations = self.geometry_shaders.get(shader.permutations)
+        return permutations.get(**shader.defines) if permutations is not None else None
+
+    def set_lights(self, point_lights: int, spot_radius: float) -> None:
+        """
+        Lights drawn by the next light() call.
+
+        :param point_lights: Number of point lights in the bound light buffer (see LightClusters).
+        :param spot_radius: Radius of influence of the spot light in the Lights block, 0 to skip it.
+        """
+        self.point_lights = point_lights
+        self.spot_radius = spot_radius
+
+    def begin_geometry(self) -> None:
+        """Makes the cleared G-buffer the draw framebuffer; the current one receives the lighting."""
+        self._target = glGetIntegerv(GL_DRAW_FRAMEBUFFER_BINDING)
+        glBindFramebuffer(GL_FRAMEBUFFER, self._fbos[0])
+        glClearBufferfv(GL_COLOR, 0, np.array([0.0, 0.0, 0.0, -1.0], dtype=np.float32))  # Marks empty pixels
+        glClearBufferfi(GL_DEPTH_STENCIL, 0, 1.0, 0)
+
+    def light(self) -> None:
+        """Shades the G-buffer into the target framebuffer and copies the geometry's depth there."""
+        for unit, texture in enumerate(self._textures, GBUFFER_UNIT):
+            state.bind_texture(texture, GL_TEXTURE_2D, unit)
+
+        # Light volumes add up. Inner faces behind the geometry cover the pixels the sphere reaches (also with
+        # the camera inside); depth clamping keeps spheres beyond the far plane.
+        # The view matrix (lookAt.py) mirrors the scene, so inner faces wind counter-clockwise on screen.
+        glBindFramebuffer(GL_FRAMEBUFFER, self._fbos[1])
+        glClearBufferfv(GL_COLOR, 0, np.zeros(4, dtype=np.float32))
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_ONE, GL_ONE)
+        glDepthFunc(GL_GEQUAL)
+        glDepthMask(GL_FALSE)
+        glEnable(GL_CULL_FACE)
+        glCullFace(GL_BACK)
+        glEnable(GL_DEPTH_CLAMP)
+        self._volume_shader.use()
+        state.bind_vertex_array(self._sphere_vao)
+        if self.point_lights:
+            self._volume_shader.set_bool("spot", False)
+            glDrawElementsInstanced(GL_TRIANGLES, self._sphere_count, GL_UNSIGNED_SHORT, ctypes.c_void_p(0),
+                                    self.point_lights)
+        if self.spot_radius > 0:
+            self._volume_shader.set_bool("spot", True)
+            self._volume_shader.set_float("spotRadius", self.spot_radius)
+            glDrawElements(GL_TRIANGLES, self._sphere_count, GL_UNSIGNED_SHORT, ctypes.c_void_p(0))
+        glDisable(GL_DEPTH_CLAMP)
+        glDisable(GL_CULL_FACE)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glDisable(GL_BLEND)
+
+        # Depth of the geometry for the forward passes, then the lit pixels over the background
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self._fbos[0])
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, self._target)
+        glBlitFramebuffer(0, 0, self.width, self.height, 0, 0, self.width, self.height, GL_DEPTH_BUFFER_BIT,
+                          GL_NEAREST)
+        glBindFramebuffer(GL_FRAMEBUFFER, self._target)
+        glDisable(GL_DEPTH_TEST)
+        self._composite_shader.use()
+        state.bind_vertex_array(self._empty_vao)
+        glDrawArrays(GL_TRIANGLES, 0, 3)
+        glEnable(GL_DEPTH_TEST)
+        glDepthFunc(GL_LESS)
+        glDepthMask(GL_TRUE)
+
+    def _delete_buffers(self) -> None:
+        if self._fbos is None:
+            return
+        glDeleteTextures(len(self._textures), self._textures)
+        glDeleteRenderbuffers(1, [self._depth])
+        glDeleteFramebuffers(2, self._fbos)
+        self._fbos = None
+        state.invalidate()  # Deleted textures may still be cached as bound
+
+    def delete(self) -> None:
+        self._delete_buffers()
+        glDeleteBuffers(2, self._sphere_buffers)
+        glDeleteVertexArrays(2, [self._empty_vao, self._sphere_vao])
@@ -0,0 +1,161 @@
+import ctypes
+from collections import deque
+
+import numpy as np
+from OpenGL.GL import *
+from gl_state import state
+
+
+_PERSISTENT_FLAGS = GL_MAP_WRITE_BIT | GL_MAP_PERSISTENT_BIT | GL_MAP_COHERENT_BIT
+_STREAM_FLAGS = GL_MAP_WRITE_BIT | GL_MAP_INVALIDATE_RANGE_BIT | GL_MAP_UNSYNCHRONIZED_BIT
+
+
+def buffer_storage_supported() -> bool:
+    """True if the context can create immutable buffers and map them persistently (GL 4.4 / ARB_buffer_storage)."""
+    if (glGetIntegerv(GL_MAJOR_VERSION), glGetIntegerv(GL_MINOR_VERSION)) >= (4, 4):
+        return True
+    return any(glGetStringi(GL_EXTENSIONS, i) == b"GL_ARB_buffer_storage"
+               for i in range(glGetIntegerv(GL_NUM_EXTENSIONS)))
+
+
+class DynamicBuffer:
+    def __init__(self, frame_size: int = 1 << 16, frames: int = 3, target=GL_UNIFORM_BUFFER):
+        """Ring buffer streaming data written every frame (per-draw blocks, camera, lights) to the GPU.
+
+        Space is handed out as NumPy views of the mapped buffer, so data is written where the GPU reads it
+        from and bound by offset (e.g. glBindBufferRange). The buffer holds several frames; a fence placed
+        at the end of every frame (end_frame) guards space until the GPU has read it, so the CPU only waits
+        if it gets more than frames ahead. With ARB_buffer_storage the buffer is mapped once, persistent and
+        coherent; otherwise each allocation maps its range unsynchronized (the fences make that safe) until
+        commit(). GL objects are created on first use, after a context exists.
+
+        :param frame_size: Bytes expected per frame; the ring doubles if a frame needs more.
+        :param frames: Frames in flight the ring holds (triple buffering by default).
+        :param target: Buffer binding target used to create and map the buffer.
+        """
+        self.size = frame_size * frames
+        self.frames = frames
+        self.target = target
+        self.persistent: bool = None  # Mapped once (ARB_buffer_storage), decided on first use
+        self.alignment = 16  # Offset alignment of allocations, at least the context's uniform buffer alignment
+        self.buffer = None  # GL name of the current buffer
+        self.waits = 0  # Allocations that waited for the GPU
+        self._mapping = None  # Whole buffer (persistent) or the range of the last allocation
+        self._head = 0  # Bytes allocated since the buffer was created; offsets are head % size
+        self._fenced = 0  # Head at the last fence
+        self._waited = 0  # Head up to which the GPU read everything
+        self._fences = deque()  # (head, sync) in order
+        self._retired = []  # Buffers replaced by a larger one this frame, still bound for its draws
+
+    def allocate(self, nbytes: int) -> (int, np.ndarray):
+        """
+        Reserves space for this frame. Write it before drawing with it and before the next allocation, then
+        call commit().
+
+        :return: Byte offset in buffer, and writable float32 view of the space (nbytes // 4 floats).
+        """
+        if self.buffer is None:
+            self._create()
+        nbytes = -(-nbytes // self.alignment) * self.alignment
+        if nbytes > self.size:
+            self._grow(nbytes)
+        offset = self._head % self.size
+        if offset + nbytes > self.size:  # Doesn't fit before the end, start over at the beginning
+            self._head += self.size - offset
+            offset = 0
+        # Everything written one ring size before the end of the new space must have been read
+        limit = self._head + nbytes - self.size
+        while self._fences and self._waited < limit:
+            self._waited, fence = self._fences.popleft()
+            if glClientWaitSync(fence, 0, 0) == GL_TIMEOUT_EXPIRED:
+                self.waits += 1
+                glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, GL_TIMEOUT_IGNORED)
+            glDeleteSync(fence)
+        if self._waited < limit:  # This frame's data is in the way
+            self._grow(self._head - self._fenced + nbytes)
+            offset = 0
+        self._head += nbytes
+
+        if self.persistent:
+            view = self._mapping[offset:offset + nbytes]
+        else:
+            glBindBuffer(self.target, self.buffer)
+            view = self._mapping = self._map(offset, nbytes, _STREAM_FLAGS)
+        return offset, view.view(np.float32)
+
+    def aligned(self, nbytes: int) -> int:
+        """Size rounded up to the offset alignment, e.g. the stride of blocks bound one by one."""
+        if self.buffer is None:
+            self._create()
+        return -(-nbytes // self.alignment) * self.alignment
+
+    def commit(self) -> None:
+        """Ends writing the last allocation (unmaps it unless the buffer is mapped persistently)."""
+        if not self.persistent and self._mapping is not None:
+            self._mapping = None
+            glBindBuffer(self.target, self.buffer)
+            glUnmapBuffer(self.target)
+
+    def end_frame(self) -> None:
+        """Fences the space allocated since the last frame, after the draws reading it were issued."""
+        if self._head != self._fenced:
+            self._fences.append((self._head, glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)))
+            self._fenced = self._head
+        if self._retired:  # The GL frees them once the GPU is done with them
+            glDeleteBuffers(len(self._retired), self._retired)
+            state.invalidate()  # Deleted names may be reused
+            self._retired = []
+
+    def release(self) -> None:
+        """Deletes the buffer; the next allocation creates a new one."""
+        if self.buffer is None:
+            return
+        self._retire()
+        self.end_frame()
+        self.buffer = None
+
+    def _retire(self) -> None:
+        """Stops allocating from the current buffer, it is deleted at the end of the frame."""
+        self.commit()
+        for _, fence in self._fences:
+            glDeleteSync(fence)
+        self._fences.clear()
+        self._mapping = None  # Unmapped by the deletion
+        self._retired.append(self.buffer)
+        self._head, self._fenced, self._waited = 0, 0, 0
+
+    def _create(self) -> None:
+        if self.persistent is None:
+            self.persistent = buffer_storage_supported()
+            if self.target == GL_UNIFORM_BUFFER:
+                self.alignment = max(self.alignment, int(glGetIntegerv(GL_UNIFORM_BUFFER_OFFSET_ALIGNMENT)))
+            self.size = -(-self.size // self.alignment) * self.alignment
+        self.buffer = int(glGenBuffers(1))
+        glBindBuffer(self.target, self.buffer)
+        if self.persistent:
+            glBufferStorage(self.target, self.size, None, _PERSISTENT_FLAGS)
+            self._mapping = self._map(0, self.size, _PERSISTENT_FLAGS)
+        else:
+            glBufferData(self.target, self.size, None, GL_STREAM_DRAW)
+
+    def _grow(self, nbytes: int) -> None:
+        """
+        Replaces the buffer by a larger one holding frames times nbytes. Ranges of the old one bound this frame
+        stay valid until end_frame.
+        """
+        size = self.size
+        while size < self.frames * nbytes:
+            size *= 2
+        self._retire()
+        self.size = size
+        self._create()
+
+    def _map(self, offset: int, nbytes: int, flags) -> np.ndarray:
+        address = glMapBufferRange(self.target, offset, nbytes, flags)
+        if not address:
+            raise RuntimeError(f"Can't map {nbytes} bytes of dynamic buffer {self.buffer}")
+        return np.ctypeslib.as_array((ctypes.c_ubyte * nbytes).from_address(address))
+
+
+# Ring of the (single) GL context, shared by the render queues and uniform blocks written every frame
+ring = DynamicBuffer()
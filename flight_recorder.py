@@ -0,0 +1,160 @@
+import os
+import json
+import struct
+import bisect
+
+import numpy as np
+
+
+VERSION = 1
+_MAGIC = b"FLIGHTRC"
+_ALIGN = 16
+CAMERA_MODES = ("static", "following", "moving")
+
+# State of one aircraft in one frame, 32 bytes. A file holds one record per track for every frame.
+RECORD = np.dtype([
+    ("time", "<f8"),  # Scene time in seconds, the same for all tracks of a frame
+    ("position", "<f4", 3),
+    ("yaw", "<f4"),  # Rotation about the up axis in radians
+    ("pitch", "<f4"),  # Rotation about the z axis in radians
+    ("camera", "u1"),  # Index of the camera mode in CAMERA_MODES
+    ("pad", "u1", 3),
+])
+
+
+class FlightRecorder:
+    def __init__(self, path: str, tracks=("Moving_Plane",), buffer_frames: int = 1024):
+        """Appends aircraft states to a flight recording, one fixed-size record per track and frame.
+
+        Frames are buffered and written in blocks; the file is readable (by FlightReplay) up to the last
+        block written at any time, so a crash loses at most one buffer.
+
+        :param path: Recording file, replaced if it exists.
+        :param tracks: Name of each recorded aircraft.
+        :param buffer_frames: Frames buffered before a write.
+        """
+        self.tracks = list(tracks)
+        self.frames = 0  # Frames recorded
+        self._buffer = np.zeros((buffer_frames, len(self.tracks)), dtype=RECORD)
+        self._buffered = 0
+        self._last_time = -np.inf
+
+        header = json.dumps({
+            "version": VERSION,
+            "tracks": self.tracks,
+            "record": RECORD.descr,
+        }).encode()
+        # Records start aligned after magic, header length and header
+        data_start = -(-(len(_MAGIC) + 4 + len(header)) // _ALIGN) * _ALIGN
+        header = header.ljust(data_start - len(_MAGIC) - 4, b" ")
+        self._file = open(path, "wb")
+        self._file.write(_MAGIC)
+        self._file.write(struct.pack("<I", len(header)))
+        self._file.write(header)
+
+    def record(self, time: float, positions, yaws, pitches, cameras) -> None:
+        """
+        Records the state of every track in a frame. Times must not decrease.
+
+        :param time: Scene time of the frame in seconds.
+        :param positions: Position of each track, shape (tracks, 3).
+        :param yaws: Yaw of each track (or one for all).
+        :param pitches: Pitch of each track (or one for all).
+        :param cameras: Camera mode (name or index in CAMERA_MODES) of each track (or one for all).
+        """
+        if time < self._last_time:
+            raise ValueError(f"Frame at {time} s recorded after {self._last_time} s")
+        self._last_time = time
+        if isinstance(cameras, str):
+            cameras = CAMERA_MODES.index(cameras)
+        row = self._buffer[self._buffered]
+        row["time"] = time
+        row["position"] = positions
+        row["yaw"] = yaws
+        row["pitch"] = pitches
+        row["camera"] = cameras
+        self._buffered += 1
+        self.frames += 1
+        if self._buffered == len(self._buffer):
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes buffered frames to the file."""
+        self._file.write(self._buffer[:self._buffered].tobytes())
+        self._file.flush()
+        self._buffered = 0
+
+    def close(self) -> None:
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+
+class FlightReplay:
+    def __init__(self, path: str):
+        """Memory-mapped flight recording (see FlightRecorder).
+
+        Only the pages of the frames sampled are read, so recordings of any length open at once and
+        seeking to any time reads a few records (binary search over the frame times).
+
+        :param path: Recording file.
+        """
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{path} is not a flight recording")
+            header_len, = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_len))
+        if header["version"] != VERSION:
+            raise ValueError(f"{path} has version {header['version']}, expected {VERSION}")
+        if np.dtype([tuple(field) for field in header["record"]]) != RECORD:
+            raise ValueError(f"{path} has an unknown record layout")
+
+        self.tracks: list = header["tracks"]
+        data_start = len(_MAGIC) + 4 + header_len
+        # A partly written last frame (recorder still running or killed) is left out
+        frames = (os.path.getsize(path) - data_start) // (RECORD.itemsize * len(self.tracks))
+        if frames == 0:
+            raise ValueError(f"{path} has no frames")
+        self.records = np.memmap(path, dtype=RECORD, mode="r", offset=data_start, shape=(frames, len(self.tracks)))
+        self._times = self.records[:, 0]["time"]  # Strided view, nothing is read
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def start(self) -> float:
+        """Time of the first frame in seconds."""
+        return float(self._times[0])
+
+    @property
+    def end(self) -> float:
+        """Time of the last frame in seconds."""
+        return float(self._times[-1])
+
+    def track(self, name: str) -> int:
+        """Index of a track by name."""
+        return self.tracks.index(name)
+
+    def frame(self, time: float) -> int:
+        """Index of the last frame at or before given time, the first frame before the recording starts."""
+        return max(bisect.bisect_right(self._times, time) - 1, 0)
+
+    def sample(self, time: float, track: int = 0) -> (np.ndarray, float, float, str):
+        """
+        State of a track at given time, interpolated between the frames around it and held before the first
+        and after the last frame.
+
+        :return: Position, yaw, pitch and camera mode (of the frame before).
+        """
+        index = self.frame(time)
+        before = self.records[index, track]
+        if index + 1 == len(self.records) or time <= before["time"]:
+            return before["position"].copy(), float(before["yaw"]), float(before["pitch"]), \
+                CAMERA_MODES[before["camera"]]
+        after = self.records[index + 1, track]
+        f = (time - before["time"]) / (after["time"] - before["time"])
+        position = before["position"] + f * (after["position"] - before["position"])
+        yaw = before["yaw"] + f * (after["yaw"] - before["yaw"])
+        pitch = before["pitch"] + f * (after["pitch"] - before["pitch"])
+        return position, float(yaw), float(pitch), CAMERA_MODES[before["camera"]]
@@ -0,0 +1,100 @@
+import ctypes
+import os
+
+import glfw
+
+
+class GlfwContext:
+    def __init__(self, width: int, height: int, title: str, visible: bool = True):
+        """OpenGL context of a GLFW window.
+
+        :param width: Window width.
+        :param height: Window height.
+        :param title: Window title.
+        :param visible: False for a hidden window (offscreen rendering on machines with a display).
+        """
+        if not glfw.init():
+            raise Exception("GLFW cannot be initialized!")
+        if not visible:
+            glfw.window_hint(glfw.VISIBLE, glfw.FALSE)
+
+        self._window = glfw.create_window(width, height, title, None, None)
+        if not self._window:
+            glfw.terminate()
+            raise Exception("Window cannot be created!")
+        # Set window as current context
+        glfw.make_context_current(self._window)
+
+    def set_callbacks(self, on_resize, on_key) -> None:
+        """Sets resize handler (window, width, height) and keyboard input handler (window, key, scancode, action, mods)."""
+        glfw.set_window_size_callback(self._window, on_resize)
+        glfw.set_key_callback(self._window, on_key)
+
+    def set_title(self, title: str) -> None:
+        glfw.set_window_title(self._window, title)
+
+    def should_close(self) -> bool:
+        return glfw.window_should_close(self._window)
+
+    def poll_events(self) -> None:
+        glfw.poll_events()
+
+    def swap_buffers(self) -> None:
+        glfw.swap_buffers(self._window)
+
+    def terminate(self) -> None:
+        glfw.terminate()
+
+
+class EglContext:
+    def __init__(self, width: int, height: int, title: str = None):
+        """Surfaceless EGL context for machines without display (e.g. Mesa's llvmpipe software rasterizer).
+
+        Draws only into framebuffer objects. PyOpenGL must use its EGL platform, so PYOPENGL_PLATFORM=egl
+        has to be set before OpenGL is imported for the first time (see headless.py).
+
+        :param width: Unused, the size comes from the framebuffer object.
+        :param height: Unused.
+        :param title: Unused.
+        """
+        os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+        from OpenGL import EGL
+
+        self._display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        if not EGL.eglInitialize(self._display, None, None):
+            raise Exception("EGL cannot be initialized!")
+        config_attribs = (EGL.EGLint * 5)(EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+                                          EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_NONE)
+        config, count = EGL.EGLConfig(), EGL.EGLint()
+        EGL.eglChooseConfig(self._display, config_attribs, ctypes.pointer(config), 1, ctypes.pointer(count))
+        if count.value == 0:
+            raise Exception("No EGL config with desktop OpenGL support!")
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        context_attribs = (EGL.EGLint * 7)(EGL.EGL_CONTEXT_MAJOR_VERSION, 3, EGL.EGL_CONTEXT_MINOR_VERSION, 3,
+                                           EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK,
+                                           EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT, EGL.EGL_NONE)
+        self._context = EGL.eglCreateContext(self._display, config, EGL.EGL_NO_CONTEXT, context_attribs)
+        if not self._context:
+            raise Exception("EGL context cannot be created!")
+        EGL.eglMakeCurrent(self._display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, self._context)
+
+    def set_callbacks(self, on_resize, on_key) -> None:
+        pass  # No window, no input
+
+    def set_title(self, title: str) -> None:
+        pass
+
+    def should_close(self) -> bool:
+        return False
+
+    def poll_events(self) -> None:
+        pass
+
+    def swap_buffers(self) -> None:
+        pass
+
+    def terminate(self) -> None:
+        from OpenGL import EGL
+        EGL.eglMakeCurrent(self._display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+        EGL.eglDestroyContext(self._display, self._context)
+        EGL.eglTerminate(self._display)
@@ -0,0 +1,76 @@
+from OpenGL.GL import *
+
+
+class GLStateCache:
+    def __init__(self):
+        """Shadow copy of frequently changed GL bindings, skipping calls that wouldn't change anything.
+
+        All code binding programs, VAOs or textures has to go through this cache (or call invalidate()),
+        otherwise the shadow copy gets out of sync.
+        """
+        self.issued = 0  # GL calls actually made
+        self.skipped = 0  # Redundant GL calls avoided
+        self._program = None
+        self._vao = None
+        self._active_unit = None
+        self._textures = {}  # (unit, target) -> texture
+        self._uniform_buffers = {}  # binding point -> buffer, or (buffer, offset, size) of a range
+
+    def count(self, issued: bool) -> bool:
+        """Counts a (possibly skipped) GL call, returns issued for convenience."""
+        if issued:
+            self.issued += 1
+        else:
+            self.skipped += 1
+        return issued
+
+    def reset_counters(self) -> (int, int):
+        """Resets call counters, returns their values (issued, skipped)."""
+        counters = self.issued, self.skipped
+        self.issued, self.skipped = 0, 0
+        return counters
+
+    def invalidate(self) -> None:
+        """Forgets all cached bindings (e.g. after external code changed GL state)."""
+        self._program, self._vao, self._active_unit = None, None, None
+        self._textures.clear()
+        self._uniform_buffers.clear()
+
+    def use_program(self, program: int) -> None:
+        if self.count(program != self._program):
+            glUseProgram(program)
+            self._program = program
+
+    def bind_vertex_array(self, vao: int) -> None:
+        if self.count(vao != self._vao):
+            glBindVertexArray(vao)
+            self._vao = vao
+
+    def active_texture(self, unit: int) -> None:
+        if self.count(unit != self._active_unit):
+            glActiveTexture(GL_TEXTURE0 + unit)
+            self._active_unit = unit
+
+    def bind_texture(self, texture: int, target=GL_TEXTURE_2D, unit: int = 0) -> None:
+        key = (unit, target)
+        if self._textures.get(key) != texture:
+            self.active_texture(unit)
+        if self.count(self._textures.get(key) != texture):
+            glBindTexture(target, texture)
+            self._textures[key] = texture
+
+    def bind_uniform_buffer(self, binding: int, buffer: int) -> None:
+        buffer = int(buffer)  # Not a NumPy scalar, which would compare with range tuples element-wise
+        if self.count(self._uniform_buffers.get(binding) != buffer):
+            glBindBufferBase(GL_UNIFORM_BUFFER, binding, buffer)
+            self._uniform_buffers[binding] = buffer
+
+    def bind_uniform_buffer_range(self, binding: int, buffer: int, offset: int, size: int) -> None:
+        key = (int(buffer), offset, size)
+        if self.count(self._uniform_buffers.get(binding) != key):
+            glBindBufferRange(GL_UNIFORM_BUFFER, binding, buffer, offset, size)
+            self._uniform_buffers[binding] = key
+
+
+# State cache of the (single) GL context
+state = GLStateCache()
@@ -0,0 +1,259 @@
+import argparse
+import multiprocessing
+import multiprocessing.util
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+CAMERA_MODES = ("static", "following", "moving")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Renders the A380 scene offscreen into PNG files, a NumPy array "
+                                                 "or a raw video stream.")
+    parser.add_argument("-n", "--frames", type=int, default=1, help="number of frames to render")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--camera", choices=CAMERA_MODES, default="static", help="camera mode")
+    parser.add_argument("--time", type=float, default=0.0, help="simulated time of the first frame in seconds")
+    parser.add_argument("--end", type=float, help="end of the time range in seconds (exclusive), instead of -n")
+    parser.add_argument("--fps", type=float, default=60.0, help="simulated frames per second")
+    parser.add_argument("--script", help="JSON input script replayed during rendering (see input_script.py)")
+    parser.add_argument("--record", help="flight recording file to write Moving_Plane's flight to")
+    parser.add_argument("--replay", help="flight recording flying Moving_Plane at the frame times (see --time)")
+    parser.add_argument("--backend", choices=("egl", "glfw"), default="egl",
+                        help="surfaceless EGL (no display needed) or a hidden GLFW window")
+    parser.add_argument("--deferred", action="store_true", help="deferred shading instead of forward shading")
+    parser.add_argument("--vertex-layout", choices=("float", "compact"), default="float",
+                        help="vertex buffer layout of meshes (compact: quantized, half the size)")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="processes rendering blocks of frames in parallel, each with its own GL context")
+    parser.add_argument("--block", type=int, default=16, help="frames per block handed to a worker")
+    parser.add_argument("--trace", help="Chrome trace event JSON file to write (enables the profiler)")
+    parser.add_argument("-o", "--output", default="frames/frame_%04d.png",
+                        help="PNG file pattern with a frame number placeholder, a .npy file for all frames, "
+                             "or - for raw RGBA frames on stdout (e.g. piped into ffmpeg -f rawvideo)")
+    args = parser.parse_args(argv)
+    if args.end is not None:
+        args.frames = max(0, round((args.end - args.time) * args.fps))
+    if args.workers < 1 or args.block < 1:
+        parser.error("--workers and --block must be at least 1")
+    if (args.trace or args.record) and args.workers > 1:
+        parser.error("--trace and --record need a single worker")
+    return args
+
+
+class FrameWriter:
+    def __init__(self, args):
+        """Writes rendered frames to PNG files, a NumPy array file or stdout (raw RGBA, top row first).
+
+        Frames must arrive in order, except for PNG files, which any process may write (see files).
+        For stdout, frames go to a duplicate of file descriptor 1, which itself (and sys.stdout) is pointed
+        at stderr until close(), so nothing else printed (or written by native code) mixes into the stream.
+        Create the writer before the scene, and before starting worker processes, which inherit the fds.
+        """
+        self._output = args.output
+        self._frames = None
+        self._stream = None
+        if self._output.endswith(".npy"):
+            self._frames = np.empty((args.frames, args.height, args.width, 4), dtype=np.uint8)
+        elif self._output == "-":
+            sys.stdout.flush()
+            self._stream = os.fdopen(os.dup(1), "wb")
+            os.dup2(2, 1)
+            sys.stdout = sys.stderr
+        elif os.path.dirname(self._output):
+            os.makedirs(os.path.dirname(self._output), exist_ok=True)
+
+    @staticmethod
+    def files(output: str) -> bool:
+        """True if every frame of given output is a file of its own, so workers can write them in any order."""
+        return not output.endswith(".npy") and output != "-"
+
+    def write(self, done: list) -> None:
+        """Writes (index, pixels) of rendered frames."""
+        for index, pixels in done:
+            if self._frames is not None:
+                self._frames[index] = pixels
+            elif self._output == "-":
+                self._stream.write(pixels.tobytes())
+            else:
+                from PIL import Image
+                Image.fromarray(pixels).save(self._output % index)
+
+    def close(self) -> None:
+        if self._frames is not None:
+            np.save(self._output, self._frames)
+        elif self._stream is not None:
+            self._stream.flush()
+            os.dup2(self._stream.fileno(), 1)  # Back to the real stdout
+            sys.stdout = sys.__stdout__
+            self._stream.close()
+            self._stream = None
+
+
+def _setup(args):
+    """Creates GL context, offscreen target and scene as described by parsed command line arguments."""
+    if args.backend == "egl":
+        # Must happen before the first OpenGL import
+        os.environ["PYOPENGL_PLATFORM"] = "egl"
+    # Imported here, after choosing the platform
+    from gl_context import EglContext, GlfwContext
+    from offscreen import OffscreenTarget
+    from clock import FixedStepClock
+    from input_script import InputScript
+    from flight_recorder import FlightRecorder, FlightReplay
+    from main import Window
+    import asset_registry
+
+    asset_registry.registry.vertex_layout = args.vertex_layout  # Before the first mesh is loaded
+
+    if args.backend == "egl":
+        context = EglContext(args.width, args.height)
+    else:
+        context = GlfwContext(args.width, args.height, "AirBUS A380 Modeling", visible=False)
+    target = OffscreenTarget(args.width, args.height)
+    target.bind()
+    clock = FixedStepClock(args.time, 1 / args.fps)
+    window = Window(args.width, args.height, "AirBUS A380 Modeling", context=context, clock=clock)
+    window.loader.finish()  # Complete scene from the first frame on
+    window.select_camera(args.camera)
+    window.use_deferred = args.deferred
+    if args.script:
+        window.input_script = InputScript.load(args.script)
+    if args.replay:
+        window.replay = FlightReplay(args.replay)  # Mapped by every worker, pages are shared
+    if args.record:
+        window.recorder = FlightRecorder(args.record)
+    return context, target, window
+
+
+def render(args) -> None:
+    """Renders frames as described by parsed command line arguments, in this process."""
+    writer = FrameWriter(args)  # Before anything can print
+    context, target, window = _setup(args)
+    from gl_state import state
+    from profiler import profiler
+
+    if args.trace:
+        profiler.enabled = profiler.tracing = True
+    for index in range(args.frames):
+        window.render_frame(window.clock.tick())
+        state.reset_counters()
+        writer.write(target.capture(index))
+    writer.write(target.finish())
+    writer.close()
+
+    if args.trace:
+        profiler.export_chrome_trace(args.trace)
+    if window.recorder is not None:
+        window.recorder.close()
+    target.delete()
+    window.loader.shutdown()
+    context.terminate()
+
+
+def _build_caches(args) -> None:
+    """
+    Builds missing mesh and texture caches of the scene (everything under data/), as its asset loader would.
+    Needs no GL context; run before starting workers, so they only read caches instead of all building them.
+    """
+    if args.backend == "egl":
+        os.environ["PYOPENGL_PLATFORM"] = "egl"  # Before the first OpenGL import
+    import mesh_cache
+    import texture_cache
+    import asset_registry
+    from asset_registry import AssetRegistry
+
+    asset_registry.registry.vertex_layout = args.vertex_layout
+    for directory, dirs, files in os.walk("data"):
+        dirs[:] = [d for d in dirs if d != mesh_cache.CACHE_DIR]
+        for name in sorted(files):
+            if not name.lower().endswith(".obj"):
+                continue
+            path = os.path.join(directory, name)
+            chunks = mesh_cache.read_cache(path)
+            if chunks is None:
+                mesh_cache.build_cache(path)
+                chunks = mesh_cache.read_cache(path)
+            textures = list(dict.fromkeys(chunk.texture for chunk in chunks if chunk.texture is not None))
+            if asset_registry.registry.packs(textures):
+                AssetRegistry.texture_array_levels(textures)
+            else:
+                for texture in textures:
+                    texture_cache.load(texture)
+
+
+# Scene of a worker process of render_parallel: (args, target, window, writer, next frame index)
+_worker = None
+
+
+def _init_worker(args) -> None:
+    global _worker
+    # Software rasterizers start a thread per core in every process; share the cores between the workers
+    os.environ.setdefault("LP_NUM_THREADS", str(max(1, (os.cpu_count() or 1) // args.workers)))
+    _, target, window = _setup(args)
+    # Stops the loader's workers when this process exits, else the pool waits for them forever
+    multiprocessing.util.Finalize(None, window.loader.shutdown, exitpriority=10)
+    _worker = [args, target, window, FrameWriter(args) if FrameWriter.files(args.output) else None, 0]
+
+
+def _render_block(first: int, count: int) -> list:
+    """Renders frames first to first + count - 1 in a worker. Returns (index, pixels), pixels None if written."""
+    args, target, window, writer, next_frame = _worker
+    if first < next_frame:
+        raise RuntimeError(f"Frame {first} requested after frame {next_frame - 1}, blocks must arrive in order")
+    # Frames rendered by other workers: the scene evolves through them without drawing
+    for index in range(next_frame, first):
+        window.advance(window.clock.time(index))
+    done = []
+    for index in range(first, first + count):
+        window.render_frame(window.clock.time(index))
+        done += target.capture(index)
+    done += target.finish()
+    _worker[4] = first + count
+    if writer is not None:
+        writer.write(done)
+        return [(index, None) for index, _ in done]
+    return done
+
+
+def render_parallel(args) -> None:
+    """
+    Renders frames as described by parsed command line arguments in blocks, spread over worker processes.
+
+    Every worker has its own offscreen GL context and scene and renders the blocks it takes at their
+    frame times; blocks are taken in order, so each worker only moves forward in time. PNG files are
+    written by the workers, other outputs by this process in frame order.
+    """
+    writer = FrameWriter(args)
+    _build_caches(args)
+    blocks = [(first, min(args.block, args.frames - first)) for first in range(0, args.frames, args.block)]
+    # Spawned, forking would copy this process' GL state
+    with ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(args,)) as pool:
+        pending = deque()
+        for block in blocks:
+            pending.append(pool.submit(_render_block, *block))
+            if len(pending) > 2 * args.workers:  # Bounds the finished frames waiting for earlier ones
+                writer.write([frame for frame in pending.popleft().result() if frame[1] is not None])
+        while pending:
+            writer.write([frame for frame in pending.popleft().result() if frame[1] is not None])
+    writer.close()
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    if args.workers > 1:
+        render_parallel(args)
+    else:
+        render(args)
+    print(f"{args.frames} frame(s) written to {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
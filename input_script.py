@@ -0,0 +1,64 @@
+import json
+
+import glfw
+
+
+class InputScript:
+    def __init__(self, events: list):
+        """Timeline of key input, replayed through the regular key handler.
+
+        Each event is a dict with the time "t" in seconds and a "key" name as in glfw.KEY_* (e.g. "1", "W",
+        "LEFT"). Without "until" the key is pressed and released at once (camera modes 1/2/3, toggles);
+        with "until" it is held, sending one repeat event per frame (WASD movement, arrows).
+
+        :param events: Events in any order.
+        """
+        self.events = sorted(events, key=lambda e: e["t"])
+        for event in self.events:
+            _key_code(event["key"])  # Fail early on unknown keys
+        self._next = 0
+        self._held = {}  # key code -> release time
+
+    @staticmethod
+    def load(path: str):
+        """Loads a script from a JSON file containing the list of events."""
+        with open(path) as f:
+            return InputScript(json.load(f))
+
+    def reset(self) -> None:
+        """Rewinds to the beginning."""
+        self._next = 0
+        self._held = {}
+
+    def apply(self, time: float, on_key) -> None:
+        """
+        Sends events due until given time.
+
+        :param time: Current frame time in seconds.
+        :param on_key: Key handler with the GLFW callback signature (window, key, scancode, action, mods).
+        """
+        pressed = set()
+        while self._next < len(self.events) and self.events[self._next]["t"] <= time:
+            event = self.events[self._next]
+            self._next += 1
+            key = _key_code(event["key"])
+            on_key(None, key, 0, glfw.PRESS, 0)
+            if "until" in event:
+                self._held[key] = event["until"]
+                pressed.add(key)
+            else:
+                on_key(None, key, 0, glfw.RELEASE, 0)
+
+        for key, until in list(self._held.items()):
+            if time >= until:
+                on_key(None, key, 0, glfw.RELEASE, 0)
+                del self._held[key]
+            elif key not in pressed:
+                on_key(None, key, 0, glfw.REPEAT, 0)
+
+
+def _key_code(name: str) -> int:
+    code = getattr(glfw, "KEY_" + str(name).upper(), None)
+    if code is None:
+        raise ValueError(f"Unknown key {name}")
+    return code
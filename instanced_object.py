@@ -0,0 +1,222 @@
+import numpy as np
+from OpenGL.GL import *
+import Arithmetic
+from Vector3 import Vector3 as v3
+from shader import Shader
+from gl_state import state
+from render_queue import RenderQueue
+from culling import Frustum, BVH, transform_spheres, motion_spheres
+from animation import pack_motions, margins
+import asset_registry
+from asset_registry import AssetRegistry
+
+
+# Attribute locations of the per-instance stream (see phong_vs.glsl, INSTANCED)
+MODEL_LOCATION = 4  # mat4 takes locations 4..7
+TINT_LOCATION = 8
+MOTION_LOCATION = 9  # Two vec4, locations 9 and 10 (ANIMATED)
+# From this many instances on, culling goes through a BVH instead of testing every instance
+BVH_MIN_INSTANCES = 2048
+
+
+class InstancedObject:
+    def __init__(self, path: str, scale: float = 1.0, registry: AssetRegistry = None):
+        """Many copies of an object loaded from .obj and .mtl files, drawn with one call per material.
+
+        Every instance has its own model matrix and tint color, stored in per-instance vertex buffers, and
+        optionally a parametric motion evaluated by the vertex shader (set_motions). The mesh is shared with
+        all other objects loaded from the same file. When culling, only visible instances are packed into
+        the buffers.
+
+        :param path: Path to .obj file.
+        :param scale: Uniform scale applied before each instance's model matrix.
+        :param registry: Asset registry, default one if None.
+        """
+        self._path = path
+        self._registry = registry or asset_registry.registry
+        self.mesh = self._registry.acquire_mesh(path)
+        self._scale_matrix = Arithmetic.create_from_scale(v3([scale] * 3), dtype=np.float32)
+        self.count = 0
+        self._capacity = 0
+        # CPU copies of the instance streams, and what the GPU buffers currently hold
+        self._matrices = np.zeros((0, 4, 4), dtype=np.float32)
+        self._tints = np.zeros((0, 4), dtype=np.float32)
+        self._motions: np.ndarray = None  # Packed motions (N, 2, 4), None if not animated
+        self._motion_vbo = None
+        self._uploaded = None  # Indices of uploaded instances, None if all
+        self._drawn = 0  # Number of instances in the buffers
+        self._bvh: BVH = None
+
+        self._model_vbo, self._tint_vbo = glGenBuffers(2)
+        self.vaos = glGenVertexArrays(len(self.mesh.vaos))
+        if len(self.mesh.vaos) == 1:
+            self.vaos = np.array([self.vaos], dtype=np.uint32)
+
+        # Per material VAO: shared mesh buffers + own instance streams
+        for ind, vao in enumerate(self.vaos):
+            state.bind_vertex_array(vao)
+            self.mesh.set_vertex_attributes(ind)
+
+            glBindBuffer(GL_ARRAY_BUFFER, self._model_vbo)
+            for col in range(4):
+                glEnableVertexAttribArray(MODEL_LOCATION + col)
+                glVertexAttribPointer(MODEL_LOCATION + col, 4, GL_FLOAT, GL_FALSE, 64, ctypes.c_void_p(16 * col))
+                glVertexAttribDivisor(MODEL_LOCATION + col, 1)
+
+            glBindBuffer(GL_ARRAY_BUFFER, self._tint_vbo)
+            glEnableVertexAttribArray(TINT_LOCATION)
+            glVertexAttribPointer(TINT_LOCATION, 4, GL_FLOAT, GL_FALSE, 16, ctypes.c_void_p(0))
+            glVertexAttribDivisor(TINT_LOCATION, 1)
+
+            state.bind_vertex_array(0)
+
+    def set_transforms(self, matrices: np.ndarray) -> None:
+        """
+        Replaces model matrices of all instances. The number of instances follows the number of matrices,
+        new instances get white tint.
+
+        :param matrices: Array of shape (N, 4, 4), same layout as Arithmetic matrices.
+        """
+        self._matrices = np.matmul(self._scale_matrix, np.asarray(matrices, dtype=np.float32))
+        count = len(self._matrices)
+        # Keep existing tints
+        tints = np.ones((count, 4), dtype=np.float32)
+        kept = min(count, self.count)
+        tints[:kept] = self._tints[:kept]
+        self._tints = tints
+        if self._motions is not None:  # New instances don't move
+            motions = np.zeros((count, 2, 4), dtype=np.float32)
+            motions[:kept] = self._motions[:kept]
+            self._motions = motions
+        self.count = count
+        self._bvh = None
+        if count > self._capacity:
+            self._capacity = count
+            self._upload(self._model_vbo, self._matrices, orphan=True)
+            self._upload(self._tint_vbo, self._tints, orphan=True)
+            if self._motions is not None:
+                self._upload(self._motion_vbo, self._motions, orphan=True)
+        else:
+            self._upload(self._model_vbo, self._matrices)
+            self._upload(self._tint_vbo, self._tints)
+            if self._motions is not None:
+                self._upload(self._motion_vbo, self._motions)
+        self._uploaded, self._drawn = None, count
+
+    def set_tints(self, colors: np.ndarray) -> None:
+        """
+        Replaces tint colors of all instances (multiplied with the texture color).
+
+        :param colors: Array of shape (N, 3) or (N, 4), N equal to the number of instances.
+        """
+        colors = np.asarray(colors, dtype=np.float32)
+        if len(colors) != self.count:
+            raise ValueError(f"Expected {self.count} colors, got {len(colors)}")
+        if colors.shape[1] == 3:
+            colors = np.hstack((colors, np.ones((self.count, 1), dtype=np.float32)))
+        self._tints = colors
+        self._upload(self._tint_vbo, colors if self._uploaded is None else colors[self._uploaded])
+
+    @property
+    def animated(self) -> bool:
+        """True if instances have motions, drawn with the ANIMATED shader variant."""
+        return self._motions is not None
+
+    def set_motions(self, motions) -> None:
+        """
+        Replaces parametric motions of all instances, evaluated by the vertex shader from the scene time on top
+        of their model matrices. Only the time changes per frame, nothing is uploaded.
+
+        :param motions: animation.Motion of each instance, or packed motions of shape (N, 2, 4); N equal to the
+                        number of instances.
+        """
+        motions = pack_motions(motions)
+        if len(motions) != self.count:
+            raise ValueError(f"Expected {self.count} motions, got {len(motions)}")
+        if self._motion_vbo is None:
+            self._motion_vbo = glGenBuffers(1)
+            glBindBuffer(GL_ARRAY_BUFFER, self._motion_vbo)
+            glBufferData(GL_ARRAY_BUFFER, self._capacity * 32, None, GL_DYNAMIC_DRAW)
+            for vao in self.vaos:
+                state.bind_vertex_array(vao)
+                for row in range(2):
+                    glEnableVertexAttribArray(MOTION_LOCATION + row)
+                    glVertexAttribPointer(MOTION_LOCATION + row, 4, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(16 * row))
+                    glVertexAttribDivisor(MOTION_LOCATION + row, 1)
+            state.bind_vertex_array(0)
+        self._motions = motions
+        self._bvh = None  # Bounds grow by the motions
+        if self._drawn:
+            self._upload(self._motion_vbo, motions if self._uploaded is None else motions[self._uploaded])
+
+    def _upload(self, vbo: int, data: np.ndarray, orphan: bool = False) -> None:
+        data = np.ascontiguousarray(data)
+        glBindBuffer(GL_ARRAY_BUFFER, vbo)
+        if orphan:
+            glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_DYNAMIC_DRAW)
+        else:
+            glBufferSubData(GL_ARRAY_BUFFER, 0, data.nbytes, data)
+
+    def _pack(self, frustum: Frustum = None) -> None:
+        """Packs instances intersecting the frustum (all if None) into the instance buffers, if the set changed."""
+        visible = None
+        if frustum is not None:
+            visible = self._cull(frustum)
+        if visible is None and self._uploaded is None:
+            return
+        if visible is not None and self._uploaded is not None and np.array_equal(visible, self._uploaded):
+            return
+        matrices, tints = (self._matrices, self._tints) if visible is None else \
+            (self._matrices[visible], self._tints[visible])
+        if len(matrices):
+            self._upload(self._model_vbo, matrices)
+            self._upload(self._tint_vbo, tints)
+            if self._motions is not None:
+                self._upload(self._motion_vbo, self._motions if visible is None else self._motions[visible])
+        self._uploaded, self._drawn = visible, len(matrices)
+
+    def _cull(self, frustum: Frustum):
+        """Indices of instances intersecting the frustum, None if all of them do."""
+        if self._bvh is None:
+            center, radius = self.mesh.bounds.center, self.mesh.bounds.radius
+            centers, radii = np.tile(center, (self.count, 1)), np.full(self.count, radius)
+            if self._motions is None:
+                centers, radii = transform_spheres(centers, radii, self._matrices)
+            else:
+                centers, radii = motion_spheres(centers, radii, self._matrices, margins(self._motions))
+            if self.count < BVH_MIN_INSTANCES:
+                visible = np.flatnonzero(frustum.test_spheres(centers, radii))
+            else:
+                self._bvh = BVH(centers, radii)
+        if self._bvh is not None:
+            visible = self._bvh.query(frustum)
+
+        culled = self.count - len(visible)
+        frustum.objects_tested += self.count
+        frustum.objects_culled += culled
+        frustum.triangles_culled += culled * int(self.mesh.triangles.sum())
+        return visible if culled else None
+
+    def release(self) -> None:
+        """Frees instance buffers and gives the shared mesh back to the registry."""
+        if self.mesh is not None:
+            glDeleteVertexArrays(len(self.vaos), self.vaos)
+            glDeleteBuffers(2, [self._model_vbo, self._tint_vbo])
+            if self._motion_vbo is not None:
+                glDeleteBuffers(1, [self._motion_vbo])
+            state.invalidate()  # Deleted names may be reused
+            self._registry.release_mesh(self._path)
+            self.mesh = None
+
+    def submit(self, queue: RenderQueue, shader: Shader, frustum: Frustum = None) -> None:
+        """Queues one instanced draw item per material, only with instances inside the frustum if given."""
+        if self.count:
+            self._pack(frustum)
+        if self._drawn == 0:
+            return
+        mesh = self.mesh
+        defines = {"ANIMATED": 1} if self._motions is not None else {}
+        for vao, tex, length, index_type, mat in zip(self.vaos, mesh.textures, mesh.lengths, mesh.index_types,
+                                                     mesh.materials):
+            queue.submit(shader.for_material(mat, **defines), vao, tex, mat, None, length, index_type,
+                         instances=self._drawn, blended=mat.dissolve < 1.0)
@@ -1,44 +1,63 @@
+import abc
+import math
+
+import numpy as np
 import Arithmetic
+import Vector3
 from Vector3 import Vector3 as v3
 
 from shader import Shader
 from loaded_object import LoadedObject
+from uniform_buffer import UniformBuffer
+from render_queue import RenderQueue
+from scene_graph import SceneNode
+from light_clusters import attenuation_radius
+
+# std140 layout of the Lights uniform block (see phong_fs.glsl); point lights are in LightClusters
+DIR_LIGHT_OFFSET = 0
+SPOT_LIGHT_OFFSET = 64
+DAYTIME_OFFSET = SPOT_LIGHT_OFFSET + 80
+LIGHTS_BLOCK_SIZE = DAYTIME_OFFSET + 32
 
 #Based On Inheritance OOP Prperty
-class AbstractLight:
+class AbstractLight(abc.ABC):
     """Abstract base class."""
 
-    def __init__(self, amb: v3, dif: v3, spe: v3, uni_name: str):
+    def __init__(self, amb: v3, dif: v3, spe: v3, offset: int):
         self._ambient: v3 = amb
         self._diffuse: v3 = dif
         self._specular: v3 = spe
-        self._uniform_name: str = uni_name
+        self._offset: int = offset  # Byte offset of the light struct in the Lights block or the light list
+
+    @abc.abstractmethod
+    def pack(self) -> np.ndarray:
+        """Light struct as std140 rows of 4 floats."""
 
-    def use_light(self, shader: Shader) -> None:
-        shader.set_v3(f"{self._uniform_name}.ambient", self._ambient)
-        shader.set_v3(f"{self._uniform_name}.diffuse", self._diffuse)
-        shader.set_v3(f"{self._uniform_name}.specular", self._specular)
+    def update_block(self, block: UniformBuffer) -> None:
+        """Writes the light into the Lights uniform block or LightClusters (uploaded only if changed)."""
+        block.write(self._offset, self.pack())
 
 
 class DirLight(AbstractLight):
-    """Directional light."""
+    """Directional light. Its diffuse and specular colors are multiplied by the sky color (see Daytime)."""
 
-    def __init__(self, amb: v3, dif: v3, spe: v3, direction: v3, uni_name: str):
+    def __init__(self, amb: v3, dif: v3, spe: v3, direction: v3, offset: int = DIR_LIGHT_OFFSET):
         #super() method lets you access methods from a parent class
-        super().__init__(amb, dif, spe, uni_name)   
+        super().__init__(amb, dif, spe, offset)   
 
         self._direction: v3 = direction
 
-    def use_light(self, shader: Shader) -> None:
-        super().use_light(shader)
-
-        shader.set_v3(f"{self._uniform_name}.direction", self._direction)
+    def pack(self) -> np.ndarray:
+        # direction, ambient, diffuse, specular: vec3 padded to vec4
+        rows = np.zeros((4, 4), dtype=np.float32)
+        rows[:, :3] = (self._direction, self._ambient, self._diffuse, self._specular)
+        return rows
 
 
 class PointLight(AbstractLight):
     """Point light with attenuation."""
 
-    def __init__(self, amb: v3, dif: v3, spe: v3, k: v3, pos: v3, uni_name: str,
+    def __init__(self, amb: v3, dif: v3, spe: v3, k: v3, pos: v3, offset: int,
                  lss: Shader, obj: LoadedObject):
         """Point light with attenuation.
 
@@ -47,11 +66,11 @@ class PointLight(AbstractLight):
         :param spe: Specular color.
         :param k: Attenuation terms: [constant, linear, quadratic].
         :param pos: Position.
-        :param uni_name: Uniform name.
+        :param offset: Byte offset of the light in the light list of LightClusters (POINT_LIGHT_SIZE per light).
         :param lss: Light source shader
-        :param obj: LoadedObject containing a representation of the light source.
+        :param obj: LoadedObject containing a representation of the light source, None for no marker.
         """
-        super().__init__(amb, dif, spe, uni_name)
+        super().__init__(amb, dif, spe, offset)
 
         self._constant: float = k[0]
         self._linear: float = k[1]
@@ -64,35 +83,80 @@ class PointLight(AbstractLight):
         self._pos, self._model = self._set_pos(pos)
 
         self._obj: LoadedObject = obj
+        self._lod_levels = None
+
+        self._node: SceneNode = None
+        self._node_version: int = -1
 
     def set_pos(self, pos: v3):
         self._pos, self._model = self._set_pos(pos)
 
+    def attach(self, node: SceneNode) -> None:
+        """Makes the light follow the position of a scene graph node."""
+        self._node, self._node_version = node, -1
+
+    def _sync_node(self) -> None:
+        if self._node is not None and self._node.version != self._node_version:
+            self._node_version = self._node.version
+            self.set_pos(v3(Vector3.from_matrix44_translation(self._node.world)))
+
+    def update_block(self, block: UniformBuffer) -> None:
+        self._sync_node()
+        super().update_block(block)
+
     def _set_pos(self, pos: v3) -> (v3, Arithmetic):
         pos_matrix = Arithmetic.create_from_translation(pos)
         model = Arithmetic.multiply(self._scale_matrix, pos_matrix)
 
         return pos, model
 
-    def use_light(self, shader: Shader) -> None:
-        super().use_light(shader)
-
-        shader.set_v3(f"{self._uniform_name}.position", self._pos)
-        shader.set_float(f"{self._uniform_name}.constant", self._constant)
-        shader.set_float(f"{self._uniform_name}.linear", self._linear)
-        shader.set_float(f"{self._uniform_name}.quadratic", self._quadratic)
-
-    def draw(self) -> None:
+    def pack(self) -> np.ndarray:
+        # vec3 members with the attenuation floats packed into their 4th component
+        rows = np.zeros((4, 4), dtype=np.float32)
+        rows[:, :3] = (self._pos, self._ambient, self._diffuse, self._specular)
+        rows[:3, 3] = (self._constant, self._linear, self._quadratic)
+        return rows
+
+    @property
+    def radius(self) -> float:
+        """Distance at which the light's influence ends (see light_clusters.attenuation_radius)."""
+        intensity = max(max(self._ambient), max(self._diffuse), max(self._specular))
+        return float(attenuation_radius(self._constant, self._linear, self._quadratic, intensity))
+
+    @property
+    def marker(self) -> (LoadedObject, np.ndarray):
+        """Object representing the light source (None if there is none or it isn't loaded) and its model matrix."""
+        self._sync_node()
+        if self._obj is None or self._obj.mesh is None:
+            return None, self._model
+        return self._obj, self._model
+
+    @property
+    def lod_levels(self) -> np.ndarray:
+        """Level of detail of each material of the marker (the marker object is shared between lights)."""
+        if self._obj is None or self._obj.mesh is None:
+            return None
+        if self._lod_levels is None or len(self._lod_levels) != len(self._obj.mesh.vaos):
+            self._lod_levels = np.zeros(len(self._obj.mesh.vaos), dtype=np.int64)  # Marker (re)loaded
+        return self._lod_levels
+
+    def submit(self, queue: RenderQueue, visible=None, levels=None) -> None:
+        """Queues the light source representation, colored by diffuse color.
+
+        :param visible: Boolean mask of the marker's materials to queue (see Frustum.cull), all if None.
+        :param levels: Level of detail of each material of the marker, full detail if None.
+        """
+        self._sync_node()
         if self._obj is not None:
-            self._light_source_shader.set_v3("color", self._diffuse)
-            self._obj.draw(self._light_source_shader, model=self._model)
+            self._obj.submit(queue, self._light_source_shader, model=self._model, color=self._diffuse,
+                             visible=visible, levels=levels)
 
 
 class SpotLight(PointLight):
     """Spotlight."""
 
     def __init__(self, amb: v3, dif: v3, spe: v3, k: v3, pos: v3, direction: v3,
-                 co: float, oco: float, uni_name: str, lss: Shader, obj: LoadedObject):
+                 co: float, oco: float, offset: int, lss: Shader, obj: LoadedObject):
         """Spotlight.
 
         :param amb: Ambient color.
@@ -103,22 +167,56 @@ class SpotLight(PointLight):
         :param direction: Direction.
         :param co: Cut off (cosine).
         :param oco: Outer cut off.
-        :param uni_name: Uniform name.
+        :param offset: Byte offset of the light in the Lights uniform block.
         :param lss: Light source shader
         :param obj: LoadedObject containing a representation of the light source.
         """
-        super().__init__(amb, dif, spe, k, pos, uni_name, lss, obj)
+        super().__init__(amb, dif, spe, k, pos, offset, lss, obj)
 
         self._direction: v3 = direction
         self._cut_off: float = co
         self._outer_cut_off: float = oco
 
-    def use_light(self, shader: Shader) -> None:
-        super().use_light(shader)
-
-        shader.set_v3(f"{self._uniform_name}.direction", self._direction)
-        shader.set_float(f"{self._uniform_name}.cutOff", self._cut_off)
-        shader.set_float(f"{self._uniform_name}.outerCutOff", self._outer_cut_off)
+    def pack(self) -> np.ndarray:
+        # position, direction, ambient, diffuse, specular with the scalars packed into their 4th component
+        rows = np.zeros((5, 4), dtype=np.float32)
+        rows[:, :3] = (self._pos, self._direction, self._ambient, self._diffuse, self._specular)
+        rows[:, 3] = (self._cut_off, self._outer_cut_off, self._constant, self._linear, self._quadratic)
+        return rows
 
     def set_dir(self, direction: v3):
         self._direction = direction
+
+
+class Daytime:
+    def __init__(self, day: v3, night: v3, rate: float, offset: int = DAYTIME_OFFSET):
+        """Day-night cycle of the sky color, derived from the scene time by the shaders (SkyColor()).
+
+        The sky color is a blend of the day and night colors, (sin(time * rate) + 1) / 2 of the night color.
+        It colors the directional light and the background.
+
+        :param day: Sky color at noon.
+        :param night: Sky color at midnight.
+        :param rate: Radians of the cycle per second.
+        :param offset: Byte offset of the Daytime struct in the Lights uniform block.
+        """
+        self._day: v3 = day
+        self._night: v3 = night
+        self._rate: float = rate
+        self._offset: int = offset
+
+    def sky_color(self, time: float) -> v3:
+        """Sky color at given scene time, as the shaders compute it."""
+        night = (math.sin(time * self._rate) + 1) / 2
+        return self._day * (1 - night) + self._night * night
+
+    def pack(self) -> np.ndarray:
+        # day, night: vec3 with the rate packed into the 4th component of day
+        rows = np.zeros((2, 4), dtype=np.float32)
+        rows[:, :3] = (self._day, self._night)
+        rows[0, 3] = self._rate
+        return rows
+
+    def update_block(self, block: UniformBuffer) -> None:
+        """Writes the cycle into the Lights uniform block (uploaded only if changed)."""
+        block.write(self._offset, self.pack())
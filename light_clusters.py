@@ -0,0 +1,238 @@
+import numpy as np
+from OpenGL.GL import *
+from gl_state import state
+from uniform_buffer import UniformBuffer, CLUSTERS_BINDING
+
+
+# Texture units of the light buffers (0 and 1 hold material textures)
+LIGHTS_UNIT = 2
+CLUSTERS_UNIT = 3
+LIGHT_INDICES_UNIT = 4
+
+# A point light is 4 RGBA32F texels: position + constant, ambient + linear, diffuse + quadratic,
+# specular + radius (filled in on upload)
+POINT_LIGHT_SIZE = 64
+# Attenuated intensity at which a light's influence ends; the shader fades lights out towards that radius,
+# so leaving a light out of clusters beyond it doesn't show seams
+LIGHT_CUTOFF = 1.0 / 256
+
+# std140 layout of the Clusters uniform block (see phong_fs.glsl):
+# vec4 clusterGrid (tiles x, tiles y, depth slices, -); vec4 clusterScale (tiles per pixel x and y, slice scale, bias)
+CLUSTERS_BLOCK_SIZE = 32
+
+
+def attenuation_radius(constant, linear, quadratic, intensity):
+    """
+    Distance at which attenuation 1 / (constant + linear * d + quadratic * d^2) times intensity drops below
+    LIGHT_CUTOFF. Works on scalars and arrays alike.
+
+    :return: Radius; 0 for black lights, inf for lights that never fall below the cutoff.
+    """
+    constant, linear, quadratic = (np.asarray(k, dtype=np.float64) for k in (constant, linear, quadratic))
+    # Solve quadratic * d^2 + linear * d + c = 0 for the positive root
+    c = constant - np.asarray(intensity, dtype=np.float64) / LIGHT_CUTOFF
+    with np.errstate(divide="ignore", invalid="ignore"):
+        root = (np.sqrt(linear * linear - 4 * quadratic * c) - linear) / (2 * quadratic)
+        radii = np.where(quadratic > 0, root, np.where(linear > 0, -c / linear, np.inf))
+    return np.where(c < 0, radii, 0.0)
+
+
+def light_radii(lights: np.ndarray) -> np.ndarray:
+    """
+    Radius of influence of each light (see attenuation_radius), for its brightest color component.
+
+    :param lights: Packed point lights, shape (N,4,4) (see PointLight.pack).
+    :return: Radii, shape (N,).
+    """
+    lights = np.asarray(lights, dtype=np.float64)
+    return attenuation_radius(lights[:, 0, 3], lights[:, 1, 3], lights[:, 2, 3], lights[:, 1:, :3].max(axis=(1, 2)))
+
+
+class LightClusters:
+    def __init__(self, tiles: tuple = (16, 9), slices: int = 24, capacity: int = 64):
+        """Clustered point lights: the view frustum is split into a grid of tiles (in screen space) by
+        exponentially growing depth slices, and each cluster lists the lights whose spheres of influence
+        (see light_radii) reach into it. The fragment shader only evaluates the lights of its own cluster.
+
+        Lights are written like into a uniform block (write()), the light structs, per-cluster ranges and
+        light index lists are read by the shaders from texture buffers.
+
+        :param tiles: Number of screen tiles (x, y).
+        :param slices: Number of depth slices between near and far plane.
+        :param capacity: Initial number of light slots, grown as needed.
+        """
+        self.tiles_x, self.tiles_y = tiles
+        self.slices = slices
+        self.lights = np.zeros((capacity, 4, 4), dtype=np.float32)
+        self.count = 0  # Used light slots
+        self.counts = np.zeros(self.cluster_count, dtype=np.uint32)  # Lights per cluster of the last update
+        self.block = UniformBuffer(CLUSTERS_BLOCK_SIZE, CLUSTERS_BINDING)
+        self._lights_dirty = True
+        self._key = None  # Camera and viewport the clusters were built for
+        self._bounds = None  # View space AABB corners of the clusters, shape (2,C,3)
+        self._bounds_key = None
+        self._slice_scale, self._slice_bias = 1.0, 0.0
+        # Texture buffers: light structs, (offset, count) per cluster, light indices
+        self._buffers = glGenBuffers(3)
+        self._textures = glGenTextures(3)
+        for buffer, texture, internal_format, unit in zip(self._buffers, self._textures,
+                                                          (GL_RGBA32F, GL_RG32UI, GL_R32UI),
+                                                          (LIGHTS_UNIT, CLUSTERS_UNIT, LIGHT_INDICES_UNIT)):
+            glBindBuffer(GL_TEXTURE_BUFFER, buffer)
+            glBufferData(GL_TEXTURE_BUFFER, 16, None, GL_DYNAMIC_DRAW)
+            state.bind_texture(texture, GL_TEXTURE_BUFFER, unit)
+            glTexBuffer(GL_TEXTURE_BUFFER, internal_format, buffer)
+
+    @property
+    def cluster_count(self) -> int:
+        return self.tiles_x * self.tiles_y * self.slices
+
+    def write(self, offset: int, values) -> None:
+        """
+        Writes a light struct (like UniformBuffer.write), growing the list if needed.
+
+        :param offset: Byte offset, POINT_LIGHT_SIZE per light.
+        :param values: Packed light, 16 floats.
+        """
+        index = offset // POINT_LIGHT_SIZE
+        if index >= len(self.lights):
+            grown = np.zeros((max(index + 1, 2 * len(self.lights)), 4, 4), dtype=np.float32)
+            grown[:len(self.lights)] = self.lights
+            self.lights = grown
+        values = np.reshape(values, (4, 4))
+        self.count = max(self.count, index + 1)
+        if not np.array_equal(self.lights[index], values):
+            self.lights[index] = values
+            self._lights_dirty = True
+
+    def _cluster_bounds(self, projection: np.ndarray, near: float, far: float) -> np.ndarray:
+        """View space AABBs of all clusters, shape (2,C,3): minimum and maximum corners."""
+        key = (projection.tobytes(), near, far)
+        if key == self._bounds_key:
+            return self._bounds
+        edges = [np.linspace(-1.0, 1.0, n + 1) for n in (self.tiles_x, self.tiles_y)]
+        depths = near * (far / near) ** (np.arange(self.slices + 1) / self.slices)
+        k, j, i = np.meshgrid(np.arange(self.slices), np.arange(self.tiles_y), np.arange(self.tiles_x),
+                              indexing="ij")
+        k, j, i = k.ravel(), j.ravel(), i.ravel()
+        bounds = np.empty((2, self.cluster_count, 3))
+        for axis, (edge, tile) in enumerate(zip(edges, (i, j))):
+            # NDC to view space at depth d (row vectors): x = (ndc + P[2][a]) * d / P[a][a]
+            scale, shift = projection[axis][axis], projection[2][axis]
+            corners = np.stack([(edge[tile + a] + shift) * depths[k + b] / scale for a in (0, 1) for b in (0, 1)])
+            bounds[0, :, axis], bounds[1, :, axis] = corners.min(axis=0), corners.max(axis=0)
+        bounds[0, :, 2], bounds[1, :, 2] = -depths[k + 1], -depths[k]
+        self._bounds, self._bounds_key = bounds.astype(np.float32), key
+        return self._bounds
+
+    def _tile_ranges(self, centers: np.ndarray, radii: np.ndarray, projection: np.ndarray,
+                     near: float) -> list:
+        """First and last tile along x and y covered by the projected bounding box of each sphere."""
+        depth_min, depth_max = -centers[:, 2] - radii, -centers[:, 2] + radii
+        in_front = depth_min > near  # Spheres crossing the near plane may cover the whole screen
+        ranges = []
+        for axis, tiles in ((0, self.tiles_x), (1, self.tiles_y)):
+            scale, shift = projection[axis][axis], projection[2][axis]
+            low, high = centers[:, axis] - radii, centers[:, axis] + radii
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ndc_low = np.minimum(low / depth_min, low / depth_max) * scale - shift
+                ndc_high = np.maximum(high / depth_min, high / depth_max) * scale - shift
+            ndc_low, ndc_high = np.where(in_front, ndc_low, -1.0), np.where(in_front, ndc_high, 1.0)
+            first = np.floor((np.clip(ndc_low, -1.0, 1.0) + 1.0) * 0.5 * tiles).astype(np.int64)
+            last = np.floor((np.clip(ndc_high, -1.0, 1.0) + 1.0) * 0.5 * tiles).astype(np.int64)
+            visible = (ndc_high >= -1.0) & (ndc_low <= 1.0)
+            ranges.append((np.minimum(first, tiles - 1), np.minimum(last, tiles - 1), visible))
+        return ranges
+
+    def assign(self, view: np.ndarray, projection: np.ndarray, near: float, far: float) -> (np.ndarray, np.ndarray):
+        """
+        Bins the lights into clusters, vectorized over all (light, cluster) candidate pairs.
+
+        Candidates are the clusters inside the screen rectangle and depth range of a light's sphere, they are
+        kept if the sphere intersects the cluster's view space box.
+
+        :return: Lights per cluster (C,) and light indices sorted by cluster.
+        """
+        view = np.asarray(view, dtype=np.float64)
+        projection = np.asarray(projection, dtype=np.float64)
+        lights = self.lights[:self.count]
+        radii = light_radii(lights)
+        centers = lights[:, 0, :3].astype(np.float64) @ view[:3, :3] + view[3, :3]
+
+        depth = -centers[:, 2]
+        log_ratio = np.log(far / near)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slice_first = np.floor(np.log(np.maximum(depth - radii, near) / near) / log_ratio * self.slices)
+            slice_last = np.floor(np.log(np.clip(depth + radii, near, far) / near) / log_ratio * self.slices)
+        (x_first, x_last, x_visible), (y_first, y_last, y_visible) = self._tile_ranges(centers, radii, projection,
+                                                                                      near)
+        keep = (radii > 0) & (depth + radii > near) & (depth - radii < far) & x_visible & y_visible
+        index = np.flatnonzero(keep)
+        x_first, y_first = x_first[index], y_first[index]
+        z_first = np.clip(slice_first[index], 0, self.slices - 1).astype(np.int64)
+        nx = x_last[index] - x_first + 1
+        ny = y_last[index] - y_first + 1
+        nz = np.clip(slice_last[index], 0, self.slices - 1).astype(np.int64) - z_first + 1
+
+        # Expand every light into its candidate clusters: local index within its box -> (x, y, z) -> cluster
+        sizes = nx * ny * nz
+        owner = np.repeat(np.arange(len(index), dtype=np.int32), sizes)
+        first = (z_first * self.tiles_y + y_first) * self.tiles_x + x_first
+        local = np.arange(len(owner), dtype=np.int32) - np.repeat((np.cumsum(sizes) - sizes).astype(np.int32), sizes)
+        z, local = np.divmod(local, (nx * ny).astype(np.int32)[owner])
+        y, x = np.divmod(local, nx.astype(np.int32)[owner])
+        cluster = first.astype(np.int32)[owner] + (z * self.tiles_y + y) * self.tiles_x + x
+
+        # Exact sphere / box test
+        bounds = self._cluster_bounds(projection, near, far)
+        # (np.take is much faster than fancy indexing for gathering rows)
+        center = np.take(centers[index].astype(np.float32), owner, axis=0)
+        offset = np.maximum(center, np.take(bounds[0], cluster, axis=0))
+        np.minimum(offset, np.take(bounds[1], cluster, axis=0), out=offset)
+        offset -= center
+        hit = np.einsum("ij,ij->i", offset, offset) <= (radii[index] ** 2).astype(np.float32)[owner]
+        cluster, light = cluster[hit], index[owner[hit]]
+
+        # Stable sort of 16 bit keys is a radix sort
+        order = np.argsort(cluster.astype(np.uint16) if self.cluster_count <= 1 << 16 else cluster, kind="stable")
+        counts = np.bincount(cluster, minlength=self.cluster_count).astype(np.uint32)
+        self._slice_scale, self._slice_bias = self.slices / log_ratio, self.slices * np.log(near) / log_ratio
+        return counts, light[order].astype(np.uint32)
+
+    def update(self, view: np.ndarray, projection: np.ndarray, near: float, far: float,
+               width: int, height: int) -> None:
+        """Rebuilds and uploads the clusters if lights, camera or viewport changed, and binds the buffers."""
+        key = (np.asarray(view).tobytes(), np.asarray(projection).tobytes(), near, far, width, height)
+        if self._lights_dirty or key != self._key:
+            if state.count(self._lights_dirty):
+                lights = self.lights[:max(self.count, 1)].copy()
+                lights[:self.count, 3, 3] = light_radii(lights[:self.count])
+                self._upload(0, lights)
+            counts, indices = self.assign(view, projection, near, far)
+            ranges = np.stack([np.cumsum(counts) - counts, counts], axis=1).astype(np.uint32)
+            state.count(True)
+            self._upload(1, ranges)
+            state.count(True)
+            self._upload(2, indices if len(indices) else np.zeros(1, dtype=np.uint32))
+            self.counts = counts
+            self._lights_dirty, self._key = False, key
+            self.block.write(0, (self.tiles_x, self.tiles_y, self.slices, self.count,
+                                 self.tiles_x / max(width, 1), self.tiles_y / max(height, 1),
+                                 self._slice_scale, self._slice_bias))
+        self.block.upload()
+        self.block.bind()
+        for texture, unit in zip(self._textures, (LIGHTS_UNIT, CLUSTERS_UNIT, LIGHT_INDICES_UNIT)):
+            state.bind_texture(texture, GL_TEXTURE_BUFFER, unit)
+
+    def _upload(self, ind: int, data: np.ndarray) -> None:
+        glBindBuffer(GL_TEXTURE_BUFFER, self._buffers[ind])
+        glBufferData(GL_TEXTURE_BUFFER, data.nbytes, data, GL_DYNAMIC_DRAW)  # Orphans the old storage
+
+    def cluster_index(self, x: np.ndarray, y: np.ndarray, depth: np.ndarray, width: int, height: int) -> np.ndarray:
+        """Cluster of fragments at window coordinates (x, y) and view space depth, as the shader computes it."""
+        i = np.clip((np.asarray(x) * self.tiles_x / width).astype(np.int64), 0, self.tiles_x - 1)
+        j = np.clip((np.asarray(y) * self.tiles_y / height).astype(np.int64), 0, self.tiles_y - 1)
+        with np.errstate(divide="ignore"):
+            k = np.floor(np.log(depth) * self._slice_scale - self._slice_bias)
+        k = np.clip(np.nan_to_num(k, neginf=0), 0, self.slices - 1).astype(np.int64)
+        return (k * self.tiles_y + j) * self.tiles_x + i
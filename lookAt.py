@@ -5,17 +5,20 @@ def normalize(vec):
     to unit length.
     """
 
-    return (vec / np.sqrt(np.sum(vec**2, axis=-1)))
+    return (vec / np.sqrt(np.sum(vec**2, axis=-1, keepdims=True)))
 
 
-def create_look_at(eye, target, up, dtype=None):
+def create_look_at(eye, target, up, dtype=None, out=None):
     """
     :param numpy.array eye: Position of the camera in world coordinates.
     :param numpy.array target: The position in world coordinates that the camera is looking at.
     :param numpy.array up: The up vector of the camera.
+    :param numpy.array out: Optional preallocated result, (4,4) or (N,4,4) when eye/target are stacked (N,3).
 
     :return: A look at matrix that can be used as a viewMatrix
     """
+    if out is not None or np.ndim(eye) > 1 or np.ndim(target) > 1:
+        return _create_look_at_batch(eye, target, up, dtype, out)
 
     eye = np.asarray(eye)
     target = np.asarray(target)
@@ -34,3 +37,25 @@ def create_look_at(eye, target, up, dtype=None):
             (-np.dot(side, eye), -np.dot(up, eye), -np.dot(forward, eye), 1.0)
         ), dtype=dtype)
 
+
+def _create_look_at_batch(eye, target, up, dtype, out):
+    """Vectorized create_look_at, writing into out."""
+    eye = np.asarray(eye)
+    target = np.asarray(target)
+    shape = np.broadcast(eye, target).shape[:-1]
+    if out is None:
+        out = np.empty(shape + (4, 4), dtype=dtype or np.float32)
+
+    forward = normalize(eye - target)
+    side = normalize(np.cross(forward, up))
+    up = np.cross(side, forward)
+
+    out[..., 0:3, 0] = side
+    out[..., 0:3, 1] = up
+    out[..., 0:3, 2] = forward
+    out[..., 0:3, 3] = 0.0
+    out[..., 3, 0] = -np.sum(side * eye, axis=-1)
+    out[..., 3, 1] = -np.sum(up * eye, axis=-1)
+    out[..., 3, 2] = -np.sum(forward * eye, axis=-1)
+    out[..., 3, 3] = 1.0
+    return out
@@ -1,38 +1,59 @@
 # PLease Increase Brightness To MAX Level.
 
+import argparse
+
 import glfw
 from OpenGL.GL import *
 import math
-import lookAt
-import Perspective_projection
+import numpy as np
 import Arithmetic
 from Vector3 import Vector3 as v3
 import Vector3
 
-from shader import Shader
+from gl_context import GlfwContext
+from clock import WallClock
+from input_script import InputScript
+from shader import Shader, ShaderPermutations
+from camera import Camera
+from gl_state import state
+from profiler import profiler
+from render_queue import RenderQueue
+from scene_graph import SceneGraph
+from culling import Frustum
+from asset_loader import AssetLoader
 from loaded_object import LoadedObject
-from light import DirLight, PointLight, SpotLight
+from light import DirLight, PointLight, SpotLight, Daytime, SPOT_LIGHT_OFFSET, LIGHTS_BLOCK_SIZE
+from light_clusters import LightClusters, POINT_LIGHT_SIZE
+from deferred import DeferredRenderer
+from dynamic_buffer import ring
+from uniform_buffer import UniformBuffer, CAMERA_BINDING, CAMERA_BLOCK_SIZE, CAMERA_TIME_OFFSET, LIGHTS_BINDING
+from animation import Motion
+from flight_recorder import FlightRecorder, FlightReplay
 
 
 class Window:
-    def __init__(self, width: int, height: int, title: str):
+    def __init__(self, width: int, height: int, title: str, context=None, clock=None):
+        """A380 scene, rendered into a window or offscreen.
+
+        :param width: Viewport width.
+        :param height: Viewport height.
+        :param title: Window title.
+        :param context: GL context to render with (GlfwContext or EglContext), a visible GLFW window if None.
+        :param clock: Source of frame times for main_loop (WallClock or FixedStepClock), real time if None.
+        """
         # Initialize window
-        if not glfw.init():
-            raise Exception("GLFW cannot be initialized!")
-
         self._width, self._height = width, height
-        self._window = glfw.create_window(width, height, 'AirBUS A380 Modeling', None, None)
-
-        if not self._window:
-            glfw.terminate()
-            raise Exception("Window cannot be created!")
-
-        # Set resize handler
-        glfw.set_window_size_callback(self._window, self._on_resize)
-        # Set keyboard input handler
-        glfw.set_key_callback(self._window, self._on_key_input)
-        # Set window as current context
-        glfw.make_context_current(self._window)
+        self.context = context or GlfwContext(width, height, 'AirBUS A380 Modeling')
+        # Set resize and keyboard input handlers
+        self.context.set_callbacks(self._on_resize, self._on_key_input)
+        self.clock = clock or WallClock()
+        self._time: float = 0.0  # Scene time of the current frame in seconds
+        self.input_script: InputScript = None  # Scripted key input replayed by render_frame
+        self.recorder: FlightRecorder = None  # Records Moving_Plane's flight every frame
+        self.replay: FlightReplay = None  # Flies Moving_Plane and the spotlight instead of the keys
+        self.replay_offset: float = 0.0  # Replay time minus scene time, scrubbed by keys [ and ]
+        self.show_profile: bool = False  # Profiler statistics in the window title (key P)
+        self._profile_frames: int = 0
 
         # Set options
         glEnable(GL_DEPTH_TEST)    #Enable Depth Buffer
@@ -40,8 +61,8 @@ class Window:
         glEnable(GL_BLEND)          #Colour
 
         glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-        self._background_color_night = v3([0.0, 0.05, 0.1])
-        self._background_color_day = v3([0.6, 0.7, 0.75])
+        # Sky and sun/moon color, derived from the scene time in the shaders
+        self.daytime = Daytime(day=v3([0.6, 0.7, 0.75]), night=v3([0.0, 0.05, 0.1]), rate=0.1)
 
         # Camera
         self.sel_camera: str = "static"  # Selected camera mode
@@ -49,36 +70,62 @@ class Window:
         self._static_target: v3 = v3([0, 2.0, 0])  #Making camera look slightly up to the sky form the centre of the plane
         self._default_eye: v3 = v3([0, 8, 10]) #Default camera position, Camera is always looking along Z-axis ; called eye space
 
-        # Matrices
-        self._fov, self._near, self._far = None, None, None
-        self._eye, self._target, self._up = None, None, None
-        self.projection_matrix, self.view_matrix = None, None
+        # Uniform blocks shared by all shaders, streamed through the ring once per frame
+        self.camera_block = UniformBuffer(CAMERA_BLOCK_SIZE, CAMERA_BINDING, streamed=True)
+        self.lights_block = UniformBuffer(LIGHTS_BLOCK_SIZE, LIGHTS_BINDING, streamed=True)
+        # Point lights, binned into view frustum clusters so fragments only shade the lights reaching them
+        self.light_clusters = LightClusters()
+
+        # Matrices, rebuilt only when eye, target, fov or aspect change
+        self.camera: Camera = None
         self._prepare_matrices()
+        # GL calls (issued, skipped) of the last frame
+        self.gl_calls = (0, 0)
 
 
-        # Shaders
+        # Shaders; Phong shaders have a variant per kind of material texture, compiled on first use
         self.shaders = {
-            "phong": Shader("shaders/phong_vs.glsl", "shaders/phong_fs.glsl"),
+            "phong": ShaderPermutations("shaders/phong_vs.glsl", "shaders/phong_fs.glsl"),
             "light_source": Shader("shaders/light_source_vs.glsl", "shaders/light_source_fs.glsl"),
+            "phong_instanced": ShaderPermutations("shaders/phong_vs.glsl", "shaders/phong_fs.glsl", INSTANCED=1),
         }
-        self.current_shader: Shader = None
-        self._use_shader(self.shaders["phong"])
+        self.hot_reload: bool = True  # main_loop recompiles shaders whose source files changed
+        self._reload_checked: float = 0.0
+        # Draw items of all objects and light markers, sorted by state before drawing
+        self.render_queue = RenderQueue()
+        # Material chunks and instances outside of the view are not queued
+        self.frustum = Frustum()
+        self.show_cull_stats: bool = False  # Culled objects / triangles in the window title (key C)
+        self._cull_stats = None
+        self.use_lod: bool = True  # Levels of detail chosen by projected size (key L toggles full detail)
+        self.use_deferred: bool = False  # Deferred shading of opaque objects instead of forward (key G)
+        self._deferred: DeferredRenderer = None  # Created on first use
 
         #Sensitivity WASD
         self.xTrans, self.yTrans, self.zTrans = 0,0,0
+        # Per-frame transform buffers of Moving_Plane: translation xyz, y rotation, z rotation
+        self._plane_params = np.zeros((1, 5))
+        self._plane_models = np.empty((1, 4, 4), dtype=np.float32)
 
-        # Scene
+        # Scene, loaded in the background: objects appear as their meshes are uploaded, spheres until then
+        self.loader = AssetLoader(placeholder="data/uv_sphere.obj")
         self.scene = {
-            "Runway": LoadedObject("data/floor.obj", 0, 0, 0, 2.0),  #position and scaling
-            "Center_Plane": LoadedObject("data/A380.obj", 0, 2.1, 0, scale=2),
-            "Moving_Plane": LoadedObject("data/A380.obj"),
+            "Runway": LoadedObject("data/floor.obj", 0, 0, 0, 2.0, loader=self.loader),  #position and scaling
+            # Bobs 1 up and down around 2.1 + 0.23 and turns, animated by the vertex shader
+            "Center_Plane": LoadedObject("data/A380.obj", 0, 2.33, 0, scale=2, loader=self.loader,
+                                         motion=Motion(bob_amplitude=1.0, yaw_rate=-0.5)),
+            "Moving_Plane": LoadedObject("data/A380.obj", loader=self.loader),
         }
+        # Name -> InstancedObject (e.g. fleets of aircraft), each drawn with one call per material
+        self.fleets: dict = {}
 
         # Lighting
-        self._point_light_obj = LoadedObject("data/uv_sphere.obj")  # sphere to represent point light sources
+        # sphere to represent point light sources
+        self._point_light_obj = LoadedObject("data/uv_sphere.obj", loader=self.loader)
 
-        self.sun_moon = DirLight(amb=v3([0.05, 0.05, 0.05]), dif=v3([0.4, 0.4, 0.8]), spe=v3([0.4, 0.4, 0.8]),
-                                 direction=v3([-0.2, -1.0, -0.3]), uni_name="dirLight")
+        # Diffuse and specular colors are factors of the sky color
+        self.sun_moon = DirLight(amb=v3([0.05, 0.05, 0.05]), dif=v3([0.9, 0.9, 0.9]), spe=v3([0.9, 0.9, 0.9]),
+                                 direction=v3([-0.2, -1.0, -0.3]))
         point_lights = [
             #width, height, front
             (v3([10.0, 5.0, -8.0]), v3([1.0, 1.0, 1.0])),  # white
@@ -95,51 +142,52 @@ class Window:
         self.spot_light = SpotLight(amb=v3([0.0, 0.0, 0.0]), dif=v3([0.0, 1.0, 0.5]), spe=v3([0.0, 1.0, 0.5]),
                                     k=v3([1.0, 0.07, 0.017]), pos=v3([0.0]*3), direction=self.spot_light_def_dir, #position is marked at headlight
                                     co=math.cos(math.radians(22.5)), oco=math.cos(math.radians(25.0)),
-                                    uni_name="spotLight", lss=self.shaders["light_source"], obj=None)
-
-    def _pl_gen(self, positions):
+                                    offset=SPOT_LIGHT_OFFSET, lss=self.shaders["light_source"], obj=None)
+
+        # Scene graph: spotlight and cockpit camera are relative to Moving_Plane
+        self.graph = SceneGraph()
+        self._plane_nodes = [self.graph.add_node()]
+        self.scene["Moving_Plane"].attach(self._plane_nodes[0])
+        self.spot_light.attach(self.graph.add_node(
+            parent=self._plane_nodes[0], local=Arithmetic.create_from_translation(self.spot_light_offset)))
+        self._cockpit_node = self.graph.add_node(
+            parent=self._plane_nodes[0], local=Arithmetic.create_from_translation(v3([-0.9, 0.0, 0])))  #plane cockpit view
+
+    def _pl_gen(self, positions, first: int = 0, k: v3 = v3([1.0, 0.07, 0.017]), markers: bool = True):
         """Point lights generator."""
-        for i, (p, c) in enumerate(positions):
+        for i, (p, c) in enumerate(positions, first):
             light = PointLight(amb=0.05 * c, dif=1.0 * c, spe=1.0 * c,
-                               k=v3([1.0, 0.07, 0.017]), pos=p,
-                               uni_name=f"pointLights[{i}]", lss=self.shaders["light_source"],
-                               obj=self._point_light_obj)
+                               k=k, pos=p,
+                               offset=i * POINT_LIGHT_SIZE, lss=self.shaders["light_source"],
+                               obj=self._point_light_obj if markers else None)
             yield light
 
+    def add_point_lights(self, positions, k: v3 = v3([1.0, 0.07, 0.017]), markers: bool = True) -> list:
+        """
+        Adds point lights to the scene, e.g. runway edge lights.
+
+        :param positions: (position, color) of each light.
+        :param k: Attenuation terms: [constant, linear, quadratic].
+        :param markers: Draw a sphere at each light.
+        :return: The new lights.
+        """
+        lights = list(self._pl_gen(positions, len(self.point_lights), k, markers))
+        self.point_lights += lights
+        return lights
 
-    def _use_shader(self, shader: Shader) -> None:
-        self.current_shader = shader
-        self.current_shader.use()
-        # Update matrices after changing shader
-        self._update_projection()
-        self._update_view()
 
     #Camera
     def _prepare_matrices(self) -> None:
-        # Projection matrix
-        self._fov = 45
-        self._near = 0.1
-        self._far = 100
-        # View matrix
-        self._eye: v3 = self._default_eye
-        self._target: v3 = self._static_target
-        self._up: v3 = v3([0, 1, 0])
-
-    def _update_view(self) -> None:
-        """Recalculate view matrix and upload it to shader."""
-        self.view_matrix = lookAt.create_look_at(self._eye, self._target, self._up) 
-        self.current_shader.set_view(self.view_matrix)  #Uploading to Shader 
-
-    def _update_projection(self) -> None:
-        """Recalculate projection matrix and upload it to shader."""
-        a = self._width / self._height
-        self.projection_matrix = Perspective_projection.create_perspective_projection(self._fov, a, self._near, self._far)
-        self.current_shader.set_projection(self.projection_matrix) #Uploading to Shader
+        self.camera = Camera(eye=self._default_eye, target=self._static_target, up=v3([0, 1, 0]),
+                             fov=45, aspect=self._width / self._height, near=0.1, far=100)
 
     def _on_resize(self, _window, width, height) -> None:
         self._width, self._height = width, height
         glViewport(0, 0, self._width, self._height)
-        self._update_projection()
+        if height > 0:  # Minimized window
+            self.camera.aspect = self._width / self._height
+            if self._deferred is not None:
+                self._deferred.resize(self._width, self._height)
 
     def _on_key_input(self, _window, key, _scancode, action, _mode) -> None:
         left_right = {glfw.KEY_LEFT: -0.03, glfw.KEY_RIGHT: 0.03}
@@ -152,7 +200,6 @@ class Window:
             self.spot_light_angle_offset_y += up_down[key]
             if(self.spot_light_angle_offset_y <= 1.0 and self.spot_light_angle_offset_y >= -0.2):
                 self.spot_light_angle_offset_y += up_down[key]
-                print(self.spot_light_angle_offset_y)
             else:
                 if self.spot_light_angle_offset_y > 1.0:
                     self.spot_light_angle_offset_y = 1.0
@@ -179,44 +226,83 @@ class Window:
             self.zTrans += 0.05
             return
             
+        scrub = {glfw.KEY_LEFT_BRACKET: -10.0, glfw.KEY_RIGHT_BRACKET: 10.0}
+        if key in scrub and action != glfw.RELEASE:
+            self.replay_offset += scrub[key]
+            return
+
         if action != glfw.PRESS:
             return
+        if key == glfw.KEY_C:
+            self.show_cull_stats = not self.show_cull_stats
+            if not self.show_cull_stats:
+                self.context.set_title('AirBUS A380 Modeling')
+                self._cull_stats = None
+            return
+        if key == glfw.KEY_L:
+            self.use_lod = not self.use_lod
+            return
+        if key == glfw.KEY_G:
+            self.use_deferred = not self.use_deferred
+            return
+        if key == glfw.KEY_P:
+            self.show_profile = profiler.enabled = not profiler.enabled
+            if not self.show_profile:
+                self.context.set_title('AirBUS A380 Modeling')
+            profiler.reset()
+            return
         cam = {glfw.KEY_1: "static", glfw.KEY_2: "following", glfw.KEY_3: "moving"}
         if key in cam:
-            self.sel_camera = cam[key]
-            self.update_camera = True
+            self.select_camera(cam[key])
 
-    def _set_daytime(self):
-        blend_factor = (math.sin(glfw.get_time() * 0.1) + 1) / 2
-        c = self._background_color_day * (1 - blend_factor) + self._background_color_night * blend_factor
+    def select_camera(self, mode: str) -> None:
+        """Switches camera mode: "static", "following" or "moving"."""
+        self.sel_camera = mode
+        self.update_camera = True
 
-        #Changing Intensity of Day Light
-        self.sun_moon._diffuse = 0.9 * c
-        self.sun_moon._specular = 0.9 * c
+    def _set_daytime(self):
+        # The shaders derive the day light from the time, the background is cleared to the same sky color
+        c = self.daytime.sky_color(self._time)
         glClearColor(c[0], c[1], c[2], 1)  #RGBA
+        # Clean the Back buffer and Depth buffer, after choosing this frame's sky color
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
     def _move_objects(self) -> None:
-        time = glfw.get_time()
-        # Move and rotate Center_Plane
-        rot_y = Arithmetic.create_from_y_rotation(-0.5 * time)
-        translation = Arithmetic.create_from_translation(v3([0, math.sin(time) + 0.23, 0]))  #move up_down (in y dir)
+        t = self._plane_params
 
-        model = Arithmetic.multiply(translation, self.scene["Center_Plane"].pos)  # up-down movement
-        self.scene["Center_Plane"].model = Arithmetic.multiply(rot_y, model)  # rotation
-        
-        # Move and orientate Moving_Plane
-        translation = v3([-5 + self.xTrans, 0.2+ self.yTrans, self.zTrans])
-        o = self.scene["Moving_Plane"]
-        o.set_pos(translation)
-        o.model = Arithmetic.multiply(Arithmetic.create_from_y_rotation(-self.spot_light_angle_offset_x - math.pi), o.model)
-        o.model = Arithmetic.multiply(Arithmetic.create_from_z_rotation(-self.spot_light_angle_offset_y), o.model)
-
-        # Move and orientate spotlight relatively to Moving_Plane
-        pos = Arithmetic.multiply(Arithmetic.create_from_translation(self.spot_light_offset), o.model)
-        self.spot_light.set_pos(Vector3.from_matrix44_translation(pos))
+        # Center_Plane is animated by the vertex shader (see its motion)
+        # Moving_Plane: translation by WASDQE, orientation by arrow keys
+        t[0, 0:3], t[0, 3], t[0, 4] = self._plane_pose()
+
+        # Models in one vectorized call, without allocating
+        Arithmetic.compose(translations=t[:, 0:3], y_rotations=t[:, 3], z_rotations=t[:, 4], out=self._plane_models)
+        self.graph.set_locals(self._plane_nodes, self._plane_models)
+        # Spotlight and cockpit follow Moving_Plane as its child nodes
+        self.graph.update()
+
+        # Orientate spotlight
         light_dir = self._get_cockpit_look_dir() + self.spot_light_def_dir 
         self.spot_light.set_dir(light_dir)
 
+    def _plane_pose(self) -> (tuple, float, float):
+        """Position, yaw and pitch of Moving_Plane, from the WASDQE offsets and the arrow key angles."""
+        position = (-5 + self.xTrans, 0.2 + self.yTrans, self.zTrans)
+        return position, -self.spot_light_angle_offset_x - math.pi, -self.spot_light_angle_offset_y
+
+    def _fly_recorded(self) -> None:
+        """Poses Moving_Plane (and the camera mode) from the replay at the current time, then records it."""
+        if self.replay is not None:
+            position, yaw, pitch, camera = self.replay.sample(self._time + self.replay_offset,
+                                                              self.replay.track("Moving_Plane"))
+            # Inverse of _plane_pose
+            self.xTrans, self.yTrans, self.zTrans = position[0] + 5, position[1] - 0.2, position[2]
+            self.spot_light_angle_offset_x, self.spot_light_angle_offset_y = -yaw - math.pi, -pitch
+            if camera != self.sel_camera:
+                self.select_camera(camera)
+        if self.recorder is not None:
+            position, yaw, pitch = self._plane_pose()
+            self.recorder.record(self._time, [position], yaw, pitch, self.sel_camera)
+
     def _get_cockpit_look_dir(self):
         angle = math.pi / 2 + self.spot_light_angle_offset_x #translation by math.pi
         return v3([math.sin(angle), 0.0, math.cos(angle)])
@@ -225,64 +311,173 @@ class Window:
         if not self.update_camera:
             return
 
+        self.camera.attach(self._cockpit_node if self.sel_camera == "moving" else None)
         if self.sel_camera == "static":
-            self._eye = self._default_eye
-            self._target = self._static_target
+            self.camera.eye = self._default_eye
+            self.camera.target = self._static_target
             self.update_camera = False  # Static camera needs to be calculated only once.
         elif self.sel_camera == "following":
-            self._eye = self._default_eye
-            self._target = Vector3.from_matrix44_translation(self.scene["Moving_Plane"].model)
+            self.camera.eye = self._default_eye
+            self.camera.target = Vector3.from_matrix44_translation(self.scene["Moving_Plane"].model)
         elif self.sel_camera == "moving":
-            m = Arithmetic.multiply(Arithmetic.create_from_translation(v3([-0.9, 0.0, 0])), self.scene["Moving_Plane"].model)    #plane cockpit view
-            self._eye = Vector3.from_matrix44_translation(m)
-            self._target = self._eye + self._get_cockpit_look_dir()  # Front facing camera
-        self._update_view()
-
-    def _draw_light_sources(self) -> None:
-        """Draws light sources with appropriate shaders."""
-        self._use_shader(self.shaders["light_source"])
+            # Eye follows the cockpit node
+            self.camera.target = self.camera.eye + self._get_cockpit_look_dir()  # Front facing camera
+
+    def _submit_visible(self) -> None:
+        """
+        Culls objects and light markers against the view frustum in one pass, choosing their levels of detail,
+        and queues what is visible.
+        """
+        lights = [light for light in self.point_lights + [self.spot_light] if light.marker[0] is not None]
+        objects = [o for o in self.scene.values() if o.mesh is not None]
+        meshes = [o.mesh for o in objects] + [light.marker[0].mesh for light in lights]
+        models = [o.world_matrix().copy() for o in objects] + [light.marker[1] for light in lights]
+        levels = [o.lod_levels for o in objects] + [light.lod_levels for light in lights]
+        margins = [o.motion.margin if o.motion is not None else None for o in objects] + [None] * len(lights)
+        visible = self.frustum.cull(meshes, models, levels if self.use_lod else None, margins)
+        if not self.use_lod:
+            levels = [None] * len(levels)
+
+        # Light source markers, drawn with the light source shader
+        for light, mask, lods in zip(lights, visible[len(objects):], levels[len(objects):]):
+            light.submit(self.render_queue, visible=mask, levels=lods)
+        # Shaded objects, drawn with the Phong shaders
+        for o, model, mask, lods in zip(objects, models, visible, levels):
+            o.submit(self.render_queue, self.shaders["phong"], model=model, visible=mask, levels=lods)
+        for fleet in self.fleets.values():
+            fleet.submit(self.render_queue, self.shaders["phong_instanced"], frustum=self.frustum)
+
+    def _draw_scene(self) -> None:
+        """Queues the visible part of the scene, then draws it sorted by GL state."""
+        self.frustum.update(self.camera.view_matrix, self.camera.projection_matrix)
+        self.render_queue.set_view(self.camera.eye, self.camera.far)
+        with profiler.scope("cull"):
+            self._submit_visible()
+        deferred = None
+        if self.use_deferred:
+            deferred = self.deferred
+            deferred.set_lights(self.light_clusters.count, self.spot_light.radius)
+        with profiler.scope("flush"):
+            self.render_queue.flush(deferred)
+        if self.show_cull_stats:
+            self._show_cull_stats()
+
+    @property
+    def deferred(self) -> DeferredRenderer:
+        """Deferred renderer of the Phong shaded objects, lit by the same lights as the forward path."""
+        if self._deferred is None:
+            self._deferred = DeferredRenderer(self._width, self._height, {
+                self.shaders["phong"]: ShaderPermutations("shaders/phong_vs.glsl", "shaders/gbuffer_fs.glsl"),
+                self.shaders["phong_instanced"]: ShaderPermutations("shaders/phong_vs.glsl", "shaders/gbuffer_fs.glsl",
+                                                                    INSTANCED=1),
+            })
+        return self._deferred
+
+    def _show_cull_stats(self) -> None:
+        stats = (self.frustum.objects_culled, self.frustum.objects_tested, self.frustum.triangles_culled)
+        if stats != self._cull_stats:  # Retitle only on change
+            self._cull_stats = stats
+            self.context.set_title("AirBUS A380 Modeling - culled %d/%d objects, %d triangles" % stats)
+
+    def _show_profile(self) -> None:
+        self._profile_frames += 1
+        if self._profile_frames % 30 == 0:  # Twice a second at 60 fps
+            self.context.set_title("AirBUS A380 Modeling - " + profiler.overlay_text())
+
+    def _update_uniform_blocks(self) -> None:
+        """Writes camera, scene time and lights into their blocks and uploads changed parts of both."""
+        self.camera.update_block(self.camera_block)
+        self.camera_block.write(CAMERA_TIME_OFFSET, [self._time])  # Drives shader animations and daytime
+        self.sun_moon.update_block(self.lights_block)
+        self.daytime.update_block(self.lights_block)
         for light in self.point_lights:
-            light.draw()
-        self.spot_light.draw()
-
-    def _draw_objects(self) -> None:
-        """Sets currently selected shader, then draws shaded objects."""
-        self._use_shader(self.shaders["phong"])    #Select Phong Shader
-        self.current_shader.set_v3("viewPos", self._eye)
-
-        # Use lights
-        self.sun_moon.use_light(self.current_shader)
-        for light in self.point_lights:
-            light.use_light(self.current_shader)
-        self.spot_light.use_light(self.current_shader)
-
-        # Draw objects
-        for o in self.scene.values():
-            o.draw(self.current_shader)
+            light.update_block(self.light_clusters)
+        self.spot_light.update_block(self.lights_block)
+
+        # Copied into the frame's part of the dynamic buffer, no update of a buffer the GPU may be reading
+        self.camera_block.stream(ring)
+        self.lights_block.stream(ring)
+        with profiler.scope("light_clusters"):
+            self.light_clusters.update(self.camera.view_matrix, self.camera.projection_matrix, self.camera.near,
+                                       self.camera.far, self._width, self._height)
+
+    def render_frame(self, time: float) -> None:
+        """
+        Updates the scene to given time and draws it into the current framebuffer.
+
+        :param time: Scene time in seconds (drives animations and daytime).
+        """
+        self._time = time
+        if self.input_script is not None:
+            self.input_script.apply(time, self._on_key_input)
+        self._fly_recorded()
+        profiler.begin_frame()
+        # Update scene, then draw it; each stage is a profiler scope
+        for name, stage in (("uploads", self.loader.update), ("daytime", self._set_daytime),
+                            ("move_objects", self._move_objects),
+                            ("camera", self._process_camera), ("uniform_blocks", self._update_uniform_blocks),
+                            ("draw", self._draw_scene)):
+            with profiler.scope(name):
+                stage()
+        profiler.end_frame()
+        if self.show_profile:
+            self._show_profile()
+
+    def advance(self, time: float) -> None:
+        """
+        Updates the scene to given time like render_frame, without drawing: input, animation, camera and levels
+        of detail (chosen with hysteresis, so they depend on the frames before). Replaying skipped frames
+        brings a renderer starting later in a clip into the same state as one that rendered them all.
+        """
+        self._time = time
+        if self.input_script is not None:
+            self.input_script.apply(time, self._on_key_input)
+        self._fly_recorded()
+        self.loader.update()
+        self._move_objects()
+        self._process_camera()
+        self.frustum.update(self.camera.view_matrix, self.camera.projection_matrix)
+        self._submit_visible()
+        self.render_queue.clear()
+
+    def reload_shaders(self) -> bool:
+        """Recompiles shaders whose GLSL files changed since they were compiled. True if any was replaced."""
+        shaders = list(self.shaders.values())
+        if self._deferred is not None:
+            shaders += self._deferred.shaders
+        return any([shader.reload() for shader in shaders])
 
     def main_loop(self) -> None:
-        while not glfw.window_should_close(self._window):
-            glfw.poll_events()
-	    # Clean the Back buffer and Depth buffer
-            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-
-            # Update scene
-            self._set_daytime()
-            self._move_objects()
-            self._process_camera()
-
-            # Draw scene
-            self._draw_light_sources()
-            self._draw_objects()
+        while not self.context.should_close():
+            self.context.poll_events()
+            time = self.clock.tick()
+            if self.hot_reload and abs(time - self._reload_checked) >= 1.0:  # Once a second
+                self._reload_checked = time
+                self.reload_shaders()
+            self.render_frame(time)
 
             # Swap buffers
-            glfw.swap_buffers(self._window)
+            self.context.swap_buffers()
+            self.gl_calls = state.reset_counters()
+
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Interactive A380 scene.")
+    parser.add_argument("--record", help="flight recording file to write Moving_Plane's flight to")
+    parser.add_argument("--replay", help="flight recording flying Moving_Plane, in real time ([ and ] seek 10 s)")
+    args = parser.parse_args(argv)
 
-def main():
     window = Window(1280, 720, "AirBus A380 Modeling")
+    if args.replay:
+        window.replay = FlightReplay(args.replay)
+        window.replay_offset = window.replay.start  # Starts at the beginning of the recording
+    if args.record:
+        window.recorder = FlightRecorder(args.record)
     window.main_loop()
-    glfw.terminate()
+    if window.recorder is not None:
+        window.recorder.close()
+    window.loader.shutdown()
+    window.context.terminate()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,134 @@
+import numpy as np
+from OpenGL.GL import *
+import mesh_cache
+import vertex_format
+from culling import Bounds
+from gl_state import state
+
+
+class Mesh:
+    def __init__(self, path: str, registry, chunks: list = None):
+        """GPU resources (VAOs, VBOs, textures) of a wavefront object, shared by all its instances.
+
+        Vertices are stored in the registry's vertex layout (see vertex_format.py). No geometry is kept on the
+        CPU once it is uploaded, only materials and bounds.
+
+        :param path: Path to .obj file.
+        :param registry: AssetRegistry providing shared textures and the vertex layout.
+        :param chunks: Already loaded material chunks (see mesh_cache.load), loaded from path if None.
+        """
+        self.path = path
+        self._registry = registry
+        self.vaos = None
+        self._vbos = None
+        self._ebos = None
+        self.materials = []
+        self.textures = []  # Per material: 2D texture, or texture array if material.layer >= 0 (0 for none)
+        self._texture_paths = []
+        self._array_paths = None  # Layer paths of the texture array shared by the materials
+        self.lengths = []
+        self.lods = []  # Per material: (byte offset, index count) of each level of detail
+        self.index_types = []
+        self.vertex_bytes = 0  # Size of the vertex buffers
+        self.index_bytes = 0  # Size of the index buffers
+        self.use_texture = False
+        # Per-chunk bounding spheres and triangle counts, for culling
+        self.centers = None
+        self.radii = None
+        self.triangles = None
+        self.bounds: Bounds = None  # Whole mesh
+        self._load_obj(chunks)
+
+    def _load_obj(self, chunks: list = None) -> None:
+        """Loads wavefront obj and materials (through the binary mesh cache). Stores vertex data into VAOs and VBOs."""
+        if chunks is None:
+            chunks = mesh_cache.load(self.path)
+
+        # Materials with different textures share one texture array if the registry packs them
+        paths = list(dict.fromkeys(chunk.texture for chunk in chunks if chunk.texture is not None))
+        array = 0
+        if self._registry.packs(paths):
+            array = self._registry.acquire_texture_array(paths)
+            self._array_paths = paths
+
+        # Generate buffers
+        materials_count = len(chunks)
+        self.vaos = glGenVertexArrays(materials_count)  #to store pointer to different VBOs and switch whenever necessary
+        self._vbos = glGenBuffers(materials_count)      #generate buffer for each material
+        self._ebos = glGenBuffers(materials_count)      #index buffer for each material
+
+        if materials_count == 1:
+            # glGen* will return an int instead of an np.array if argument is 1.
+            self.vaos = np.array([self.vaos], dtype=np.uint32)  #for loading to GPU
+            self._vbos = np.array([self._vbos], dtype=np.uint32)
+            self._ebos = np.array([self._ebos], dtype=np.uint32)
+
+        # For each material fill buffers and load a texture
+        for ind, material in enumerate(chunks):
+            vertex_format.encode(material, self._registry.vertex_layout)  # Unless the loader did
+            scene_vertices = material.vertices  # Memory-mapped float32 array or bytes of the layout
+            indices = material.indices  # Memory-mapped uint16/uint32 array
+            # Store length, index type and materials for drawing
+            self.lengths.append(material.length)
+            self.lods.append([(first * indices.itemsize, count) for first, count in material.lods])
+            self.index_types.append(GL_UNSIGNED_SHORT if indices.dtype == np.uint16 else GL_UNSIGNED_INT)
+            self.materials.append(material)
+            # Textures are shared between meshes through the registry
+            if material.texture is not None and array:
+                self.textures.append(array)
+                material.layer = paths.index(material.texture)
+                self.use_texture = True
+            elif material.texture is not None:
+                self.textures.append(self._registry.acquire_texture(material.texture))
+                self._texture_paths.append(material.texture)
+                self.use_texture = True
+            else:
+                self.textures.append(0)
+
+            # Bind VAO
+            state.bind_vertex_array(self.vaos[ind])
+            # Fill VBO
+            glBindBuffer(GL_ARRAY_BUFFER, self._vbos[ind])
+            glBufferData(GL_ARRAY_BUFFER, scene_vertices.nbytes, scene_vertices, GL_STATIC_DRAW) #Store vertices in buffer
+            # Fill EBO (binding is stored in the VAO)
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self._ebos[ind])
+            glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+            self.vertex_bytes += scene_vertices.nbytes
+            self.index_bytes += indices.nbytes
+            material.release_geometry()  # The buffers hold it now
+
+            self.set_vertex_attributes(ind)
+
+            # Unbind (Technically not necessary but used as a precaution)
+            state.bind_vertex_array(0)
+
+        self.centers = np.array([chunk.bounds.center for chunk in chunks], dtype=np.float64).reshape(-1, 3)
+        self.radii = np.array([chunk.bounds.radius for chunk in chunks], dtype=np.float64)
+        self.triangles = np.array([chunk.length // 3 for chunk in chunks], dtype=np.int64)
+        self.bounds = Bounds.union([chunk.bounds for chunk in chunks])
+
+    def set_vertex_attributes(self, ind: int) -> None:
+        """Binds VBO and EBO of given material and sets attribute pointers of the currently bound VAO."""
+        material = self.materials[ind]
+        glBindBuffer(GL_ARRAY_BUFFER, self._vbos[ind])
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self._ebos[ind])
+
+        # Set attribute buffers, as the vertex layout stores them
+        pointers, stride = vertex_format.attributes(material.layout, material.vertex_format)
+        for attr_ind, attr_size, attr_type, normalized, offset in pointers:
+            glEnableVertexAttribArray(attr_ind)
+            glVertexAttribPointer(attr_ind, attr_size, attr_type, normalized, stride, #amount of data between each data
+                                  ctypes.c_void_p(offset))  #pointer to where the attribute begins in a vertex
+
+    def delete(self) -> None:
+        """Frees GPU buffers and releases textures."""
+        glDeleteVertexArrays(len(self.vaos), self.vaos)
+        glDeleteBuffers(len(self._vbos), self._vbos)
+        glDeleteBuffers(len(self._ebos), self._ebos)
+        for path in self._texture_paths:
+            self._registry.release_texture(path)
+        if self._array_paths is not None:
+            self._registry.release_texture_array(self._array_paths)
+            self._array_paths = None
+        state.invalidate()  # Deleted names may be reused
+        self.vaos, self._vbos, self._ebos, self.textures, self._texture_paths = None, None, None, [], []
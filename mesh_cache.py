@@ -0,0 +1,311 @@
+import os
+import sys
+import json
+import struct
+import threading
+
+import numpy as np
+import mesh_optimizer
+import obj_parser
+import mesh_simplify
+from culling import Bounds
+
+
+CACHE_DIR = ".cache"
+CACHE_VERSION = 5
+_MAGIC = b"OBJCACHE"
+_ALIGN = 16
+
+
+def temp_path(path: str) -> str:
+    """
+    File to write a cache to before renaming it to path. Unique per process and thread, so writers building
+    the same cache at once (e.g. parallel render workers) never rename each other's half-written file.
+    """
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+class MaterialChunk:
+    def __init__(self, name: str, vertex_format: str, vertex_size: int, vertices: np.ndarray,
+                 ambient, diffuse, specular, shininess: float, texture: str = None,
+                 indices: np.ndarray = None, stats: dict = None, dissolve: float = 1.0, bounds: Bounds = None,
+                 lods: list = None):
+        """Vertex data and material parameters of one material of a wavefront object.
+
+        :param name: Material name.
+        :param vertex_format: Interleaved vertex format, e.g. "T2F_N3F_V3F".
+        :param vertex_size: Number of floats per vertex.
+        :param vertices: Interleaved float32 vertex data (possibly memory-mapped). Bytes of another layout
+                         after vertex_format.encode, None after release_geometry.
+        :param ambient: Ambient color (3 floats).
+        :param diffuse: Diffuse color (3 floats).
+        :param specular: Specular color (3 floats).
+        :param shininess: Specular exponent.
+        :param texture: Diffuse texture path or None.
+        :param indices: Triangle indices into vertices (uint16 or uint32), None for triangle soup.
+        :param stats: Vertex welding statistics.
+        :param dissolve: Opacity ("d" statement), below 1 the material needs blending.
+        :param bounds: Bounding box and sphere of vertex positions, computed from vertices if None.
+        :param lods: (first index, index count) of each level of detail within indices, full detail first.
+        """
+        self.name = name
+        self.vertex_format = vertex_format
+        self.vertex_size = vertex_size
+        self.vertices = vertices
+        self.ambient = np.array(ambient, dtype=np.float32)
+        self.diffuse = np.array(diffuse, dtype=np.float32)
+        self.specular = np.array(specular, dtype=np.float32)
+        self.shininess = shininess
+        self.texture = texture
+        self.indices = indices
+        self.stats = stats or {}
+        self.dissolve = dissolve
+        self.bounds = bounds or Bounds.from_points(self.positions())
+        self.lods = lods or ([(0, len(indices))] if indices is not None else [])
+        self.layer = -1  # Layer of texture in the mesh's texture array, -1 if it has its own 2D texture
+        self.layout = "float"  # Vertex layout of vertices (see vertex_format.py)
+        # Position offset, position scale, texture coordinate offset and scale of quantized vertices
+        self.dequantize = np.array([[0, 0, 0, 0], [1, 1, 1, 0], [0, 0, 1, 1]], dtype=np.float32)
+        self._vertex_count = len(vertices) // vertex_size if vertices is not None else 0
+
+    def positions(self) -> np.ndarray:
+        """Vertex positions, shape (N,3)."""
+        return self.vertices.reshape(-1, self.vertex_size)[:, position_offset(self.vertex_format):][:, :3]
+
+    @property
+    def length(self) -> int:
+        """Number of vertices to draw (at full detail)."""
+        if self.lods:
+            return self.lods[0][1]
+        return self._vertex_count
+
+    def release_geometry(self) -> None:
+        """Drops vertices and indices (e.g. once they are in GPU buffers); material and bounds are kept."""
+        self.vertices, self.indices = None, None
+
+
+def attribute_offset(vertex_format: str, attribute: str):
+    """Offset of an attribute (e.g. "N3F") in floats within an interleaved vertex, None if it is missing."""
+    sizes = {"T2F": 2, "C3F": 3, "N3F": 3, "V3F": 3}
+    offset = 0
+    for attr in vertex_format.split("_"):
+        if attr == attribute:
+            return offset
+        offset += sizes[attr]
+    return None
+
+
+def position_offset(vertex_format: str) -> int:
+    """Offset of the position (V3F) in floats within an interleaved vertex."""
+    offset = attribute_offset(vertex_format, "V3F")
+    if offset is None:
+        raise ValueError(f"No position in vertex format {vertex_format}")
+    return offset
+
+
+def cache_path(obj_path: str) -> str:
+    """Location of the cache file belonging to given .obj file."""
+    directory, name = os.path.split(obj_path)
+    return os.path.join(directory, CACHE_DIR, name + ".mesh")
+
+
+def load(obj_path: str) -> list:
+    """
+    Loads material chunks of a wavefront object, using the binary cache when it is valid.
+
+    :param obj_path: Path to .obj file.
+    :return: List of MaterialChunk with memory-mapped vertex arrays.
+    """
+    chunks = read_cache(obj_path)
+    if chunks is None:
+        build_cache(obj_path)
+        chunks = read_cache(obj_path)
+    return chunks
+
+
+def _signature(path: str) -> list:
+    """Cheap change detection: file size and modification time."""
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _parse_obj(obj_path: str) -> (list, list):
+    """Parses wavefront files (see obj_parser). Returns material chunks and paths of files they depend on."""
+    materials, vertices, mtllibs = obj_parser.parse_obj(obj_path)
+    directory = os.path.dirname(obj_path)
+    chunks = []
+    for material in materials:
+        texture = None
+        if material.texture is not None:
+            texture = os.path.relpath(material.texture, directory or ".")
+        chunks.append(MaterialChunk(material.name, material.vertex_format, material.vertex_size,
+                                    vertices[material.name], material.ambient, material.diffuse, material.specular,
+                                    material.shininess, texture, dissolve=material.dissolve))
+    dependencies = [obj_path] + mtllibs
+    return chunks, [d for d in dependencies if os.path.exists(d)]
+
+
+def _parse_obj_pywavefront(obj_path: str) -> (list, list):
+    """Like _parse_obj, with pywavefront (reference for benchmarks/bench_obj_parser.py)."""
+    import pywavefront
+
+    wavefront = pywavefront.Wavefront(obj_path, collect_faces=True, create_materials=True)
+    directory = os.path.dirname(obj_path)
+    chunks = []
+    for material in wavefront.materials.values():
+        texture = None
+        if material.texture is not None:
+            texture = os.path.relpath(material.texture.path, directory or ".")
+        chunks.append(MaterialChunk(material.name, material.vertex_format, material.vertex_size,
+                                    np.array(material.vertices, dtype=np.float32),
+                                    material.ambient[:3], material.diffuse[:3], material.specular[:3],
+                                    material.shininess, texture, dissolve=material.transparency))
+    dependencies = [obj_path] + [os.path.join(directory, mtl) for mtl in wavefront.mtllibs]
+    return chunks, [d for d in dependencies if os.path.exists(d)]
+
+
+def build_cache(obj_path: str) -> str:
+    """
+    Parses given .obj file and writes its cache file.
+
+    Triangle soup is welded into indexed geometry in vertex cache friendly order. Simplified levels of
+    detail share the vertices, their indices follow the full detail ones in the same index array.
+    File layout: magic, uint32 header length, JSON header, raw arrays aligned to 16 bytes.
+
+    :param obj_path: Path to .obj file.
+    :return: Path of the written cache file.
+    """
+    chunks, dependencies = _parse_obj(obj_path)
+    directory = os.path.dirname(obj_path)
+
+    arrays = []
+    materials = []
+    offset = 0
+
+    def add_array(array: np.ndarray) -> dict:
+        nonlocal offset
+        desc = {"offset": offset, "dtype": array.dtype.str, "shape": array.shape}
+        arrays.append(array)
+        offset += -(-array.nbytes // _ALIGN) * _ALIGN
+        return desc
+
+    for chunk in chunks:
+        vertices, indices, stats = mesh_optimizer.optimize(chunk.vertices, chunk.vertex_size)
+        levels = mesh_simplify.simplify(vertices, indices, chunk.vertex_size, position_offset(chunk.vertex_format),
+                                        attribute_offset(chunk.vertex_format, "T2F"),
+                                        attribute_offset(chunk.vertex_format, "N3F"))
+        lods = [(0, len(indices))]
+        for level in levels:
+            lods.append((lods[-1][0] + lods[-1][1], len(level)))
+        indices = np.concatenate([indices] + levels).astype(indices.dtype)
+        materials.append({
+            "name": chunk.name,
+            "vertex_format": chunk.vertex_format,
+            "vertex_size": chunk.vertex_size,
+            "ambient": chunk.ambient.tolist(),
+            "diffuse": chunk.diffuse.tolist(),
+            "specular": chunk.specular.tolist(),
+            "shininess": chunk.shininess,
+            "dissolve": chunk.dissolve,
+            "texture": chunk.texture,
+            "stats": stats,
+            "bounds": chunk.bounds.to_dict(),
+            "lods": lods,
+            "vertices": add_array(vertices),
+            "indices": add_array(indices),
+        })
+
+    header = json.dumps({
+        "version": CACHE_VERSION,
+        "dependencies": {os.path.relpath(d, directory or "."): _signature(d) for d in dependencies},
+        "materials": materials,
+    }).encode()
+    # Data starts aligned after magic, header length and header
+    data_start = -(-(len(_MAGIC) + 4 + len(header)) // _ALIGN) * _ALIGN
+    header = header.ljust(data_start - len(_MAGIC) - 4, b" ")
+
+    path = cache_path(obj_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = temp_path(path)
+    with open(tmp_path, "wb") as f:
+        f.write(_MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for array in arrays:
+            f.write(array.tobytes())
+            f.write(b"\0" * (-array.nbytes % _ALIGN))
+    os.replace(tmp_path, path)  # Readers never see a partially written cache
+    return path
+
+
+def read_cache(obj_path: str):
+    """
+    Memory-maps cache of given .obj file.
+
+    :param obj_path: Path to .obj file.
+    :return: List of MaterialChunk or None if there is no valid cache.
+    """
+    path = cache_path(obj_path)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "rb") as f:
+        if f.read(len(_MAGIC)) != _MAGIC:
+            return None
+        header_len, = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_len))
+
+    if header["version"] != CACHE_VERSION:
+        return None
+    directory = os.path.dirname(obj_path)
+    for dependency, signature in header["dependencies"].items():
+        dependency = os.path.join(directory, dependency)
+        if not os.path.exists(dependency) or _signature(dependency) != signature:
+            return None
+
+    data_start = len(_MAGIC) + 4 + header_len
+    chunks = []
+    for m in header["materials"]:
+        texture = os.path.join(directory, m["texture"]) if m["texture"] is not None else None
+        chunks.append(MaterialChunk(m["name"], m["vertex_format"], m["vertex_size"],
+                                    _map_array(path, data_start, m["vertices"]),
+                                    m["ambient"], m["diffuse"], m["specular"], m["shininess"], texture,
+                                    _map_array(path, data_start, m["indices"]), m["stats"], m["dissolve"],
+                                    Bounds.from_dict(m["bounds"]), m["lods"]))
+    return chunks
+
+
+def _map_array(path: str, data_start: int, desc: dict) -> np.ndarray:
+    shape = tuple(desc["shape"])
+    if 0 in shape:
+        # np.memmap refuses empty mappings
+        return np.zeros(shape, dtype=desc["dtype"])
+    return np.memmap(path, dtype=desc["dtype"], mode="r", offset=data_start + desc["offset"], shape=shape)
+
+
+def report(chunk: MaterialChunk) -> str:
+    """Human readable vertex welding statistics of a chunk."""
+    st = chunk.stats
+    if not st:
+        return "no statistics"
+    return (f"{st['corners']} -> {st['vertices']} vertices, "
+            f"ACMR {st['acmr_welded']:.3f} -> {st['acmr_optimized']:.3f}, "
+            f"LOD triangles {[count // 3 for _, count in chunk.lods]}")
+
+
+def main(argv=None) -> None:
+    """Pre-builds caches for every .obj file found under given directories (default: data/)."""
+    roots = (argv if argv is not None else sys.argv[1:]) or ["data"]
+    for root in roots:
+        for directory, dirs, files in os.walk(root):
+            dirs[:] = [d for d in dirs if d != CACHE_DIR]
+            for name in sorted(files):
+                if name.lower().endswith(".obj"):
+                    obj_path = os.path.join(directory, name)
+                    print(f"{obj_path} -> {build_cache(obj_path)}")
+                    for chunk in read_cache(obj_path):
+                        print(f"  {chunk.name}: {report(chunk)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+import numpy as np
+
+
+def weld_vertices(vertices: np.ndarray, vertex_size: int) -> (np.ndarray, np.ndarray):
+    """
+    Merges bitwise identical interleaved vertices of a triangle soup.
+
+    :param vertices: Flat float32 array of interleaved vertices (triangle soup).
+    :param vertex_size: Number of floats per vertex.
+    :return: Unique vertices (flat, in order of first occurrence) and uint32 indices into them.
+    """
+    rows = np.ascontiguousarray(vertices, dtype=np.float32).reshape(-1, vertex_size)
+    keys = rows.view(np.dtype((np.void, rows.itemsize * vertex_size))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+    # np.unique sorts by key, restore the original order of vertices
+    order = np.argsort(first)
+    remap = np.empty(len(order), dtype=np.uint32)
+    remap[order] = np.arange(len(order), dtype=np.uint32)
+    return rows[first[order]].ravel(), remap[inverse.ravel()]
+
+
+def optimize_vertex_cache(indices: np.ndarray, vertex_count: int, cache_size: int = 16) -> np.ndarray:
+    """
+    Reorders triangles for the post-transform vertex cache (Tipsify, Sander et al. 2007).
+
+    :param indices: Triangle list indices.
+    :param vertex_count: Number of vertices referenced by indices.
+    :param cache_size: Targeted cache size (in vertices).
+    :return: Reordered triangle list indices.
+    """
+    tris = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+    if len(tris) == 0:
+        return np.asarray(indices, dtype=np.uint32)
+
+    # Vertex -> triangles adjacency (CSR)
+    corner_tris = np.repeat(np.arange(len(tris)), 3)
+    order = np.argsort(tris.ravel(), kind="stable")
+    adj_tris = corner_tris[order].tolist()
+    adj_start = np.concatenate(([0], np.cumsum(np.bincount(tris.ravel(), minlength=vertex_count)))).tolist()
+
+    tri_list = tris.tolist()
+    live = np.bincount(tris.ravel(), minlength=vertex_count).tolist()  # Remaining triangles of each vertex
+    cache_time = [0] * vertex_count
+    emitted = [False] * len(tris)
+    dead_end = []
+    output = []
+    stamp = cache_size + 1
+    cursor = 0
+    fanning = 0
+
+    while fanning >= 0:
+        candidates = set()
+        for t in adj_tris[adj_start[fanning]:adj_start[fanning + 1]]:
+            if emitted[t]:
+                continue
+            for v in tri_list[t]:
+                output.append(v)
+                dead_end.append(v)
+                candidates.add(v)
+                live[v] -= 1
+                if stamp - cache_time[v] > cache_size:
+                    cache_time[v] = stamp
+                    stamp += 1
+            emitted[t] = True
+
+        # Next fanning vertex: the one still in cache with most live triangles
+        fanning, best = -1, -1
+        for v in candidates:
+            if live[v] > 0:
+                priority = 0
+                if stamp - cache_time[v] + 2 * live[v] <= cache_size:
+                    priority = stamp - cache_time[v]
+                if priority > best:
+                    best, fanning = priority, v
+
+        if fanning == -1:
+            # Dead end: go back to recently used vertices, then to input order
+            while dead_end:
+                v = dead_end.pop()
+                if live[v] > 0:
+                    fanning = v
+                    break
+            else:
+                while cursor < vertex_count:
+                    if live[cursor] > 0:
+                        fanning = cursor
+                        break
+                    cursor += 1
+
+    return np.array(output, dtype=np.uint32)
+
+
+def reorder_vertices(vertices: np.ndarray, indices: np.ndarray, vertex_size: int) -> (np.ndarray, np.ndarray):
+    """Reorders vertices by first use in indices, so vertex fetches follow the triangle order."""
+    rows = vertices.reshape(-1, vertex_size)
+    _, first = np.unique(indices, return_index=True)
+    used = indices[np.sort(first)]
+    remap = np.empty(len(rows), dtype=np.uint32)
+    remap[used] = np.arange(len(used), dtype=np.uint32)
+    return rows[used].ravel(), remap[indices]
+
+
+def acmr(indices: np.ndarray, cache_size: int = 32) -> float:
+    """Average cache miss ratio (transformed vertices per triangle) with a FIFO post-transform cache."""
+    if len(indices) == 0:
+        return 0.0
+    cache = []
+    in_cache = set()
+    misses = 0
+    for v in np.asarray(indices).tolist():
+        if v not in in_cache:
+            misses += 1
+            cache.append(v)
+            in_cache.add(v)
+            if len(cache) > cache_size:
+                in_cache.discard(cache.pop(0))
+    return misses / (len(indices) // 3)
+
+
+def index_type(vertex_count: int):
+    """Smallest index dtype able to address vertex_count vertices."""
+    return np.uint16 if vertex_count <= 0xFFFF else np.uint32
+
+
+def optimize(vertices: np.ndarray, vertex_size: int) -> (np.ndarray, np.ndarray, dict):
+    """
+    Converts triangle soup into cache-optimized indexed geometry.
+
+    :param vertices: Flat float32 array of interleaved vertices (triangle soup).
+    :param vertex_size: Number of floats per vertex.
+    :return: Unique vertices, indices (uint16 or uint32) and statistics.
+    """
+    unique, indices = weld_vertices(vertices, vertex_size)
+    vertex_count = len(unique) // vertex_size
+    optimized = optimize_vertex_cache(indices, vertex_count)
+    unique, optimized = reorder_vertices(unique, optimized, vertex_size)
+
+    stats = {
+        "corners": len(indices),
+        "vertices": vertex_count,
+        "acmr_welded": acmr(indices),
+        "acmr_optimized": acmr(optimized),
+    }
+    return unique, optimized.astype(index_type(vertex_count)), stats
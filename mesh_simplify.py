@@ -0,0 +1,189 @@
+import heapq
+
+import numpy as np
+import mesh_optimizer
+
+
+# Triangle count of each generated level relative to the full mesh
+LOD_RATIOS = (0.5, 0.25, 0.1)
+# A level is kept only if it has at most this fraction of the triangles of the previous one
+_MIN_REDUCTION = 0.85
+
+
+def _plane_quadrics(positions: np.ndarray, tris: np.ndarray) -> np.ndarray:
+    """Sum of area weighted plane quadrics of incident triangles for every position, shape (P,4,4)."""
+    p0, p1, p2 = positions[tris[:, 0]], positions[tris[:, 1]], positions[tris[:, 2]]
+    normals = np.cross(p1 - p0, p2 - p0)
+    area = np.linalg.norm(normals, axis=1)
+    normals /= np.maximum(area, 1e-20)[:, np.newaxis]
+    planes = np.hstack((normals, -np.sum(normals * p0, axis=1)[:, np.newaxis]))
+    k = planes[:, :, np.newaxis] * planes[:, np.newaxis, :] * area[:, np.newaxis, np.newaxis]
+    quadrics = np.zeros((len(positions), 4, 4))
+    for corner in range(3):
+        np.add.at(quadrics, tris[:, corner], k)
+    return quadrics
+
+
+def _cost(q: list, p: list) -> float:
+    """Quadric error v^T Q v of point p, q holds the 10 unique entries of the symmetric 4x4 matrix."""
+    x, y, z = p
+    return (q[0] * x * x + 2 * q[1] * x * y + 2 * q[2] * x * z + 2 * q[3] * x
+            + q[4] * y * y + 2 * q[5] * y * z + 2 * q[6] * y
+            + q[7] * z * z + 2 * q[8] * z + q[9])
+
+
+def _normal(a: list, b: list, c: list) -> list:
+    u = (b[0] - a[0], b[1] - a[1], b[2] - a[2])
+    v = (c[0] - a[0], c[1] - a[1], c[2] - a[2])
+    return [u[1] * v[2] - u[2] * v[1], u[2] * v[0] - u[0] * v[2], u[0] * v[1] - u[1] * v[0]]
+
+
+def simplify(vertices: np.ndarray, indices: np.ndarray, vertex_size: int, position_offset: int,
+             uv_offset: int = None, normal_offset: int = None, ratios=LOD_RATIOS) -> list:
+    """
+    Generates coarser index lists of an indexed mesh by quadric error edge collapse (Garland & Heckbert 1997).
+
+    Collapses are half-edge collapses onto existing vertices, so all levels share the vertex buffer.
+    Vertices are merged by position first; positions on UV seams, on mesh boundaries (and thus on
+    material chunk borders) or on non-manifold edges are never moved. Corners that move take the vertex
+    of the target position with the nearest UV, and of those the normal closest to the new face normal,
+    which keeps flat shaded meshes flat.
+
+    :param vertices: Flat float32 array of interleaved vertices.
+    :param indices: Triangle list indices.
+    :param vertex_size: Number of floats per vertex.
+    :param position_offset: Offset of the position in a vertex (floats).
+    :param uv_offset: Offset of texture coordinates, None if there are none.
+    :param normal_offset: Offset of the normal, None if there is none.
+    :param ratios: Target triangle count of each level relative to the input, decreasing.
+    :return: Index arrays (uint32) of the levels that reduce the triangle count enough, coarsest last.
+    """
+    rows = np.asarray(vertices, dtype=np.float64).reshape(-1, vertex_size)
+    tris = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+    if len(tris) == 0:
+        return []
+
+    # Merge vertices by position
+    positions, pos_of = np.unique(rows[:, position_offset:position_offset + 3], axis=0, return_inverse=True)
+    pos_of = pos_of.ravel()
+    tri_pos = pos_of[tris]
+
+    # Locked positions: UV seams, boundary and non-manifold edges
+    locked = np.zeros(len(positions), dtype=bool)
+    if uv_offset is not None:
+        pos_uv = np.unique(np.column_stack((pos_of, rows[:, uv_offset:uv_offset + 2])), axis=0)
+        locked |= np.bincount(pos_uv[:, 0].astype(np.int64), minlength=len(positions)) > 1
+    edges = np.sort(tri_pos[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+    edges, edge_count = np.unique(edges, axis=0, return_counts=True)
+    locked[edges[edge_count != 2].ravel()] = True
+
+    quadrics = _plane_quadrics(positions, tri_pos)
+    q = quadrics[:, [0, 0, 0, 0, 1, 1, 1, 2, 2, 3], [0, 1, 2, 3, 1, 2, 3, 2, 3, 3]].tolist()
+    pos = positions.tolist()
+    uvs = rows[:, uv_offset:uv_offset + 2].tolist() if uv_offset is not None else None
+    normals = rows[:, normal_offset:normal_offset + 3].tolist() if normal_offset is not None else None
+
+    tri_pos_l = tri_pos.tolist()
+    tri_attr = tris.tolist()
+    alive = [len(set(t)) == 3 for t in tri_pos_l]
+    live = sum(alive)
+    pos_tris = [set() for _ in pos]
+    pos_attrs = [[] for _ in pos]
+    for t, corners in enumerate(tri_pos_l):
+        if alive[t]:
+            for p in corners:
+                pos_tris[p].add(t)
+    for v, p in enumerate(pos_of.tolist()):
+        pos_attrs[p].append(v)
+    version = [0] * len(pos)
+    locked = locked.tolist()
+
+    heap = []
+
+    def push(a: int, b: int) -> None:
+        if not locked[a]:
+            cost = _cost([qa + qb for qa, qb in zip(q[a], q[b])], pos[b])
+            heap.append((cost, a, b, version[a], version[b]))
+
+    for a, b in edges.tolist():
+        push(a, b)
+        push(b, a)
+    heapq.heapify(heap)
+
+    def push_around(b: int) -> None:
+        neighbors = {p for t in pos_tris[b] for p in tri_pos_l[t]} - {b}
+        for n in neighbors:
+            for pair in ((b, n), (n, b)):
+                if not locked[pair[0]]:
+                    cost = _cost([qa + qb for qa, qb in zip(q[pair[0]], q[pair[1]])], pos[pair[1]])
+                    heapq.heappush(heap, (cost, pair[0], pair[1], version[pair[0]], version[pair[1]]))
+
+    def collapse_valid(a: int, b: int) -> bool:
+        shared = [t for t in pos_tris[a] if b in tri_pos_l[t]]
+        if not shared:
+            return False  # No longer an edge
+        # Link condition: a and b may only share the neighbors opposite to their common edge
+        na = {p for t in pos_tris[a] for p in tri_pos_l[t]}
+        nb = {p for t in pos_tris[b] for p in tri_pos_l[t]}
+        if len(na & nb) - 2 > len(shared):
+            return False
+        # No face may flip
+        for t in pos_tris[a]:
+            if t in shared:
+                continue
+            corners = [pos[p] for p in tri_pos_l[t]]
+            before = _normal(*corners)
+            corners[tri_pos_l[t].index(a)] = pos[b]
+            after = _normal(*corners)
+            if sum(x * y for x, y in zip(before, after)) <= 0.0:
+                return False
+        return True
+
+    def remap(v: int, b: int, face_normal: list) -> int:
+        candidates = pos_attrs[b]
+        if uvs is not None:
+            uv = uvs[v]
+            dist = [(uvs[c][0] - uv[0]) ** 2 + (uvs[c][1] - uv[1]) ** 2 for c in candidates]
+            best = min(dist)
+            candidates = [c for c, d in zip(candidates, dist) if d <= best + 1e-12]
+        if normals is not None and len(candidates) > 1:
+            candidates = [max(candidates, key=lambda c: sum(x * y for x, y in zip(normals[c], face_normal)))]
+        return candidates[0]
+
+    levels = []
+    targets = [int(len(tris) * r) for r in ratios]
+    while targets and heap:
+        cost, a, b, va, vb = heapq.heappop(heap)
+        if va != version[a] or vb != version[b] or not collapse_valid(a, b):
+            continue
+
+        for t in list(pos_tris[a]):
+            corners = tri_pos_l[t]
+            if b in corners:
+                alive[t] = False
+                live -= 1
+                for p in corners:
+                    pos_tris[p].discard(t)
+                continue
+            k = corners.index(a)
+            corners[k] = b
+            tri_attr[t][k] = remap(tri_attr[t][k], b, _normal(*[pos[p] for p in corners]))
+            pos_tris[b].add(t)
+        pos_tris[a] = set()
+        q[b] = [qa + qb for qa, qb in zip(q[a], q[b])]
+        version[a] += 1
+        version[b] += 1
+        push_around(b)
+
+        while targets and live <= targets[0]:
+            targets.pop(0)
+            levels.append(np.array([tri_attr[t] for t in range(len(tri_attr)) if alive[t]], dtype=np.uint32))
+
+    # Keep levels that are worth their memory, cache-optimized
+    result = []
+    previous = len(tris)
+    for level in levels:
+        if len(level) <= previous * _MIN_REDUCTION:
+            result.append(mesh_optimizer.optimize_vertex_cache(level.ravel(), len(rows)))
+            previous = len(level)
+    return result
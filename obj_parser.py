@@ -0,0 +1,312 @@
+import os
+
+import numpy as np
+
+
+BLOCK_SIZE = 1 << 22  # Bytes of .obj text tokenized at once
+_SPACE, _TAB, _CR, _LF, _SLASH = b" \t\r\n/"
+# Line types
+_OTHER, _V, _VT, _VN, _F, _SKIP = range(6)
+
+
+class ObjMaterial:
+    def __init__(self, name: str):
+        """Material parameters from a .mtl file, defaults as in pywavefront."""
+        self.name = name
+        self.ambient = [0.2, 0.2, 0.2]
+        self.diffuse = [0.8, 0.8, 0.8]
+        self.specular = [0.0, 0.0, 0.0]
+        self.shininess = 0.0
+        self.dissolve = 1.0
+        self.texture = None  # Path of the diffuse map
+        self.vertex_format = None  # e.g. "T2F_N3F_V3F", known once the faces were read
+        self.vertex_size = 0  # Floats per vertex
+
+
+def _color(values: list) -> list:
+    return [float(v) for v in (values + ["0", "0", "0"])[:3]]
+
+
+def parse_mtl(path: str) -> dict:
+    """
+    Reads a wavefront material library.
+
+    :param path: Path to .mtl file.
+    :return: Dict of material name -> ObjMaterial, in file order.
+    """
+    materials = {}
+    material = None
+    directory = os.path.dirname(path)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            values = line.split()
+            if len(values) < 2 or values[0].startswith("#"):
+                continue
+            keyword = values[0]
+            if keyword == "newmtl":
+                material = materials[values[1]] = ObjMaterial(values[1])
+            elif material is None:
+                continue
+            elif keyword == "Ka":
+                material.ambient = _color(values[1:])
+            elif keyword == "Kd":
+                material.diffuse = _color(values[1:])
+            elif keyword == "Ks":
+                material.specular = _color(values[1:])
+            elif keyword == "Ns":
+                material.shininess = float(values[1])
+            elif keyword == "d":
+                material.dissolve = float(values[1])
+            elif keyword == "Tr":
+                material.dissolve = 1.0 - float(values[1])
+            elif keyword == "map_Kd":
+                material.texture = os.path.join(directory, line.strip()[len(keyword):].strip())  # May contain spaces
+    return materials
+
+
+def _read_blocks(path: str, block_size: int):
+    """Yields the file as uint8 arrays of whole lines, each ending with a line feed."""
+    with open(path, "rb") as f:
+        rest = b""
+        while True:
+            data = f.read(block_size)
+            if not data:
+                break
+            data = rest + data
+            end = data.rfind(b"\n") + 1
+            if end == 0:  # No line end yet, keep reading
+                rest = data
+                continue
+            rest = data[end:]
+            yield np.frombuffer(data[:end], dtype=np.uint8)
+        if rest:
+            yield np.frombuffer(rest + b"\n", dtype=np.uint8)
+
+
+def _classify(data: np.ndarray, starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Type of each line from its first bytes."""
+    padded = np.concatenate([data, np.zeros(2, dtype=np.uint8)])  # Lines shorter than 3 bytes
+    b0, b1, b2 = padded[starts], padded[starts + 1], padded[starts + 2]
+    space1 = (b1 == _SPACE) | (b1 == _TAB)
+    space2 = (b2 == _SPACE) | (b2 == _TAB)
+    v = b0 == ord("v")
+    types = np.full(len(starts), _OTHER, dtype=np.int8)
+    types[v & space1] = _V
+    types[v & (b1 == ord("t")) & space2] = _VT
+    types[v & (b1 == ord("n")) & space2] = _VN
+    types[(b0 == ord("f")) & space1] = _F
+    types[(b0 == ord("#")) | (b0 == _LF) | (b0 == _CR) | (lengths <= 1)] = _SKIP
+    return types
+
+
+def _tokens_per_line(text: np.ndarray, line_ids: np.ndarray, line_count: int) -> np.ndarray:
+    """Number of whitespace separated tokens of every line of text (keywords blanked out)."""
+    blank = (text == _SPACE) | (text == _TAB) | (text == _CR) | (text == _LF)
+    token_start = ~blank & np.concatenate([[True], blank[:-1]])
+    return np.bincount(line_ids[token_start], minlength=line_count)
+
+
+def _select(data: np.ndarray, byte_types: np.ndarray, kind: int, lengths: np.ndarray, keyword_len: int):
+    """
+    Concatenated text of all lines of a type with their keyword blanked out, and the line index of every byte.
+
+    :param byte_types: Line type of every byte of data.
+    :param lengths: Lengths of the lines of that type.
+    """
+    text = data[byte_types == kind]
+    line_ids = np.repeat(np.arange(len(lengths), dtype=np.int32), lengths)
+    text[(np.cumsum(lengths) - lengths)[:, None] + np.arange(keyword_len)] = _SPACE
+    return text, line_ids
+
+
+def _parse_rows(data, byte_types, kind: int, lengths, keyword_len: int, keyword: str) -> np.ndarray:
+    """Parses lines of numbers with equal counts (v, vt or vn statements) into a float64 array of rows."""
+    if len(lengths) == 0:
+        return None
+    text, line_ids = _select(data, byte_types, kind, lengths, keyword_len)
+    counts = _tokens_per_line(text, line_ids, len(lengths))
+    if np.any(counts != counts[0]):
+        raise ValueError(f"'{keyword}' statements with different numbers of values")
+    values = np.fromstring(text.tobytes().decode("ascii"), dtype=np.float64, sep=" ")
+    return values.reshape(len(lengths), counts[0])
+
+
+def _vertex_format(slashes: int, doubles: int) -> tuple:
+    """(has texture coordinates, has normals) of face corners with given numbers of slashes."""
+    if slashes == 0:
+        return False, False
+    if slashes == 1:
+        return True, False
+    return doubles == 0, True
+
+
+class _Faces:
+    def __init__(self):
+        """Triangulated face corners of one material: position, texture and normal indices."""
+        self.v, self.t, self.n = [], [], []
+        self.has_vt, self.has_vn = None, None
+
+
+def _triangulate(corner_counts: np.ndarray) -> np.ndarray:
+    """
+    Corner order of triangulated polygons, like pywavefront: (1, 2, 3), then (j, 1, j - 1) for each j > 3.
+
+    :param corner_counts: Number of corners of each polygon.
+    :return: Indices into the concatenated corners, three per triangle.
+    """
+    firsts = np.cumsum(corner_counts) - corner_counts
+    triangles = corner_counts - 2
+    face_of_triangle = np.repeat(np.arange(len(corner_counts)), triangles)
+    k = np.arange(triangles.sum()) - np.repeat(np.cumsum(triangles) - triangles, triangles)  # Triangle in polygon
+    first = firsts[face_of_triangle]
+    corners = np.empty((len(k), 3), dtype=np.int64)
+    corners[:, 0] = np.where(k == 0, first, first + k + 2)
+    corners[:, 1] = np.where(k == 0, first + 1, first)
+    corners[:, 2] = np.where(k == 0, first + 2, first + k + 1)
+    return corners.reshape(-1)
+
+
+def parse_obj(obj_path: str, block_size: int = BLOCK_SIZE) -> (list, dict, list):
+    """
+    Reads a wavefront object with NumPy: the file is tokenized in blocks of whole lines, statement types are
+    told apart by their first bytes and numbers are converted per block with one call.
+
+    Only v, vt, vn, f, usemtl and mtllib statements are interpreted. Data statements must start at the
+    beginning of their line. Polygons are triangulated like pywavefront does, faces are grouped by material.
+
+    :param obj_path: Path to .obj file.
+    :param block_size: Approximate number of bytes held in memory as text at once.
+    :return: (materials with faces as list of ObjMaterial, dict of material name -> interleaved float32 vertices
+             (T2F_C3F_N3F_V3F order, missing attributes left out), paths of the .mtl files read)
+    """
+    directory = os.path.dirname(obj_path)
+    materials = {}  # name -> ObjMaterial, in order of appearance like pywavefront
+    faces = {}  # name -> _Faces
+    mtllibs = []
+    positions, tex_coords, normals = [], [], []
+    counts = np.zeros(3, dtype=np.int64)  # v, vt and vn statements so far
+    material = None
+
+    for data in _read_blocks(obj_path, block_size):
+        ends = np.flatnonzero(data == _LF) + 1
+        starts = np.concatenate([[0], ends[:-1]])
+        lengths = ends - starts
+        types = _classify(data, starts, lengths)
+        byte_types = np.repeat(types, lengths)
+
+        # Statements before each line, for negative (relative) indices
+        before = np.stack([np.cumsum(types == t) - (types == t) for t in (_V, _VT, _VN)], axis=1) + counts
+
+        # Other statements in order; usemtl switches the material of the following faces
+        line_material = np.zeros(len(starts), dtype=np.int64)
+        block_materials = [material]
+        face_lines = np.flatnonzero(types == _F)
+
+        def default_material() -> str:
+            # Faces without usemtl get a default material, created and named like pywavefront does
+            block_materials[0] = "default%d" % len(materials)
+            materials[block_materials[0]] = ObjMaterial(block_materials[0])
+            return block_materials[0]
+
+        for line in np.flatnonzero(types == _OTHER):
+            if material is None and len(face_lines) and face_lines[0] < line:
+                material = default_material()
+            values = data[starts[line]:ends[line]].tobytes().decode("utf-8").split()
+            if not values:
+                continue
+            if values[0] in ("v", "vt", "vn", "f"):
+                raise ValueError(f"Indented '{values[0]}' statement in {obj_path}")
+            if values[0] == "mtllib":
+                mtllib = " ".join(values[1:])
+                mtllibs.append(os.path.join(directory, mtllib))
+                if os.path.exists(mtllibs[-1]):
+                    materials.update(parse_mtl(mtllibs[-1]))
+            elif values[0] in ("usemtl", "usemat"):
+                name = " ".join(values[1:])
+                if name not in materials:
+                    materials[name] = ObjMaterial(name)
+                material = name
+                block_materials.append(material)
+                line_material[line] = 1
+        line_material = np.cumsum(line_material)
+        if material is None and len(face_lines):
+            material = default_material()
+
+        for kind, keyword_len, keyword, target in ((_V, 1, "v", positions), (_VT, 2, "vt", tex_coords),
+                                                   (_VN, 2, "vn", normals)):
+            rows = _parse_rows(data, byte_types, kind, lengths[types == kind], keyword_len, keyword)
+            if rows is not None:
+                target.append(rows)
+        counts += [(types == kind).sum() for kind in (_V, _VT, _VN)]
+
+        if len(face_lines) == 0:
+            continue
+        text, line_ids = _select(data, byte_types, _F, lengths[face_lines], 1)
+        corner_counts = _tokens_per_line(text, line_ids, len(face_lines))
+        slashes = np.bincount(line_ids[text == _SLASH], minlength=len(face_lines))
+        doubles = np.bincount(line_ids[:-1][(text[:-1] == _SLASH) & (text[1:] == _SLASH)], minlength=len(face_lines))
+        if np.any(slashes % corner_counts) or np.any(doubles % corner_counts) or np.any(corner_counts < 3) or \
+                np.any(slashes > 2 * corner_counts):
+            raise ValueError(f"Faces with mixed vertex formats or less than 3 corners in {obj_path}")
+        text[text == _SLASH] = _SPACE
+        indices = np.fromstring(text.tobytes().decode("ascii"), dtype=np.int64, sep=" ")
+
+        # Split index list into lines, then group lines by material and corner format
+        values_per_corner = 1 + (slashes - doubles) // corner_counts
+        value_line = np.repeat(np.arange(len(face_lines), dtype=np.int32), corner_counts * values_per_corner)
+        groups = line_material[face_lines] * 4 + slashes // corner_counts + doubles // corner_counts
+        for group in np.unique(groups):
+            lines = np.flatnonzero(groups == group)
+            name = block_materials[group // 4]
+            has_vt, has_vn = _vertex_format(slashes[lines[0]] // corner_counts[lines[0]],
+                                            doubles[lines[0]] // corner_counts[lines[0]])
+            target = faces.setdefault(name, _Faces())
+            if target.has_vt is None:
+                target.has_vt, target.has_vn = has_vt, has_vn
+            elif (target.has_vt, target.has_vn) != (has_vt, has_vn):
+                raise ValueError(f"Faces of material {name} with different vertex formats in {obj_path}")
+
+            # Values of the corners of these lines: (corner, value) in line order
+            per_corner = values_per_corner[lines[0]]
+            corners = indices[(groups == group)[value_line]].reshape(-1, per_corner)
+            order = _triangulate(corner_counts[lines])
+            corners = corners[order]
+            line_of_corner = np.repeat(face_lines[lines], corner_counts[lines] - 2)
+            line_of_corner = np.repeat(line_of_corner, 3)
+
+            columns = [(0, 0)]
+            if has_vt:
+                columns.append((1, 1))
+            if has_vn:
+                columns.append((2, per_corner - 1))
+            for kind, column in columns:
+                ids = corners[:, column]
+                # 1-based, negative values count back from the statements before the line
+                ids = np.where(ids < 0, ids + before[line_of_corner, kind], ids - 1)
+                (target.v, target.t, target.n)[kind].append(ids)
+
+    positions = np.concatenate(positions) if positions else np.zeros((0, 3))
+    tex_coords = np.concatenate(tex_coords) if tex_coords else np.zeros((0, 2))
+    normals = np.concatenate(normals) if normals else np.zeros((0, 3))
+    has_colors = positions.shape[1] == 6  # pywavefront: 6 values are position and color
+
+    result, vertices = [], {}
+    for name, m in materials.items():
+        if name not in faces:
+            continue
+        f = faces[name]
+        v = np.concatenate(f.v)
+        columns = []
+        if f.has_vt:
+            columns.append(tex_coords[np.concatenate(f.t), :2])
+        if has_colors:
+            columns.append(positions[v, 3:6])
+        if f.has_vn:
+            columns.append(normals[np.concatenate(f.n), :3])
+        columns.append(positions[v, :3])
+        m.vertex_format = "_".join(attr for attr, used in (("T2F", f.has_vt), ("C3F", has_colors),
+                                                           ("N3F", f.has_vn), ("V3F", True)) if used)
+        m.vertex_size = sum(column.shape[1] for column in columns)
+        vertices[name] = np.concatenate(columns, axis=1).astype(np.float32).reshape(-1)
+        result.append(m)
+    return result, vertices, mtllibs
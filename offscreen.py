@@ -0,0 +1,88 @@
+import numpy as np
+from OpenGL.GL import *
+
+
+class OffscreenTarget:
+    def __init__(self, width: int, height: int, pbo_count: int = 3):
+        """Framebuffer object with color and depth renderbuffers, read back asynchronously through a PBO ring.
+
+        glReadPixels into a bound pixel pack buffer returns immediately; the copy is fetched only after
+        pbo_count - 1 more frames were captured (or on finish()), when the GPU has long completed it.
+
+        :param width: Width in pixels.
+        :param height: Height in pixels.
+        :param pbo_count: Number of pixel buffers, i.e. frames in flight.
+        """
+        self.width, self.height = width, height
+        self._frame_size = width * height * 4
+
+        self._fbo = glGenFramebuffers(1)
+        self._color, self._depth = glGenRenderbuffers(2)
+        glBindFramebuffer(GL_FRAMEBUFFER, self._fbo)
+        for renderbuffer, internal_format, attachment in ((self._color, GL_RGBA8, GL_COLOR_ATTACHMENT0),
+                                                          (self._depth, GL_DEPTH24_STENCIL8,
+                                                           GL_DEPTH_STENCIL_ATTACHMENT)):
+            glBindRenderbuffer(GL_RENDERBUFFER, renderbuffer)
+            glRenderbufferStorage(GL_RENDERBUFFER, internal_format, width, height)
+            glFramebufferRenderbuffer(GL_FRAMEBUFFER, attachment, GL_RENDERBUFFER, renderbuffer)
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            raise Exception("Offscreen framebuffer is incomplete!")
+
+        self._pbos = glGenBuffers(pbo_count)
+        if pbo_count == 1:
+            self._pbos = np.array([self._pbos], dtype=np.uint32)
+        for pbo in self._pbos:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self._frame_size, None, GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self._next = 0
+        self._pending = []  # (PBO index, fence, tag) of frames in flight, oldest first
+
+    def bind(self) -> None:
+        """Makes the target the current draw and read framebuffer and sets the viewport to its size."""
+        glBindFramebuffer(GL_FRAMEBUFFER, self._fbo)
+        glViewport(0, 0, self.width, self.height)
+
+    def capture(self, tag=None) -> list:
+        """
+        Starts reading back the current content of the target.
+
+        :param tag: Anything identifying the frame (e.g. its number), returned with its pixels.
+        :return: List of (tag, pixels) of frames whose read back completed, pixels as (height, width, 4) uint8
+                 RGBA arrays, top row first.
+        """
+        done = []
+        if len(self._pending) == len(self._pbos):
+            done.append(self._fetch())
+
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self._fbo)
+        glReadBuffer(GL_COLOR_ATTACHMENT0)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self._pbos[self._next])
+        glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self._pending.append((self._next, glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0), tag))
+        self._next = (self._next + 1) % len(self._pbos)
+        return done
+
+    def finish(self) -> list:
+        """Waits for all frames in flight. Returns them like capture()."""
+        return [self._fetch() for _ in range(len(self._pending))]
+
+    def _fetch(self):
+        index, fence, tag = self._pending.pop(0)
+        glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, GL_TIMEOUT_IGNORED)
+        glDeleteSync(fence)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self._pbos[index])
+        data = glGetBufferSubData(GL_PIXEL_PACK_BUFFER, 0, self._frame_size)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        pixels = np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 4)
+        return tag, pixels[::-1].copy()  # GL rows start at the bottom
+
+    def delete(self) -> None:
+        for _, fence, _ in self._pending:
+            glDeleteSync(fence)
+        self._pending = []
+        glDeleteBuffers(len(self._pbos), self._pbos)
+        glDeleteRenderbuffers(2, [self._color, self._depth])
+        glDeleteFramebuffers(1, [self._fbo])
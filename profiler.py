@@ -0,0 +1,175 @@
+import json
+from collections import deque
+from time import perf_counter
+
+from OpenGL.GL import *
+
+
+class _NullScope:
+    """Scope used while profiling is disabled: does nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NULL_SCOPE = _NullScope()
+
+
+class _CpuScope:
+    __slots__ = ("_profiler", "_name", "_start")
+
+    def __init__(self, profiler, name: str):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        end = perf_counter()
+        self._profiler._record(self._name, self._start, end - self._start)
+
+
+class _GpuScope(_CpuScope):
+    __slots__ = ("_query",)
+
+    def __enter__(self):
+        self._query = self._profiler._begin_query(self._name)
+        return super().__enter__()
+
+    def __exit__(self, *exc) -> None:
+        super().__exit__(*exc)
+        glEndQuery(GL_TIME_ELAPSED)
+
+
+class Profiler:
+    def __init__(self, history: int = 120, max_trace_events: int = 200000):
+        """CPU scopes, GPU timer queries, rolling statistics and Chrome trace export.
+
+        Everything is a no-op while disabled: scope() and gpu_scope() return a shared empty context manager.
+
+        GPU scopes wrap a pass in a GL_TIME_ELAPSED query. They must not nest (GL allows one active
+        elapsed time query). Queries are double-buffered: results of a frame are read two frames later,
+        and dropped instead of waiting if they are still not available, so the CPU never stalls.
+
+        :param history: Number of frames the rolling statistics cover.
+        :param max_trace_events: Trace events kept while tracing (oldest are dropped).
+        """
+        self.enabled = False
+        self.tracing = False
+        self._history = history
+        self._frame = 0
+        self._frame_start = 0.0
+        self._origin = perf_counter()
+        self.last_frame = {}  # CPU seconds per scope name in the last frame
+        self.last_gpu = {}  # GPU seconds per pass of the latest frame with results (two frames back)
+        self._cpu_stats = {}  # name -> deque of per frame totals (seconds)
+        self._gpu_stats = {}
+        self._trace = deque(maxlen=max_trace_events)
+        self._free_queries = []
+        self._pending = ([], [])  # Per buffer: (name, query, CPU start) issued in that frame
+
+    def scope(self, name: str):
+        """Context manager measuring the CPU time of a block."""
+        if not self.enabled:
+            return _NULL_SCOPE
+        return _CpuScope(self, name)
+
+    def gpu_scope(self, name: str):
+        """Context manager measuring CPU and GPU time of a pass (GPU scopes must not nest)."""
+        if not self.enabled:
+            return _NULL_SCOPE
+        return _GpuScope(self, name)
+
+    def begin_frame(self) -> None:
+        if not self.enabled:
+            return
+        self._collect_queries(self._pending[self._frame % 2])
+        self.last_frame = {}
+        self._frame_start = perf_counter()
+
+    def end_frame(self) -> None:
+        if not self.enabled:
+            return
+        self._record("frame", self._frame_start, perf_counter() - self._frame_start)
+        for name, seconds in self.last_frame.items():
+            self._push(self._cpu_stats, name, seconds)
+        self._frame += 1
+
+    def _record(self, name: str, start: float, duration: float) -> None:
+        self.last_frame[name] = self.last_frame.get(name, 0.0) + duration
+        if self.tracing:
+            self._trace.append({"name": name, "ph": "X", "pid": 0, "tid": "CPU",
+                                "ts": (start - self._origin) * 1e6, "dur": duration * 1e6})
+
+    def _begin_query(self, name: str) -> int:
+        query = self._free_queries.pop() if self._free_queries else int(glGenQueries(1)[0])
+        glBeginQuery(GL_TIME_ELAPSED, query)
+        self._pending[self._frame % 2].append((name, query, perf_counter()))
+        return query
+
+    def _collect_queries(self, pending: list) -> None:
+        """Reads finished queries of the frame two frames ago, recycling all of them."""
+        totals = {}
+        for name, query, start in pending:
+            if glGetQueryObjectuiv(query, GL_QUERY_RESULT_AVAILABLE):
+                # 32 bit result (PyOpenGL's 64 bit getter is broken): passes up to 4 s
+                seconds = glGetQueryObjectuiv(query, GL_QUERY_RESULT) * 1e-9
+                totals[name] = totals.get(name, 0.0) + seconds
+                if self.tracing:
+                    # Elapsed time only: placed at the CPU time the pass was issued
+                    self._trace.append({"name": name, "ph": "X", "pid": 0, "tid": "GPU",
+                                        "ts": (start - self._origin) * 1e6, "dur": seconds * 1e6})
+            self._free_queries.append(query)
+        pending.clear()
+        self.last_gpu = totals
+        for name, seconds in totals.items():
+            self._push(self._gpu_stats, name, seconds)
+
+    def _push(self, stats: dict, name: str, seconds: float) -> None:
+        if name not in stats:
+            stats[name] = deque(maxlen=self._history)
+        stats[name].append(seconds)
+
+    def summary(self) -> dict:
+        """Mean and maximum CPU and GPU milliseconds per frame of every scope over the rolling window."""
+        result = {}
+        for kind, stats in (("cpu", self._cpu_stats), ("gpu", self._gpu_stats)):
+            for name, values in stats.items():
+                entry = result.setdefault(name, {})
+                entry[kind + "_ms"] = sum(values) / len(values) * 1e3
+                entry[kind + "_max_ms"] = max(values) * 1e3
+        return result
+
+    def overlay_text(self, names=("frame", "move_objects", "cull", "flush", "geometry", "lighting", "opaque",
+                                  "blended")) -> str:
+        """Short statistics line, e.g. for the window title."""
+        parts = []
+        summary = self.summary()
+        for name in names:
+            if name in summary:
+                entry = summary[name]
+                text = f"{name} {entry['cpu_ms']:.2f}"
+                if "gpu_ms" in entry:
+                    text += f"/{entry['gpu_ms']:.2f} GPU"
+                parts.append(text)
+        return " | ".join(parts) + " ms"
+
+    def reset(self) -> None:
+        """Clears statistics and trace events."""
+        self._cpu_stats.clear()
+        self._gpu_stats.clear()
+        self._trace.clear()
+
+    def export_chrome_trace(self, path: str) -> None:
+        """Writes recorded trace events in Chrome trace event format (chrome://tracing, Perfetto)."""
+        with open(path, "w") as f:
+            json.dump({"traceEvents": list(self._trace), "displayTimeUnit": "ms"}, f)
+
+
+# Profiler of the (single) GL context
+profiler = Profiler()
@@ -0,0 +1,105 @@
+import os
+import json
+import struct
+import hashlib
+
+import numpy as np
+from OpenGL.GL import *
+import mesh_cache
+
+
+CACHE_DIR = mesh_cache.CACHE_DIR
+CACHE_VERSION = 1
+_MAGIC = b"PROGBIN\0"
+enabled = True  # False compiles every program from source
+
+
+def binary_supported() -> bool:
+    """True if the context can save and load linked programs (GL 4.1 / ARB_get_program_binary)."""
+    if (glGetIntegerv(GL_MAJOR_VERSION), glGetIntegerv(GL_MINOR_VERSION)) >= (4, 1):
+        return True
+    return any(glGetStringi(GL_EXTENSIONS, i) == b"GL_ARB_get_program_binary"
+               for i in range(glGetIntegerv(GL_NUM_EXTENSIONS)))
+
+
+def binary_formats() -> list:
+    """Program binary formats the driver accepts, none if it can't save programs (or its shader cache is off)."""
+    if not binary_supported():
+        return []
+    count = glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS)
+    return [int(f) for f in np.atleast_1d(glGetIntegerv(GL_PROGRAM_BINARY_FORMATS))[:count]] if count else []
+
+
+def cache_path(vs_path: str, fs_path: str, defines: dict) -> str:
+    """Location of the cached binary of a program, next to its vertex shader. One file per permutation."""
+    directory, vs_name = os.path.split(vs_path)
+    name = os.path.splitext(vs_name)[0] + "+" + os.path.splitext(os.path.basename(fs_path))[0]
+    if defines:
+        name += "." + ",".join(f"{key}={value}" for key, value in sorted(defines.items()))
+    return os.path.join(directory, CACHE_DIR, name + ".bin")
+
+
+def signature(sources: list, defines: dict) -> str:
+    """
+    Hash of everything a program binary depends on: preprocessed sources, defines and the driver.
+
+    :param sources: Source (bytes) of each stage, includes expanded.
+    """
+    digest = hashlib.sha256()
+    for value in (glGetString(GL_VENDOR), glGetString(GL_RENDERER), glGetString(GL_VERSION)):
+        digest.update(value + b"\0")
+    digest.update(json.dumps(sorted(defines.items())).encode())
+    for source in sources:
+        digest.update(source + b"\0")
+    return digest.hexdigest()
+
+
+def load(path: str, key: str):
+    """
+    Creates a program from its cached binary.
+
+    :param key: Signature of the program's sources (see signature()).
+    :return: Linked program, or None if the cache is missing, stale or rejected by the driver (or the context
+             can't load programs).
+    """
+    if not enabled or not os.path.exists(path) or not binary_supported():
+        return None
+    with open(path, "rb") as f:
+        if f.read(len(_MAGIC)) != _MAGIC:
+            return None
+        header_len, = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_len))
+        if header["version"] != CACHE_VERSION or header["signature"] != key or \
+                header["format"] not in binary_formats():
+            return None
+        binary = np.frombuffer(f.read(), dtype=np.uint8)
+
+    program = glCreateProgram()
+    glProgramBinary(program, header["format"], binary, binary.nbytes)
+    if glGetProgramiv(program, GL_LINK_STATUS) != GL_TRUE:  # E.g. after a driver update that kept its version
+        glDeleteProgram(program)
+        return None
+    return program
+
+
+def store(path: str, key: str, program: int) -> None:
+    """Writes the binary of a program linked with GL_PROGRAM_BINARY_RETRIEVABLE_HINT to the cache."""
+    if not enabled or not binary_formats():
+        return
+    length = glGetProgramiv(program, GL_PROGRAM_BINARY_LENGTH)
+    binary = np.empty(length, dtype=np.uint8)
+    written, binary_format = GLsizei(), GLenum()
+    glGetProgramBinary(program, length, written, binary_format, binary)
+    header = json.dumps({"version": CACHE_VERSION, "signature": key, "format": binary_format.value}).encode()
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = mesh_cache.temp_path(path)
+        with open(tmp_path, "wb") as f:
+            f.write(_MAGIC)
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            f.write(binary[:written.value].tobytes())
+        os.replace(tmp_path, path)  # Readers never see a partially written cache
+    except OSError:
+        pass  # Read-only checkout: programs are compiled from source next time again
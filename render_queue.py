@@ -0,0 +1,213 @@
+from itertools import compress
+
+import numpy as np
+from OpenGL.GL import *
+from gl_state import state
+from profiler import profiler
+from asset_registry import bind_material_texture
+from dynamic_buffer import ring
+from uniform_buffer import OBJECT_BINDING, OBJECT_BLOCK_SIZE, OBJECT_MOTION_OFFSET, OBJECT_COLOR_OFFSET
+
+
+# Sort key layout (64 bits, most significant first). Opaque items are sorted by state, then front to back.
+# Blended items are sorted back to front first, state only breaks ties.
+_PROGRAM_BITS, _VAO_BITS, _TEXTURE_BITS, _MATERIAL_BITS, _DEPTH_BITS = 8, 16, 12, 12, 16
+_DEPTH_MAX = (1 << _DEPTH_BITS) - 1
+
+
+class DrawItem:
+    __slots__ = ("shader", "vao", "texture", "material", "model", "color", "count", "index_type", "instances",
+                 "first", "motion", "block")
+
+    def __init__(self, shader, vao: int, texture: int, material, model, color, count: int, index_type,
+                 instances: int, first: int, motion=None):
+        """Everything needed to issue one draw call. See RenderQueue.submit."""
+        self.shader = shader
+        self.vao = vao
+        self.texture = texture
+        self.material = material
+        self.model = model
+        self.color = color
+        self.count = count
+        self.index_type = index_type
+        self.instances = instances
+        self.first = first
+        self.motion = motion
+        self.block = 0  # Offset of the item's Object block in the dynamic buffer, written by flush
+
+
+class RenderQueue:
+    def __init__(self):
+        """Collects draw items of a frame, sorts them by a 64-bit key and executes them in two passes.
+
+        GL state (program, VAO, texture, material uniforms) is changed only where it differs between
+        consecutive items. Per-draw data (model matrix, motion, color) of all items is written into the
+        dynamic buffer at once and bound by offset for each draw. Opaque items are drawn first with blending
+        disabled, blended items follow back to front with depth writes disabled.
+        """
+        self._eye = np.zeros(3)
+        self._far = 1.0
+        self._material_ids = {}
+        self._items = ([], [])  # opaque, blended
+        self._keys = ([], [])
+        self.draw_calls = 0  # Draw calls of the last flush
+
+    def set_view(self, eye, far: float) -> None:
+        """Camera position and far plane distance used for depth sorting."""
+        self._eye = np.asarray(eye, dtype=np.float64)
+        self._far = far
+
+    def _material_id(self, material) -> int:
+        if material is None:
+            return 0
+        mat_id = self._material_ids.get(id(material))
+        if mat_id is None:
+            mat_id = self._material_ids[id(material)] = len(self._material_ids) + 1
+        return mat_id
+
+    def submit(self, shader, vao: int, texture: int, material, model, count: int, index_type,
+               position=None, color=None, instances: int = 0, blended: bool = False, first: int = 0,
+               motion=None) -> None:
+        """
+        Queues one draw call.
+
+        :param shader: Shader to draw with.
+        :param vao: Vertex array object (with bound index buffer).
+        :param texture: 2D texture bound to unit 0 (0 for none), or texture array bound to unit 1 if
+                        material.layer >= 0.
+        :param material: Object with ambient, diffuse, specular and shininess, None if the shader has no material.
+        :param model: Model matrix, None for instanced draws.
+        :param count: Number of indices.
+        :param index_type: GL_UNSIGNED_SHORT or GL_UNSIGNED_INT.
+        :param position: World position used for depth sorting (model translation by default).
+        :param color: Color in the Object block (light source markers).
+        :param instances: Number of instances, 0 for a regular draw.
+        :param blended: True if the item needs alpha blending.
+        :param first: Byte offset of the first index (e.g. of a level of detail).
+        :param motion: Packed parametric motion (see animation.Motion) in the Object block, for ANIMATED shaders.
+        """
+        if position is None:
+            position = model[3, :3] if model is not None else self._eye
+        dist = np.sqrt(np.sum((np.asarray(position[:3]) - self._eye) ** 2))
+        depth = int(min(dist / self._far, 1.0) * _DEPTH_MAX)
+
+        program = int(shader.program) & ((1 << _PROGRAM_BITS) - 1)
+        state_key = program
+        state_key = (state_key << _VAO_BITS) | (int(vao) & ((1 << _VAO_BITS) - 1))
+        state_key = (state_key << _TEXTURE_BITS) | (int(texture) & ((1 << _TEXTURE_BITS) - 1))
+        state_key = (state_key << _MATERIAL_BITS) | (self._material_id(material) & ((1 << _MATERIAL_BITS) - 1))
+        if blended:
+            # Back to front: far items first
+            key = ((_DEPTH_MAX - depth) << (64 - _DEPTH_BITS)) | (state_key >> _DEPTH_BITS)
+        else:
+            key = (state_key << _DEPTH_BITS) | depth
+
+        self._items[blended].append(DrawItem(shader, vao, texture, material, model, color, count, index_type,
+                                             instances, first, motion))
+        self._keys[blended].append(key)
+
+    def flush(self, deferred=None) -> None:
+        """
+        Sorts and executes all queued items, then empties the queue.
+
+        :param deferred: DeferredRenderer: opaque items whose shader has a geometry shader variant are drawn
+                         into its G-buffer with that variant and shaded by its lighting passes first.
+                         Other opaque items follow forward shaded, then blended items.
+        """
+        self.draw_calls = 0
+        self._write_objects()
+
+        glDisable(GL_BLEND)
+        items, keys = self._items[False], self._keys[False]
+        if deferred is not None:
+            shaders = [deferred.geometry_shader(item.shader) for item in items]
+            geometry = [shader is not None for shader in shaders]
+            for item, shader in zip(items, shaders):
+                item.shader = shader or item.shader
+            deferred.begin_geometry()
+            with profiler.gpu_scope("geometry"):
+                self._execute(list(compress(items, geometry)), list(compress(keys, geometry)))
+            with profiler.gpu_scope("lighting"):
+                deferred.light()
+            forward = [not g for g in geometry]
+            items, keys = list(compress(items, forward)), list(compress(keys, forward))
+        with profiler.gpu_scope("opaque"):
+            self._execute(items, keys)
+        if self._items[True]:
+            glEnable(GL_BLEND)
+            glDepthMask(GL_FALSE)
+            with profiler.gpu_scope("blended"):
+                self._execute(self._items[True], self._keys[True])
+            glDepthMask(GL_TRUE)
+        ring.end_frame()  # The draws are issued, the GPU owns the space until they complete
+        self.clear()
+
+    def _write_objects(self) -> None:
+        """
+        Writes the Object blocks of all non-instanced items into the dynamic buffer, in one allocation. Items
+        of the same object (same model, motion and color) share a block, so their draws bind the same range.
+        """
+        items = [item for item in self._items[False] + self._items[True] if not item.instances]
+        if not items:
+            return
+        blocks = {}  # (model, motion, color) ids -> first item
+        for item in items:
+            blocks.setdefault((id(item.model), id(item.motion), id(item.color)), item)
+        stride = ring.aligned(OBJECT_BLOCK_SIZE)
+        offset, view = ring.allocate(len(blocks) * stride)
+        data = view.reshape(len(blocks), stride // 4)
+        np.stack([item.model for item in blocks.values()], out=data[:, :16].reshape(-1, 4, 4))
+        motion, color = OBJECT_MOTION_OFFSET // 4, OBJECT_COLOR_OFFSET // 4
+        for i, (key, item) in enumerate(blocks.items()):
+            blocks[key] = offset + i * stride
+            if item.motion is not None:
+                data[i, motion:motion + 8] = item.motion.ravel()
+            if item.color is not None:
+                data[i, color:color + 3] = item.color
+        ring.commit()
+        for item in items:
+            item.block = blocks[id(item.model), id(item.motion), id(item.color)]
+
+    def clear(self) -> None:
+        """Empties the queue without drawing."""
+        for items, keys in zip(self._items, self._keys):
+            items.clear()
+            keys.clear()
+
+    def _execute(self, items: list, keys: list) -> None:
+        if not items:
+            return
+        order = np.argsort(np.array(keys, dtype=np.uint64), kind="stable")
+
+        shader, vao, texture, material = None, None, None, None
+        scope = profiler.scope
+        for i in order:
+            item = items[i]
+            with scope(item.material.name if item.material is not None else "draw"):
+                if item.shader is not shader:
+                    shader = item.shader
+                    shader.use()
+                    material = None  # Material uniforms are per program
+                if item.vao != vao:
+                    vao = item.vao
+                    state.bind_vertex_array(vao)
+                if item.texture != texture:
+                    texture = item.texture
+                    bind_material_texture(texture, item.material)
+                if item.material is not material:
+                    material = item.material
+                    if material is not None:
+                        shader.set_v3("material.ambient", material.ambient)
+                        shader.set_v3("material.diffuse", material.diffuse)
+                        shader.set_v3("material.specular", material.specular)
+                        shader.set_float("material.shininess", material.shininess)
+                        shader.set_int("material.layer", material.layer)
+                        shader.set_v4s("dequantize", material.dequantize)
+
+                if item.instances:
+                    glDrawElementsInstanced(GL_TRIANGLES, item.count, item.index_type, ctypes.c_void_p(item.first),
+                                            item.instances)
+                else:
+                    state.bind_uniform_buffer_range(OBJECT_BINDING, ring.buffer, item.block, OBJECT_BLOCK_SIZE)
+                    glDrawElements(GL_TRIANGLES, item.count, item.index_type, ctypes.c_void_p(item.first))
+                self.draw_calls += 1
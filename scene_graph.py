@@ -0,0 +1,132 @@
+import numpy as np
+
+
+class SceneNode:
+    def __init__(self, graph, index: int):
+        """Handle of one node of a SceneGraph. Matrices live in the graph's arrays."""
+        self._graph = graph
+        self.index = index
+
+    @property
+    def local(self) -> np.ndarray:
+        """Transform relative to the parent node (read only view, use set_local)."""
+        return self._graph.local[self.index]
+
+    def set_local(self, matrix) -> None:
+        self._graph.set_locals([self.index], np.asarray(matrix)[np.newaxis])
+
+    @property
+    def world(self) -> np.ndarray:
+        """Transform relative to the world, recomputed lazily if the node or an ancestor changed."""
+        self._graph.update()
+        return self._graph.world[self.index]
+
+    @property
+    def version(self) -> int:
+        """Incremented whenever the world matrix is recomputed."""
+        self._graph.update()
+        return int(self._graph.version[self.index])
+
+    @property
+    def parent(self):
+        parent = self._graph.parent[self.index]
+        return SceneNode(self._graph, parent) if parent >= 0 else None
+
+
+class SceneGraph:
+    def __init__(self, capacity: int = 16):
+        """Hierarchy of transforms stored as flat arrays.
+
+        Parents are always stored before their children, so world matrices can be computed level by level,
+        each level with one vectorized matmul over the nodes that (or whose ancestors) changed.
+        Matrices follow the Arithmetic convention: world = local . parent world.
+
+        :param capacity: Initial number of nodes, grows as needed.
+        """
+        self.count = 0
+        self.local = np.tile(np.identity(4, dtype=np.float32), (capacity, 1, 1))
+        self.world = self.local.copy()
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.depth = np.zeros(capacity, dtype=np.int32)
+        self.version = np.zeros(capacity, dtype=np.int64)
+        self._dirty = np.zeros(capacity, dtype=bool)
+        self._any_dirty = False
+        self._levels = []  # Node indices of each depth
+
+    def add_node(self, parent: SceneNode = None, local=None) -> SceneNode:
+        """
+        Adds a node.
+
+        :param parent: Parent node, None for a root node.
+        :param local: Initial local transform (identity if None).
+        :return: Handle of the new node.
+        """
+        if self.count == len(self.local):
+            self._grow()
+        index = self.count
+        self.count += 1
+
+        self.parent[index] = parent.index if parent is not None else -1
+        self.depth[index] = self.depth[parent.index] + 1 if parent is not None else 0
+        self.local[index] = local if local is not None else np.identity(4)
+        self._dirty[index] = True
+        self._any_dirty = True
+
+        depth = self.depth[index]
+        if depth == len(self._levels):
+            self._levels.append(np.array([index], dtype=np.int32))
+        else:
+            self._levels[depth] = np.append(self._levels[depth], np.int32(index))
+        return SceneNode(self, index)
+
+    def _grow(self) -> None:
+        capacity = len(self.local)
+        identity = np.tile(np.identity(4, dtype=np.float32), (capacity, 1, 1))
+        self.local = np.concatenate((self.local, identity))
+        self.world = np.concatenate((self.world, identity))
+        self.parent = np.concatenate((self.parent, np.full(capacity, -1, dtype=np.int32)))
+        self.depth = np.concatenate((self.depth, np.zeros(capacity, dtype=np.int32)))
+        self.version = np.concatenate((self.version, np.zeros(capacity, dtype=np.int64)))
+        self._dirty = np.concatenate((self._dirty, np.zeros(capacity, dtype=bool)))
+
+    def set_locals(self, indices, matrices) -> None:
+        """
+        Sets local transforms of many nodes at once. Only nodes whose matrix actually changed get dirty.
+
+        :param indices: Node indices (or SceneNode handles), shape (N,).
+        :param matrices: Local matrices, shape (N,4,4).
+        """
+        indices = np.array([i.index if isinstance(i, SceneNode) else i for i in indices], dtype=np.int32)
+        changed = np.any(self.local[indices] != matrices, axis=(1, 2))
+        if changed.any():
+            self.local[indices] = matrices
+            self._dirty[indices[changed]] = True
+            self._any_dirty = True
+
+    def update(self) -> int:
+        """
+        Recomputes world matrices of dirty nodes and their descendants.
+
+        :return: Number of recomputed world matrices.
+        """
+        if not self._any_dirty:
+            return 0
+
+        dirty = self._dirty
+        updated = 0
+        for depth, nodes in enumerate(self._levels):
+            if depth > 0:
+                dirty[nodes] |= dirty[self.parent[nodes]]  # Parents are final by now
+            nodes = nodes[dirty[nodes]]
+            if len(nodes) == 0:
+                continue
+            if depth == 0:
+                self.world[nodes] = self.local[nodes]
+            else:
+                self.world[nodes] = np.matmul(self.local[nodes], self.world[self.parent[nodes]])
+            self.version[nodes] += 1
+            updated += len(nodes)
+
+        dirty[:] = False
+        self._any_dirty = False
+        return updated
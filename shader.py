@@ -1,68 +1,259 @@
+import os
+
 from OpenGL.GL import *
-from OpenGL.GL.shaders import compileShader, compileProgram, ShaderProgram
+from OpenGL.GL.shaders import compileShader
+import numpy as np
 import Vector3 as v3
+import program_cache
+from uniform_buffer import BLOCK_BINDINGS
+from asset_registry import TEXTURE_ARRAY_UNIT
+from light_clusters import LIGHTS_UNIT, CLUSTERS_UNIT, LIGHT_INDICES_UNIT
+from gl_state import state
+
+
+SAMPLER_UNITS = {"s_texture": 0, "s_textures": TEXTURE_ARRAY_UNIT, "s_lights": LIGHTS_UNIT, "s_clusters": CLUSTERS_UNIT,
+                 "s_light_indices": LIGHT_INDICES_UNIT}
 
 
 class Shader:
-    def __init__(self, vs: str, fs: str):
-        """Shader program wrapper. Compiled and prepared for use.
+    def __init__(self, vs: str, fs: str, defines: dict = None):
+        """Shader program wrapper. Compiled (or loaded from the program binary cache) and prepared for use.
 
         :param vs: Vertex shader filepath.
         :param fs: Fragment shader filepath.
+        :param defines: Preprocessor defines (name -> value) added to both stages, e.g. {"INSTANCED": 1}.
         """
         self._vs_path = vs
         self._fs_path = fs
+        self.defines = dict(defines or {})
+        self.permutations: ShaderPermutations = None  # Set of variants this shader belongs to, if any
+        self._files = {}  # Source files (includes too) -> modification time when compiled
         self._shader = self._compile_shader()
+        self._prepare()
 
-        # Assumption: all shaders will have these uniforms.
-        self._loc = {
-            "model": glGetUniformLocation(self._shader, "model"),
-            "projection": glGetUniformLocation(self._shader, "projection"),
-            "view": glGetUniformLocation(self._shader, "view"),
-        }
+    @property
+    def program(self) -> int:
+        """GL name of the program."""
+        return self._shader
 
     def use(self) -> None:
-        glUseProgram(self._shader)
+        state.use_program(self._shader)
 
-    def set_model(self, matrix) -> None:
-        glUniformMatrix4fv(self._get_loc("model"), 1, GL_FALSE, matrix)
+    def for_material(self, _material, **_defines) -> "Shader":
+        """Shader to draw given material with; a plain shader draws all materials (see ShaderPermutations)."""
+        return self
 
-    def set_projection(self, matrix) -> None:
-        glUniformMatrix4fv(self._get_loc("projection"), 1, GL_FALSE, matrix)
+    def bind_block(self, block_name: str, binding: int) -> None:
+        """Connects uniform block of given name (if the program uses it) to a binding point."""
+        index = glGetUniformBlockIndex(self._shader, block_name)
+        if index != GL_INVALID_INDEX:
+            glUniformBlockBinding(self._shader, index, binding)
 
-    def set_view(self, matrix) -> None:
-        glUniformMatrix4fv(self._get_loc("view"), 1, GL_FALSE, matrix)
+    def bind_sampler(self, sampler_name: str, unit: int) -> None:
+        """Connects sampler uniform of given name (if the program uses it) to a texture unit."""
+        loc = self._get_loc(sampler_name)
+        if loc != -1:
+            state.use_program(self._shader)
+            glUniform1i(loc, unit)
+            self._samplers[sampler_name] = unit
 
     def set_bool(self, uniform_name: str, val: bool) -> None:
-        glUniform1i(self._get_loc(uniform_name), val)
+        loc = self._get_loc(uniform_name)
+        if self._changed(loc, bool(val)):
+            glUniform1i(loc, val)
+
+    def set_int(self, uniform_name: str, val: int) -> None:
+        loc = self._get_loc(uniform_name)
+        if self._changed(loc, int(val)):
+            glUniform1i(loc, val)
 
     def set_float(self, uniform_name: str, val: float) -> None:
-        glUniform1f(self._get_loc(uniform_name), val)
+        loc = self._get_loc(uniform_name)
+        if self._changed(loc, float(val)):
+            glUniform1f(loc, val)
 
     def set_v3(self, uniform_name: str, val: v3) -> None:
-        glUniform3fv(self._get_loc(uniform_name), 1, val)
+        loc = self._get_loc(uniform_name)
+        val = np.asarray(val, dtype=np.float32)
+        if self._changed(loc, val.tobytes()):
+            glUniform3fv(loc, 1, val)
+
+    def set_v4s(self, uniform_name: str, val) -> None:
+        """Sets a vec4 array uniform, e.g. motion[2]."""
+        loc = self._get_loc(uniform_name)
+        val = np.asarray(val, dtype=np.float32)
+        if self._changed(loc, val.tobytes()):
+            glUniform4fv(loc, val.size // 4, val)
+
+    def reload(self) -> bool:
+        """
+        Recompiles the program if one of its source files changed since it was compiled. On compile errors
+        the error is printed and the old program kept.
+
+        :return: True if the program was replaced.
+        """
+        if all(os.path.exists(path) and os.path.getmtime(path) == mtime for path, mtime in self._files.items()):
+            return False
+        files = self._files
+        try:
+            program = self._compile_shader()
+        except (RuntimeError, OSError) as e:
+            print(f"Shader {self._vs_path} + {self._fs_path} not reloaded: {e.args[0]}")  # Not the source
+            self._files = {path: os.path.getmtime(path) if os.path.exists(path) else None for path in files}
+            return False
+        samplers = self._samplers
+        glDeleteProgram(self._shader)
+        state.invalidate()  # The deleted program may still be cached as current
+        self._shader = program
+        self._prepare()
+        for sampler_name, unit in samplers.items():  # Also units bound by users of the shader
+            self.bind_sampler(sampler_name, unit)
+        return True
+
+    def _prepare(self) -> None:
+        """Reflects the linked program's uniforms and connects its blocks and samplers."""
+        self._loc = self._reflect()
+        # Last uploaded value of each uniform location, identical uploads are skipped
+        self._values = {}
+        self._samplers = {}  # Sampler name -> texture unit
+        # Shared uniform blocks (camera, lights) are bound to fixed binding points
+        for block_name, binding in BLOCK_BINDINGS.items():
+            self.bind_block(block_name, binding)
+        # Samplers read fixed texture units
+        for sampler_name, unit in SAMPLER_UNITS.items():
+            self.bind_sampler(sampler_name, unit)
+
+    def _reflect(self) -> dict:
+        """Locations of all active uniforms outside of blocks (e.g. "material.ambient"), queried once after linking."""
+        locations = {}
+        for index in range(glGetProgramiv(self._shader, GL_ACTIVE_UNIFORMS)):
+            name = glGetActiveUniform(self._shader, index)[0].decode()
+            loc = glGetUniformLocation(self._shader, name)
+            if loc != -1:  # Block members have none
+                locations[name] = loc
+                if name.endswith("[0]"):
+                    locations[name[:-3]] = loc
+        return locations
+
+    def _changed(self, loc: int, value) -> bool:
+        """Remembers value of a uniform location, returns False if it is already uploaded."""
+        if loc == -1 or self._values.get(loc) == value:
+            state.count(False)
+            return False
+        self._values[loc] = value
+        state.count(True)
+        return True
 
-    def _get_loc(self, uniform_name: str) -> None:
-        """Lazy uniform location storage."""
-        if uniform_name not in self._loc:
-            self._loc[uniform_name] = glGetUniformLocation(self._shader, uniform_name)
-        return self._loc[uniform_name]
+    def _get_loc(self, uniform_name: str) -> int:
+        """Location of an active uniform, -1 if the program doesn't use it."""
+        return self._loc.get(uniform_name, -1)
 
-    def _compile_shader(self) -> ShaderProgram:
+    def _compile_shader(self) -> int:
         """
-        Compile shaders from given source files.
+        Compile shaders from given source files, or load the program from the binary cache if it was compiled
+        from the same sources, defines and driver before.
 
-        :return: Compiled shader program.
+        :return: Linked program.
         """
+        self._files = {}
         vert_shader = self._load_shader(self._vs_path)
         frag_shader = self._load_shader(self._fs_path)
 
-        shader = compileProgram(compileShader(vert_shader, GL_VERTEX_SHADER),
-                                compileShader(frag_shader, GL_FRAGMENT_SHADER))
-        return shader
+        path = program_cache.cache_path(self._vs_path, self._fs_path, self.defines)
+        key = program_cache.signature((vert_shader, frag_shader), self.defines)
+        program = program_cache.load(path, key)
+        if program is None:
+            retrievable = program_cache.enabled and program_cache.binary_supported()
+            program = self._link(compileShader(vert_shader, GL_VERTEX_SHADER),
+                                 compileShader(frag_shader, GL_FRAGMENT_SHADER), retrievable=retrievable)
+            if retrievable:
+                program_cache.store(path, key, program)
+        return program
 
     @staticmethod
-    def _load_shader(shader_file: str) -> bytes:
+    def _link(*stages, retrievable: bool = False) -> int:
+        """
+        :param retrievable: Link with GL_PROGRAM_BINARY_RETRIEVABLE_HINT, for program_cache.store (GL 4.1 /
+                            ARB_get_program_binary only).
+        """
+        program = glCreateProgram()
+        for stage in stages:
+            glAttachShader(program, stage)
+        if retrievable:
+            glProgramParameteri(program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
+        glLinkProgram(program)
+        for stage in stages:
+            glDetachShader(program, stage)
+            glDeleteShader(stage)
+        # Not validated: samplers of different types share unit 0 until bind_sampler() assigns their units
+        if glGetProgramiv(program, GL_LINK_STATUS) != GL_TRUE:
+            log = glGetProgramInfoLog(program)
+            glDeleteProgram(program)
+            raise RuntimeError(f"Link failure: {log.decode() if isinstance(log, bytes) else log}")
+        return program
+
+    def _load_shader(self, shader_file: str) -> bytes:
+        """Source of a shader file with the defines added after its #version line."""
+        source = self._expand_includes(shader_file)
+        if self.defines:
+            version, _, rest = source.partition("\n")
+            source = "\n".join([version] + [f"#define {name} {value}" for name, value in self.defines.items()]
+                               + [rest])
+        return str.encode(source)
+
+    def _expand_includes(self, shader_file: str) -> str:
+        """Source of a shader file with `#include "file"` lines replaced by that file (relative to the shader)."""
+        self._files[shader_file] = os.path.getmtime(shader_file)
         with open(shader_file) as f:
-            shader_source = f.read()
-        return str.encode(shader_source)
+            lines = f.read().splitlines(keepends=True)
+        for i, line in enumerate(lines):
+            if line.startswith("#include"):
+                path = os.path.join(os.path.dirname(shader_file), line.split('"')[1])
+                lines[i] = self._expand_includes(path).rstrip("\n") + "\n"
+        return "".join(lines)
+
+
+class ShaderPermutations:
+    def __init__(self, vs: str, fs: str, **defines):
+        """Variants of one shader pair, differing in preprocessor defines. Each variant is compiled (or loaded
+        from the program binary cache) when it is first asked for.
+
+        Materials get variants sampling exactly their kind of texture (for_material): TEXTURE_ARRAY (a layer
+        of their mesh's texture array), TEXTURE_2D or neither (untextured, material colors only), instead of
+        choosing at run time in the shader.
+
+        :param vs: Vertex shader filepath.
+        :param fs: Fragment shader filepath.
+        :param defines: Defines of all variants, e.g. INSTANCED=1.
+        """
+        self._vs_path = vs
+        self._fs_path = fs
+        self._defines = defines
+        self._variants = {}  # Sorted defines -> Shader
+
+    @property
+    def variants(self) -> list:
+        """Variants compiled so far."""
+        return list(self._variants.values())
+
+    def get(self, **defines) -> Shader:
+        """The variant with given defines (in addition to the set's), compiled on first demand."""
+        defines = {**self._defines, **defines}
+        key = tuple(sorted(defines.items()))
+        shader = self._variants.get(key)
+        if shader is None:
+            shader = self._variants[key] = Shader(self._vs_path, self._fs_path, defines)
+            shader.permutations = self
+        return shader
+
+    def for_material(self, material, **defines) -> Shader:
+        """The variant sampling given material's texture, with further defines (e.g. ANIMATED=1) if given."""
+        if material.layer >= 0:
+            return self.get(TEXTURE_ARRAY=1, **defines)
+        if material.texture is not None:
+            return self.get(TEXTURE_2D=1, **defines)
+        return self.get(**defines)
+
+    def reload(self) -> bool:
+        """Recompiles variants whose source files changed (see Shader.reload). True if any was replaced."""
+        return any([shader.reload() for shader in self._variants.values()])
@@ -0,0 +1,22 @@
+#version 330 core
+// Deferred lighting, composited once per pixel covered by geometry: directional light plus the point and
+// spot lights accumulated by the light volumes
+out vec4 FragColor;
+
+#include "lights.glsl"
+#include "gbuffer.glsl"
+
+uniform sampler2D s_light;  // Light volume sum
+
+void main()
+{
+    vec4 position = FetchPosition();
+    vec3 normal;
+    vec4 texel = FetchSurface(position, normal);
+    vec3 viewDir = normalize(viewPos - position.xyz);
+
+    vec3 result = CalcDirLight(dirLight, normal, viewDir, texel) + texelFetch(s_light, ivec2(gl_FragCoord.xy), 0).rgb;
+    FragColor = vec4(result, texel.a);
+}
+
+#include "phong_lighting.glsl"
@@ -0,0 +1,29 @@
+// G-buffer of the deferred renderer (see deferred.py), read by the lighting passes. Include after lights.glsl.
+
+uniform sampler2D g_position;
+uniform sampler2D g_normal;
+uniform sampler2D g_albedo;
+uniform sampler2D g_ambient;
+uniform sampler2D g_diffuse;
+uniform sampler2D g_specular;
+
+Material material;  // Of the current pixel, read by phong_lighting.glsl
+
+// World position and shininess of the surface at this pixel. Discards pixels without geometry.
+vec4 FetchPosition()
+{
+    vec4 position = texelFetch(g_position, ivec2(gl_FragCoord.xy), 0);
+    if(position.w < 0.0)
+        discard;
+    return position;
+}
+
+// Fills material and normal of the surface at this pixel (at position from FetchPosition), returns its texel.
+vec4 FetchSurface(vec4 position, out vec3 normal)
+{
+    ivec2 pixel = ivec2(gl_FragCoord.xy);
+    normal = normalize(texelFetch(g_normal, pixel, 0).xyz);
+    material = Material(texelFetch(g_ambient, pixel, 0).rgb, texelFetch(g_diffuse, pixel, 0).rgb,
+                        texelFetch(g_specular, pixel, 0).rgb, position.w, -1);
+    return texelFetch(g_albedo, pixel, 0);
+}
@@ -0,0 +1,29 @@
+#version 330 core
+// Geometry pass of the deferred renderer (see deferred.py): surface attributes instead of a color
+layout(location = 0) out vec4 g_position;  // World position, shininess (cleared to -1 where nothing is drawn)
+layout(location = 1) out vec4 g_normal;
+layout(location = 2) out vec4 g_albedo;    // Texel times tint
+layout(location = 3) out vec4 g_ambient;   // Material colors
+layout(location = 4) out vec4 g_diffuse;
+layout(location = 5) out vec4 g_specular;
+
+#include "lights.glsl"
+
+in vec3 v_normal;
+in vec3 frag_pos;
+in vec2 v_texture;
+in vec4 v_tint;
+
+uniform Material material;
+
+#include "material_texel.glsl"
+
+void main()
+{
+    g_position = vec4(frag_pos, max(material.shininess, 0.0));
+    g_normal = vec4(normalize(v_normal), 0.0);
+    g_albedo = MaterialTexel();
+    g_ambient = vec4(material.ambient, 0.0);
+    g_diffuse = vec4(material.diffuse, 0.0);
+    g_specular = vec4(material.specular, 0.0);
+}
@@ -1,9 +1,9 @@
 #version 330 core
 out vec4 FragColor;
 
-uniform vec3 color;
+#include "object.glsl"
 
 void main()
 {  
-    FragColor = vec4(color, 1.0f);    
+    FragColor = vec4(color.rgb, 1.0f);    
 }
@@ -5,11 +5,18 @@ layout(location = 1) in vec2 a_texture;
 layout(location = 2) in vec3 a_color;
 layout(location = 3) in vec3 a_normal;
 
-uniform mat4 model;
-uniform mat4 view;
-uniform mat4 projection;
+#include "object.glsl"
+
+layout(std140) uniform Camera {
+    mat4 view;
+    mat4 projection;
+    vec3 viewPos;
+    float time;
+};
+
+#include "vertex_format.glsl"
 
 void main()
 {
-    gl_Position = projection * view * model * vec4(a_pos, 1.0);
+    gl_Position = projection * view * model * vec4(VertexPosition(), 1.0);
 }
\ No newline at end of file
@@ -0,0 +1,28 @@
+#version 330 core
+// Deferred lighting: one point light or the spot light, for pixels inside its sphere (summed up)
+out vec4 FragColor;
+
+#include "lights.glsl"
+#include "gbuffer.glsl"
+
+flat in int v_light;
+flat in vec4 v_sphere;
+
+uniform bool spot;
+
+void main()
+{
+    vec4 position = FetchPosition();
+    // Covered by the sphere on screen, but outside of it (e.g. in front): the light doesn't reach the surface
+    if(distance(position.xyz, v_sphere.xyz) >= v_sphere.w)
+        discard;
+    vec3 normal;
+    vec4 texel = FetchSurface(position, normal);
+    vec3 viewDir = normalize(viewPos - position.xyz);
+
+    vec3 light = spot ? CalcSpotLight(spotLight, normal, position.xyz, viewDir)
+                      : CalcPointLight(FetchPointLight(v_light), normal, position.xyz, viewDir);
+    FragColor = vec4(light * texel.rgb, 0.0);
+}
+
+#include "phong_lighting.glsl"
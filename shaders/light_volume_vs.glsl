@@ -0,0 +1,27 @@
+#version 330 core
+// Deferred lighting: sphere around a point light (instance i is point light i) or the spot light
+
+layout(location = 0) in vec3 a_pos;  // Unit sphere, faces outside of it
+
+#include "lights.glsl"
+
+uniform bool spot;         // Draw the spot light's sphere instead of point lights
+uniform float spotRadius;
+
+flat out int v_light;
+flat out vec4 v_sphere;  // Center, radius
+
+// Lights that never fade out (infinite radius) still get a finite sphere; depth clamping keeps it unclipped
+const float MAX_RADIUS = 1e4;
+
+void main()
+{
+    if(spot)
+        v_sphere = vec4(spotLight.position, spotRadius);
+    else
+        v_sphere = vec4(texelFetch(s_lights, 4 * gl_InstanceID).xyz, texelFetch(s_lights, 4 * gl_InstanceID + 3).w);
+    v_sphere.w = min(v_sphere.w, MAX_RADIUS);
+    v_light = gl_InstanceID;
+
+    gl_Position = projection * view * vec4(v_sphere.xyz + a_pos * v_sphere.w, 1.0);
+}
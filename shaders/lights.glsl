@@ -0,0 +1,84 @@
+// Material, light structs and the uniform blocks and buffers holding the lights, shared by the forward
+// and deferred shaders. Include before declaring `material`, include phong_lighting.glsl after main().
+
+struct Material {
+    vec3 ambient;
+    vec3 diffuse;
+    vec3 specular;
+    float shininess;
+    int layer;  // Layer in s_textures, -1 to sample s_texture
+};
+
+// Light structs follow std140 rules: every vec3 starts a new vec4 slot,
+// scalars are packed into the free 4th component (see light.py).
+// Point lights are read from a texture buffer in the same layout, 4 texels each.
+struct DirLight {
+    vec3 direction;
+
+    vec3 ambient;
+    vec3 diffuse;
+    vec3 specular;
+};
+
+struct PointLight {
+    vec3 position;
+    float constant;
+
+    vec3 ambient;
+    float linear;
+    vec3 diffuse;
+    float quadratic;
+    vec3 specular;
+    float radius;  // Influence ends here (see light_clusters.py)
+};
+
+// Day-night cycle (see light.py): the sky color and with it the directional light go from day to night
+struct Daytime {
+    vec3 day;
+    float rate;  // Radians of the cycle per second
+    vec3 night;
+};
+
+struct SpotLight {
+    vec3 position;
+    float cutOff;
+    vec3 direction;
+    float outerCutOff;
+
+    vec3 ambient;
+    float constant;
+    vec3 diffuse;
+    float linear;
+    vec3 specular;
+    float quadratic;
+};
+
+
+layout(std140) uniform Camera {
+    mat4 view;
+    mat4 projection;
+    vec3 viewPos;
+    float time;  // Scene time in seconds
+};
+
+layout(std140) uniform Lights {
+    DirLight dirLight;
+    SpotLight spotLight;
+    Daytime daytime;
+};
+
+// Clustered point lights (see light_clusters.py): the view frustum is split into screen tiles and depth
+// slices, each cluster has a range in the light index list
+layout(std140) uniform Clusters {
+    vec4 clusterGrid;   // tiles x, tiles y, depth slices, point lights
+    vec4 clusterScale;  // tiles per pixel x and y, scale and bias of log(depth) to slices
+};
+uniform samplerBuffer s_lights;          // Point light structs
+uniform usamplerBuffer s_clusters;       // First index and light count per cluster
+uniform usamplerBuffer s_light_indices;  // Light indices, grouped by cluster
+
+vec3 SkyColor();
+vec3 CalcDirLight(DirLight light, vec3 normal, vec3 viewDir, vec4 texel);
+vec3 CalcPointLight(PointLight light, vec3 normal, vec3 fragPos, vec3 viewDir);
+vec3 CalcSpotLight(SpotLight light, vec3 normal, vec3 fragPos, vec3 viewDir);
+PointLight FetchPointLight(int index);
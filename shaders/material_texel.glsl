@@ -0,0 +1,20 @@
+// Texel of the material at v_texture, times v_tint. Defines: TEXTURE_ARRAY (layer material.layer of the
+// mesh's texture array) or TEXTURE_2D, untextured if neither (see ShaderPermutations.for_material).
+// Include after declaring `material` and the v_texture and v_tint inputs.
+
+#if defined(TEXTURE_ARRAY)
+uniform sampler2DArray s_textures;  // Textures of all materials of a mesh (texture unit 1)
+#elif defined(TEXTURE_2D)
+uniform sampler2D s_texture;
+#endif
+
+vec4 MaterialTexel()
+{
+#if defined(TEXTURE_ARRAY)
+    return texture(s_textures, vec3(v_texture, material.layer)) * v_tint;
+#elif defined(TEXTURE_2D)
+    return texture(s_texture, v_texture) * v_tint;
+#else
+    return v_tint;
+#endif
+}
@@ -0,0 +1,18 @@
+// Parametric motion evaluated from the scene time (see animation.py): the object turns about its own up
+// axis, then bobs up and down and orbits around its model position.
+//   motion0: bob amplitude, bob rate, bob phase, yaw at time 0
+//   motion1: yaw rate, orbit radius, orbit rate, orbit phase
+// Include after declaring the Camera block (time).
+
+mat4 AnimatedModel(mat4 model, vec4 motion0, vec4 motion1)
+{
+    float yaw = motion0.w + motion1.x * time;
+    float c = cos(yaw), s = sin(yaw);
+    mat4 rotation = mat4(c, 0.0, s, 0.0,  0.0, 1.0, 0.0, 0.0,  -s, 0.0, c, 0.0,  0.0, 0.0, 0.0, 1.0);
+    mat4 animated = model * rotation;
+
+    float orbit = motion1.w + motion1.z * time;
+    animated[3].xyz += vec3(motion1.y * cos(orbit), motion0.x * sin(motion0.z + motion0.y * time),
+                            motion1.y * sin(orbit));
+    return animated;
+}
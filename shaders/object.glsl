@@ -0,0 +1,7 @@
+// Per-draw data, written for all draws of a frame into the dynamic buffer and bound by offset
+// (see render_queue.py, dynamic_buffer.py)
+layout(std140) uniform Object {
+    mat4 model;
+    vec4 motion[2];  // Parametric motion of ANIMATED shaders (see motion.glsl)
+    vec4 color;  // Light source marker color (rgb)
+};
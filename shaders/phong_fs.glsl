@@ -1,79 +1,37 @@
 #version 330 core
 out vec4 FragColor;
 
-struct Material {
-    vec3 ambient;
-    vec3 diffuse;
-    vec3 specular;
-    float shininess;
-};
-
-struct DirLight {
-    vec3 direction;
-
-    vec3 ambient;
-    vec3 diffuse;
-    vec3 specular;
-};
-
-struct PointLight {
-    vec3 position;
-
-    float constant;
-    float linear;
-    float quadratic;
-
-    vec3 ambient;
-    vec3 diffuse;
-    vec3 specular;
-};
-
-struct SpotLight {
-    vec3 position;
-    vec3 direction;
-    float cutOff;
-    float outerCutOff;
-
-    float constant;
-    float linear;
-    float quadratic;
-
-    vec3 ambient;
-    vec3 diffuse;
-    vec3 specular;
-};
-
-
-#define NR_POINT_LIGHTS 4
+#include "lights.glsl"
 
 in vec3 v_normal;
 in vec3 frag_pos;
 in vec2 v_texture;
+in vec4 v_tint;
 
-uniform vec3 viewPos;
 uniform Material material;
-uniform DirLight dirLight;
-uniform PointLight pointLights[NR_POINT_LIGHTS];
-uniform SpotLight spotLight;
-
-uniform sampler2D s_texture;
 
-vec3 CalcDirLight(DirLight light, vec3 normal, vec3 viewDir, vec4 texel);
-vec3 CalcPointLight(PointLight light, vec3 normal, vec3 fragPos, vec3 viewDir);
-vec3 CalcSpotLight(SpotLight light, vec3 normal, vec3 fragPos, vec3 viewDir);
+#include "material_texel.glsl"
 
 void main()
 {
     vec3 norm = normalize(v_normal);
     vec3 viewDir = normalize(viewPos - frag_pos);
-    vec4 texel = texture(s_texture, v_texture);
+    vec4 texel = MaterialTexel();
 
     // Directional light
     vec3 result = CalcDirLight(dirLight, norm, viewDir, texel);
 
-    // Point lights
-    for(int i = 0; i < NR_POINT_LIGHTS; i++)
-        result += CalcPointLight(pointLights[i], norm, frag_pos, viewDir) * texel.rgb;
+    // Point lights reaching this fragment's cluster
+    float depth = max(-(view * vec4(frag_pos, 1.0)).z, 1e-6);
+    ivec3 grid = ivec3(clusterGrid.xyz);
+    ivec3 cell = clamp(ivec3(gl_FragCoord.xy * clusterScale.xy, floor(log(depth) * clusterScale.z - clusterScale.w)),
+                       ivec3(0), grid - 1);
+    uvec2 range = texelFetch(s_clusters, (cell.z * grid.y + cell.y) * grid.x + cell.x).xy;
+    for(uint i = 0u; i < range.y; i++)
+    {
+        int index = int(texelFetch(s_light_indices, int(range.x + i)).r);
+        result += CalcPointLight(FetchPointLight(index), norm, frag_pos, viewDir) * texel.rgb;
+    }
 
     // Spot light
     result += CalcSpotLight(spotLight, norm, frag_pos, viewDir) * texel.rgb;
@@ -81,70 +39,4 @@ void main()
     FragColor = vec4(result, texel.a);
 }
 
-vec3 CalcDirLight(DirLight light, vec3 normal, vec3 viewDir, vec4 texel)
-{
-    vec3 lightDir = normalize(-light.direction);
-    // diffuse shading
-    float diff = max(dot(normal, lightDir), 0.0);
-    // specular shading
-    vec3 reflectDir = reflect(-lightDir, normal);
-    float spec = pow(max(dot(viewDir, reflectDir), 0.0), material.shininess);
-    // combine results
-    vec3 ambient = light.ambient * material.ambient;
-    vec3 diffuse = light.diffuse * diff * material.diffuse;
-    vec3 specular = light.specular * spec * material.specular;
-
-    return (ambient + diffuse + specular) * texel.rgb;
-}
-
-vec3 CalcPointLight(PointLight light, vec3 normal, vec3 fragPos, vec3 viewDir)
-{
-    vec3 lightDir = normalize(light.position - fragPos);
-    // diffuse shading
-    float diff = max(dot(normal, lightDir), 0.0);
-    // specular shading
-    vec3 reflectDir = reflect(-lightDir, normal);
-    float spec = pow(max(dot(viewDir, reflectDir), 0.0), material.shininess);
-    // attenuation
-    float distance = length(light.position - fragPos);
-    float attenuation = 1.0 / (light.constant + light.linear * distance + light.quadratic * (distance * distance));
-    // combine results
-    vec3 ambient  = light.ambient  * material.ambient;
-    vec3 diffuse  = light.diffuse  * diff * material.diffuse;
-    vec3 specular = light.specular * spec * material.specular;
-    ambient  *= attenuation;
-    diffuse  *= attenuation;
-    specular *= attenuation;
-
-    return (ambient + diffuse + specular);
-}
-
-vec3 CalcSpotLight(SpotLight light, vec3 normal, vec3 fragPos, vec3 viewDir)
-{
-    vec3 lightDir = normalize(light.position - fragPos);
-    // diffuse shading
-    float diff = max(dot(normal, lightDir), 0.0);
-    // specular shading
-    vec3 reflectDir = reflect(-lightDir, normal);
-    float spec = pow(max(dot(viewDir, reflectDir), 0.0), material.shininess);
-    // attenuation
-    float distance = length(light.position - fragPos);
-    float attenuation = 1.0 / (light.constant + light.linear * distance + light.quadratic * (distance * distance));
-    // combine results
-    vec3 ambient  = light.ambient  * material.ambient;
-    vec3 diffuse  = light.diffuse  * diff * material.diffuse;
-    vec3 specular = light.specular * spec * material.specular;
-    ambient  *= attenuation;
-    diffuse  *= attenuation;
-    specular *= attenuation;
-
-    // spotlight intensity
-    float theta = dot(lightDir, normalize(-light.direction));
-    float epsilon = light.cutOff - light.outerCutOff;
-    float intensity = clamp((theta - light.outerCutOff) / epsilon, 0.0, 1.0);
-    ambient  *= intensity;
-    diffuse  *= intensity;
-    specular *= intensity;
-
-    return (ambient + diffuse + specular);
-}
+#include "phong_lighting.glsl"
@@ -0,0 +1,91 @@
+// Phong terms of the lights, using the `material` of the including shader (see lights.glsl)
+
+// Day-night color of the sky at the scene time (see Daytime in light.py)
+vec3 SkyColor()
+{
+    float night = (sin(time * daytime.rate) + 1.0) / 2.0;
+    return mix(daytime.day, daytime.night, night);
+}
+
+// Diffuse and specular colors of the light are factors of the sky color
+vec3 CalcDirLight(DirLight light, vec3 normal, vec3 viewDir, vec4 texel)
+{
+    vec3 sky = SkyColor();
+    vec3 lightDir = normalize(-light.direction);
+    // diffuse shading
+    float diff = max(dot(normal, lightDir), 0.0);
+    // specular shading
+    vec3 reflectDir = reflect(-lightDir, normal);
+    float spec = pow(max(dot(viewDir, reflectDir), 0.0), material.shininess);
+    // combine results
+    vec3 ambient = light.ambient * material.ambient;
+    vec3 diffuse = light.diffuse * sky * diff * material.diffuse;
+    vec3 specular = light.specular * sky * spec * material.specular;
+
+    return (ambient + diffuse + specular) * texel.rgb;
+}
+
+PointLight FetchPointLight(int index)
+{
+    vec4 position = texelFetch(s_lights, 4 * index);
+    vec4 ambient = texelFetch(s_lights, 4 * index + 1);
+    vec4 diffuse = texelFetch(s_lights, 4 * index + 2);
+    vec4 specular = texelFetch(s_lights, 4 * index + 3);
+    return PointLight(position.xyz, position.w, ambient.xyz, ambient.w, diffuse.xyz, diffuse.w, specular.xyz,
+                      specular.w);
+}
+
+vec3 CalcPointLight(PointLight light, vec3 normal, vec3 fragPos, vec3 viewDir)
+{
+    vec3 lightDir = normalize(light.position - fragPos);
+    // diffuse shading
+    float diff = max(dot(normal, lightDir), 0.0);
+    // specular shading
+    vec3 reflectDir = reflect(-lightDir, normal);
+    float spec = pow(max(dot(viewDir, reflectDir), 0.0), material.shininess);
+    // attenuation
+    float distance = length(light.position - fragPos);
+    float attenuation = 1.0 / (light.constant + light.linear * distance + light.quadratic * (distance * distance));
+    // fade out to zero at the radius, where the light is left out of clusters
+    float falloff = clamp(1.0 - pow(distance / light.radius, 4.0), 0.0, 1.0);
+    attenuation *= falloff * falloff;
+    // combine results
+    vec3 ambient  = light.ambient  * material.ambient;
+    vec3 diffuse  = light.diffuse  * diff * material.diffuse;
+    vec3 specular = light.specular * spec * material.specular;
+    ambient  *= attenuation;
+    diffuse  *= attenuation;
+    specular *= attenuation;
+
+    return (ambient + diffuse + specular);
+}
+
+vec3 CalcSpotLight(SpotLight light, vec3 normal, vec3 fragPos, vec3 viewDir)
+{
+    vec3 lightDir = normalize(light.position - fragPos);
+    // diffuse shading
+    float diff = max(dot(normal, lightDir), 0.0);
+    // specular shading
+    vec3 reflectDir = reflect(-lightDir, normal);
+    float spec = pow(max(dot(viewDir, reflectDir), 0.0), material.shininess);
+    // attenuation
+    float distance = length(light.position - fragPos);
+    float attenuation = 1.0 / (light.constant + light.linear * distance + light.quadratic * (distance * distance));
+    // combine results
+    vec3 ambient  = light.ambient  * material.ambient;
+    vec3 diffuse  = light.diffuse  * diff * material.diffuse;
+    vec3 specular = light.specular * spec * material.specular;
+    ambient  *= attenuation;
+    diffuse  *= attenuation;
+    specular *= attenuation;
+
+    // spotlight intensity
+    float theta = dot(lightDir, normalize(-light.direction));
+    float epsilon = light.cutOff - light.outerCutOff;
+    float intensity = clamp((theta - light.outerCutOff) / epsilon, 0.0, 1.0);
+    ambient  *= intensity;
+    diffuse  *= intensity;
+    specular *= intensity;
+
+    return (ambient + diffuse + specular);
+}
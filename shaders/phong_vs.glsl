@@ -1,24 +1,59 @@
 #version 330 core
+// Defines: INSTANCED (model matrix and tint per instance instead of the Object block),
+// ANIMATED (parametric motion on top of the model matrix, per instance or per draw; see motion.glsl)
 
 layout(location = 0) in vec3 a_pos;
 layout(location = 1) in vec2 a_texture;
 layout(location = 2) in vec3 a_color;
 layout(location = 3) in vec3 a_normal;
+#ifdef INSTANCED
+// Per-instance stream (attribute divisor 1)
+layout(location = 4) in mat4 a_model;
+layout(location = 8) in vec4 a_tint;
+#ifdef ANIMATED
+layout(location = 9) in vec4 a_motion0;
+layout(location = 10) in vec4 a_motion1;
+#endif
+#else
+#include "object.glsl"
+#endif
 
 out vec3 frag_pos;
 out vec3 v_normal;
 out vec3 v_color;
 out vec2 v_texture;
+out vec4 v_tint;
 
-uniform mat4 model;
-uniform mat4 view;
-uniform mat4 projection;
+layout(std140) uniform Camera {
+    mat4 view;
+    mat4 projection;
+    vec3 viewPos;
+    float time;  // Scene time in seconds
+};
+
+#include "vertex_format.glsl"
+#ifdef ANIMATED
+#include "motion.glsl"
+#endif
 
 void main()
 {
-    frag_pos = vec3(model * vec4(a_pos, 1.0));
-    v_normal = mat3(transpose(inverse(model))) * a_normal;
-    v_texture = a_texture;
+#ifdef INSTANCED
+    mat4 world = a_model;
+    v_tint = a_tint;
+#else
+    mat4 world = model;
+    v_tint = vec4(1.0);
+#endif
+#if defined(ANIMATED) && defined(INSTANCED)
+    world = AnimatedModel(world, a_motion0, a_motion1);
+#elif defined(ANIMATED)
+    world = AnimatedModel(world, motion[0], motion[1]);
+#endif
+    vec4 position = world * vec4(VertexPosition(), 1.0);
+    frag_pos = vec3(position);
+    v_normal = mat3(transpose(inverse(world))) * a_normal;
+    v_texture = VertexTexture();
 
-    gl_Position = projection * view * model * vec4(a_pos, 1.0);
-}
\ No newline at end of file
+    gl_Position = projection * view * position;
+}
@@ -0,0 +1,16 @@
+// Compact vertices (see vertex_format.py) store positions and texture coordinates as fractions of their
+// range in the material chunk; dequantize maps them back. The default leaves float vertices unchanged.
+// Include after declaring the a_pos and a_texture inputs.
+
+// Position offset, position scale, texture coordinate offset (xy) and scale (zw)
+uniform vec4 dequantize[3] = vec4[3](vec4(0.0), vec4(1.0), vec4(0.0, 0.0, 1.0, 1.0));
+
+vec3 VertexPosition()
+{
+    return dequantize[0].xyz + a_pos * dequantize[1].xyz;
+}
+
+vec2 VertexTexture()
+{
+    return dequantize[2].xy + a_texture * dequantize[2].zw;
+}
@@ -0,0 +1,152 @@
+import os
+import sys
+import json
+import struct
+
+import numpy as np
+import mesh_cache
+
+
+CACHE_DIR = mesh_cache.CACHE_DIR
+CACHE_VERSION = 1
+_MAGIC = b"TEXCACHE"
+_ALIGN = 16
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tga")
+
+
+def cache_path(image_path: str, size: tuple = None) -> str:
+    """Location of the cache file of given image, resized to size (width, height) if given."""
+    directory, name = os.path.split(image_path)
+    suffix = ".%dx%d" % size if size is not None else ""
+    return os.path.join(directory, CACHE_DIR, name + suffix + ".tex")
+
+
+def image_size(image_path: str) -> tuple:
+    """(width, height) of an image, read from its header only."""
+    from PIL import Image
+    with Image.open(image_path) as image:
+        return image.size
+
+
+def load(image_path: str, size: tuple = None) -> list:
+    """
+    Loads the mip chain of an image, using the cache when it is valid.
+
+    :param image_path: Path to image file.
+    :param size: (width, height) to resize the image to, original size if None.
+    :return: List of (width, height, pixels) per mip level, full size first. Pixels are memory-mapped
+             (height, width, 4) uint8 RGBA arrays, bottom row first as glTexImage2D expects them.
+    """
+    levels = read_cache(image_path, size)
+    if levels is None:
+        build_cache(image_path, size)
+        levels = read_cache(image_path, size)
+    return levels
+
+
+def mip_chain(pixels: np.ndarray) -> list:
+    """
+    Box filtered mip levels of an image down to 1x1. Odd rows or columns are dropped like GL's level sizes
+    (floor of half) imply. Levels are filtered from the unrounded previous level.
+
+    :param pixels: (height, width, channels) uint8 array.
+    :return: List of uint8 arrays, pixels itself first.
+    """
+    levels = [pixels]
+    level = pixels.astype(np.float32)
+    while level.shape[0] > 1 or level.shape[1] > 1:
+        height, width = max(1, level.shape[0] // 2), max(1, level.shape[1] // 2)
+        if level.shape[0] > 1:
+            level = (level[0:2 * height:2] + level[1:2 * height:2]) * 0.5
+        if level.shape[1] > 1:
+            level = (level[:, 0:2 * width:2] + level[:, 1:2 * width:2]) * 0.5
+        levels.append(np.rint(level).astype(np.uint8))
+    return levels
+
+
+def build_cache(image_path: str, size: tuple = None) -> str:
+    """
+    Decodes given image and writes its cache file: flipped to bottom row first, converted to RGBA and
+    resized if requested, followed by all mip levels.
+    File layout: magic, uint32 header length, JSON header, raw levels aligned to 16 bytes.
+
+    :param image_path: Path to image file.
+    :param size: (width, height) to resize the image to, original size if None.
+    :return: Path of the written cache file.
+    """
+    from PIL import Image
+
+    image = Image.open(image_path).convert("RGBA")
+    if size is not None and image.size != tuple(size):
+        image = image.resize(tuple(size), Image.BICUBIC)
+    pixels = np.asarray(image.transpose(Image.FLIP_TOP_BOTTOM))
+
+    levels, offset = [], 0
+    arrays = mip_chain(pixels)
+    for array in arrays:
+        levels.append({"width": array.shape[1], "height": array.shape[0], "offset": offset})
+        offset += -(-array.nbytes // _ALIGN) * _ALIGN
+
+    header = json.dumps({
+        "version": CACHE_VERSION,
+        "signature": mesh_cache._signature(image_path),
+        "levels": levels,
+    }).encode()
+    data_start = -(-(len(_MAGIC) + 4 + len(header)) // _ALIGN) * _ALIGN
+    header = header.ljust(data_start - len(_MAGIC) - 4, b" ")
+
+    path = cache_path(image_path, size)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = mesh_cache.temp_path(path)
+    with open(tmp_path, "wb") as f:
+        f.write(_MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for array in arrays:
+            f.write(array.tobytes())
+            f.write(b"\0" * (-array.nbytes % _ALIGN))
+    os.replace(tmp_path, path)  # Readers never see a partially written cache
+    return path
+
+
+def read_cache(image_path: str, size: tuple = None):
+    """
+    Memory-maps the cached mip chain of given image.
+
+    :return: List of (width, height, pixels) like load(), or None if there is no valid cache.
+    """
+    path = cache_path(image_path, size)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "rb") as f:
+        if f.read(len(_MAGIC)) != _MAGIC:
+            return None
+        header_len, = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_len))
+
+    if header["version"] != CACHE_VERSION or not os.path.exists(image_path) or \
+            mesh_cache._signature(image_path) != header["signature"]:
+        return None
+    data_start = len(_MAGIC) + 4 + header_len
+    return [(level["width"], level["height"],
+             np.memmap(path, dtype=np.uint8, mode="r", offset=data_start + level["offset"],
+                       shape=(level["height"], level["width"], 4)))
+            for level in header["levels"]]
+
+
+def main(argv=None) -> None:
+    """Pre-builds caches for every image found under given directories (default: data/)."""
+    roots = (argv if argv is not None else sys.argv[1:]) or ["data"]
+    for root in roots:
+        for directory, dirs, files in os.walk(root):
+            dirs[:] = [d for d in dirs if d != CACHE_DIR]
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    image_path = os.path.join(directory, name)
+                    if read_cache(image_path) is None:
+                        print(f"{image_path} -> {build_cache(image_path)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+import numpy as np
+from OpenGL.GL import *
+from gl_state import state
+
+
+# Binding points of the uniform blocks shared by all shader programs
+CAMERA_BINDING = 0
+LIGHTS_BINDING = 1
+CLUSTERS_BINDING = 2
+OBJECT_BINDING = 3
+BLOCK_BINDINGS = {"Camera": CAMERA_BINDING, "Lights": LIGHTS_BINDING, "Clusters": CLUSTERS_BINDING,
+                  "Object": OBJECT_BINDING}
+
+# std140 layout of the Camera block: mat4 view; mat4 projection; vec3 viewPos; float time;
+CAMERA_VIEW_OFFSET = 0
+CAMERA_PROJECTION_OFFSET = 64
+CAMERA_VIEW_POS_OFFSET = 128
+CAMERA_TIME_OFFSET = 140
+CAMERA_BLOCK_SIZE = 144
+
+# std140 layout of the per-draw Object block (object.glsl): mat4 model; vec4 motion[2]; vec4 color;
+OBJECT_MODEL_OFFSET = 0
+OBJECT_MOTION_OFFSET = 64
+OBJECT_COLOR_OFFSET = 96
+OBJECT_BLOCK_SIZE = 112
+
+
+class UniformBuffer:
+    def __init__(self, size: int, binding: int, streamed: bool = False):
+        """Uniform buffer object backed by a NumPy array.
+
+        Values are written into the array. A block has one of two update paths: by default it owns a buffer
+        and upload() sends the range that actually changed; a streamed block has no buffer of its own and
+        stream() copies the whole array into a DynamicBuffer every frame (for blocks that change every frame).
+
+        :param size: Size of the block in bytes (std140 layout).
+        :param binding: Uniform block binding point.
+        :param streamed: Updated with stream() instead of upload().
+        """
+        self.data = np.zeros(size // 4, dtype=np.float32)
+        self.binding = binding
+        self.streamed = streamed
+        self._buffer = None
+        self._range = None  # (buffer, offset) of the copy streamed this frame, see stream()
+        if not streamed:
+            self._buffer = glGenBuffers(1)
+            glBindBuffer(GL_UNIFORM_BUFFER, self._buffer)
+            glBufferData(GL_UNIFORM_BUFFER, size, None, GL_DYNAMIC_DRAW)
+            self.bind()
+        # Dirty range in floats, whole buffer at first (upload() only)
+        self._dirty_start, self._dirty_end = 0, len(self.data)
+
+    def bind(self) -> None:
+        """Connects the buffer to its binding point (e.g. after another buffer took the binding point)."""
+        if self._range is not None:
+            state.bind_uniform_buffer_range(self.binding, *self._range, self.data.nbytes)
+        elif self._buffer is not None:
+            state.bind_uniform_buffer(self.binding, self._buffer)
+
+    def write(self, offset: int, values) -> None:
+        """
+        Writes values into the buffer, marking them dirty if they changed (unless streamed, which copies them all).
+
+        :param offset: Byte offset (std140).
+        :param values: Floats, flattened in C order (matrices end up column-major as with glUniformMatrix4fv).
+        """
+        values = np.ravel(values)
+        start = offset // 4
+        end = start + len(values)
+        if self.streamed:
+            self.data[start:end] = values
+            return
+        if np.array_equal(self.data[start:end], values):
+            return
+        self.data[start:end] = values
+        self._dirty_start = min(self._dirty_start, start)
+        self._dirty_end = max(self._dirty_end, end)
+
+    def upload(self) -> None:
+        """Uploads the dirty range, if any, with one glBufferSubData call. Not for streamed blocks."""
+        if self.streamed:
+            raise RuntimeError(f"Uniform block {self.binding} is streamed, use stream()")
+        if not state.count(self._dirty_start < self._dirty_end):
+            return
+        glBindBuffer(GL_UNIFORM_BUFFER, self._buffer)
+        glBufferSubData(GL_UNIFORM_BUFFER, self._dirty_start * 4, (self._dirty_end - self._dirty_start) * 4,
+                        self.data[self._dirty_start:self._dirty_end])
+        self._dirty_start, self._dirty_end = len(self.data), 0
+
+    def stream(self, ring) -> None:
+        """
+        Copies the whole block into this frame's space of a DynamicBuffer and binds that range, instead of
+        updating a buffer of its own (upload), which the GPU may still be reading. Streamed blocks only.
+        """
+        if not self.streamed:
+            raise RuntimeError(f"Uniform block {self.binding} is uploaded, use upload()")
+        offset, view = ring.allocate(self.data.nbytes)
+        view[:len(self.data)] = self.data
+        ring.commit()
+        self._range = (ring.buffer, offset)
+        self.bind()
@@ -0,0 +1,104 @@
+import numpy as np
+from OpenGL.GL import *
+
+
+# Shader attribute location of each attribute of a cache vertex format (see mesh_cache)
+LOCATIONS = {"V3F": 0, "T2F": 1, "C3F": 2, "N3F": 3}
+# Floats of each attribute in cache vertices
+COMPONENTS = {"T2F": 2, "C3F": 3, "N3F": 3, "V3F": 3}
+
+# How each attribute is stored in vertex buffers: (GL type, components, normalized, bytes)
+LAYOUTS = {
+    "float": {
+        "T2F": (GL_FLOAT, 2, GL_FALSE, 8),
+        "C3F": (GL_FLOAT, 3, GL_FALSE, 12),
+        "N3F": (GL_FLOAT, 3, GL_FALSE, 12),
+        "V3F": (GL_FLOAT, 3, GL_FALSE, 12),
+    },
+    # Positions and texture coordinates as 16-bit fractions of their range in the chunk (see dequantize),
+    # normals as 10-bit signed fractions, colors as bytes. 16 bytes instead of 32 for T2F_N3F_V3F.
+    "compact": {
+        "T2F": (GL_UNSIGNED_SHORT, 2, GL_TRUE, 4),
+        "C3F": (GL_UNSIGNED_BYTE, 4, GL_TRUE, 4),
+        "N3F": (GL_INT_2_10_10_10_REV, 4, GL_TRUE, 4),
+        "V3F": (GL_SHORT, 4, GL_TRUE, 8),  # 4th component pads to 4-byte alignment
+    },
+}
+
+
+def attributes(layout: str, vertex_format: str) -> (list, int):
+    """
+    Vertex attribute pointers of a vertex format stored in given layout.
+
+    :return: (location, components, GL type, normalized, byte offset) of each attribute, and the stride.
+    """
+    table = LAYOUTS[layout]
+    pointers = []
+    offset = 0
+    for attr in vertex_format.split("_"):
+        if attr not in table:
+            raise ValueError(f"Unknown vertex attribute {attr} in {vertex_format}")
+        gl_type, components, normalized, size = table[attr]
+        pointers.append((LOCATIONS[attr], components, gl_type, normalized, offset))
+        offset += size
+    return pointers, offset
+
+
+def _fractions(values: np.ndarray, signed: bool) -> (np.ndarray, np.ndarray, np.ndarray):
+    """Values (N, K) as 16-bit fractions of their range, and offset and scale mapping fractions back."""
+    low, high = values.min(axis=0), values.max(axis=0)
+    if signed:  # [-1, 1] around the middle of the range
+        offset, scale = (low + high) / 2, (high - low) / 2
+    else:  # [0, 1] from the bottom
+        offset, scale = low, high - low
+    scale = np.where(scale > 0, scale, 1.0)
+    limit = 32767 if signed else 65535
+    quantized = np.rint((values - offset) / scale * limit)
+    return quantized.astype(np.int16 if signed else np.uint16), offset, scale
+
+
+def _pack_normals(normals: np.ndarray) -> np.ndarray:
+    """Normals (N, 3) as GL_INT_2_10_10_10_REV: 10-bit signed x, y, z from the lowest bits, w 0."""
+    quantized = np.rint(np.clip(normals, -1.0, 1.0) * 511).astype(np.int32) & 0x3FF
+    return (quantized[:, 0] | quantized[:, 1] << 10 | quantized[:, 2] << 20).astype(np.uint32)
+
+
+def encode(chunk, layout: str) -> None:
+    """
+    Converts the interleaved float vertices of a material chunk to given layout, in place.
+
+    Sets chunk.layout and chunk.dequantize: position offset, position scale (xyz) and texture coordinate
+    offset (xy) and scale (zw) mapping the stored fractions back, as the shaders do (vertex_format.glsl).
+
+    :param chunk: mesh_cache.MaterialChunk with float vertices (chunk.layout "float").
+    :param layout: Name of a layout in LAYOUTS.
+    """
+    if layout == chunk.layout:
+        return
+    if chunk.layout != "float":
+        raise ValueError(f"Can't convert {chunk.layout} vertices to {layout}")
+    vertices = np.asarray(chunk.vertices, dtype=np.float32).reshape(-1, chunk.vertex_size)
+    pointers, stride = attributes(layout, chunk.vertex_format)
+    data = np.zeros((len(vertices), stride), dtype=np.uint8)
+    dequantize = chunk.dequantize.copy()
+
+    column = 0
+    for attr, (_, _, _, _, offset) in zip(chunk.vertex_format.split("_"), pointers):
+        values = vertices[:, column:column + COMPONENTS[attr]]
+        column += COMPONENTS[attr]
+        if attr == "V3F":
+            encoded, dequantize[0, :3], dequantize[1, :3] = _fractions(values, signed=True)
+            encoded = np.hstack((encoded, np.zeros((len(encoded), 1), dtype=np.int16)))
+        elif attr == "T2F":
+            encoded, dequantize[2, :2], dequantize[2, 2:] = _fractions(values, signed=False)
+        elif attr == "N3F":
+            encoded = _pack_normals(values)
+        else:
+            encoded = np.hstack((np.rint(np.clip(values, 0.0, 1.0) * 255), np.full((len(values), 1), 255)))
+            encoded = encoded.astype(np.uint8)
+        encoded = np.ascontiguousarray(encoded).view(np.uint8).reshape(len(vertices), -1)
+        data[:, offset:offset + encoded.shape[1]] = encoded
+
+    chunk.vertices = data.reshape(-1)
+    chunk.layout = layout
+    chunk.dequantize = dequantize